@@ -0,0 +1,107 @@
+"""
+Small in-memory caches shared by the API clients
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Bounded least-recently-used map with optional per-entry expiry"""
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        value, stored_at = entry
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._entries.clear()
+
+
+class StaleWhileRevalidateCache:
+    """Answers from the last good value at once and refreshes it in the background after it expires
+
+    `expires_at(fetched_at)` maps the wall-clock time a value was loaded to the time it
+    goes stale. Only the very first request for a key waits on the loader; failed or
+    empty refreshes keep serving the previous value and are retried after `retry_after` seconds.
+    """
+
+    def __init__(self, expires_at: Callable[[float], float], retry_after: float = 300):
+        self.expires_at = expires_at
+        self.retry_after = retry_after
+        self._entries: Dict[Hashable, tuple] = {}  # key -> (value, expires_at)
+        self._loading: Dict[Hashable, asyncio.Task] = {}
+
+    def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run_loader(key, loader))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return task
+
+    async def _run_loader(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+        except Exception as e:
+            logger.error(f"Refreshing cached {key!r} failed: {e}")
+            value = None
+        if value:
+            self._entries[key] = (value, self.expires_at(time.time()))
+            return value
+        entry = self._entries.get(key)
+        if entry is None:
+            return value
+        self._entries[key] = (entry[0], time.time() + self.retry_after)
+        return entry[0]
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return await asyncio.shield(self._load(key, loader))
+        value, expires = entry
+        if time.time() >= expires:
+            self._load(key, loader)
+        return value
+
+    def warm(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start loading a key in the background"""
+        return self._load(key, loader)
+
+    def cancel(self):
+        for task in list(self._loading.values()):
+            task.cancel()
+
+
+_MISSING = object()
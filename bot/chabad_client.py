@@ -7,11 +7,20 @@ import logging
 import hashlib
 import hmac
 import base64
+import os
 import time
+from datetime import datetime, timezone
 from typing import Dict, List, Optional, Union
 from urllib.parse import quote, urljoin
 import json
-import re
+
+from .cache import StaleWhileRevalidateCache
+from .chabad_directory import ChabadDirectory, overpass_records
+from .hebrew_calendar import next_day_boundary
+from .hebrew_text import strip_marks
+from .html_head import HeadReader, parse_head
+from .locations import find_city
+from .storage import cache_path
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +40,27 @@ class ChabadClient:
         self.session = None
         self.last_request_time = 0
         
+        # Daily pages change at most once per Hebrew day, so they go stale at the next sunset
+        self.daily_cache = StaleWhileRevalidateCache(self._daily_expiry)
+        self.daily_urls = {
+            'study': f"{self.base_url}/library/article_cdo/aid/3146/jewish/Daily-Study.htm",
+            'wisdom': f"{self.base_url}/library/article_cdo/aid/3147/jewish/Daily-Wisdom.htm",
+            'mitzvah': f"{self.base_url}/library/article_cdo/aid/3148/jewish/Daily-Mitzvah.htm",
+            'tanya': f"{self.base_url}/library/tanya",
+            'parshah': f"{self.base_url}/parshah"
+        }
+        
+        # Center directory: bulk JSON feed (list of centers with latitude/longitude) kept on disk
+        self.directory_url = os.getenv('CHABAD_DIRECTORY_URL')
+        self.directory_path = cache_path('chabad', 'centers.json')
+        self.directory_refresh_interval = 24 * 3600
+        # After a failed download the refresh loop tries again this much later
+        self.directory_retry_interval = 15 * 60
+        self._directory_failed_at: Optional[float] = None
+        self.directory: Optional[ChabadDirectory] = None
+        self._directory_lock = asyncio.Lock()
+        self._directory_task: Optional[asyncio.Task] = None
+        
     async def _ensure_session(self):
         """Ensure aiohttp session exists"""
         if self.session is None:
@@ -80,9 +110,8 @@ class ChabadClient:
                     if 'application/json' in content_type:
                         return await response.json()
                     else:
-                        # Parse HTML content for structured data
-                        text = await response.text()
-                        return self._parse_html_content(text)
+                        # Everything we extract lives in <head>, so stop reading once it ends
+                        return await self._read_html_head(response)
                 else:
                     logger.error(f"Chabad request failed: {response.status}")
                     return None
@@ -90,59 +119,53 @@ class ChabadClient:
             logger.error(f"Error making Chabad request: {e}")
             return None
     
+    async def _read_html_head(self, response: aiohttp.ClientResponse) -> Dict:
+        """Parse the page <head> as it streams in and drop the connection once it is complete"""
+        reader = HeadReader(response.charset)
+        async for chunk in response.content.iter_chunked(8 * 1024):
+            reader.feed(chunk)
+            if reader.done:
+                # Don't download or drain the rest of the page
+                response.close()
+                break
+        logger.debug(f"Read {reader.bytes_read} bytes of {response.url}")
+        return reader.result()
+    
     def _parse_html_content(self, html: str) -> Dict:
         """Parse HTML content to extract structured information"""
-        # Extract JSON-LD structured data
-        import re
-        
-        # Look for JSON-LD data
-        jsonld_pattern = r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>'
-        jsonld_matches = re.findall(jsonld_pattern, html, re.DOTALL | re.IGNORECASE)
-        
-        result = {}
-        
-        for match in jsonld_matches:
-            try:
-                data = json.loads(match.strip())
-                result['structured_data'] = data
-                break
-            except json.JSONDecodeError:
-                continue
-        
-        # Extract title
-        title_pattern = r'<title[^>]*>(.*?)</title>'
-        title_match = re.search(title_pattern, html, re.IGNORECASE)
-        if title_match:
-            result['title'] = title_match.group(1).strip()
-        
-        # Extract meta description
-        desc_pattern = r'<meta[^>]*name=["\']description["\'][^>]*content=["\']([^"\']*)["\'][^>]*>'
-        desc_match = re.search(desc_pattern, html, re.IGNORECASE)
-        if desc_match:
-            result['description'] = desc_match.group(1).strip()
-        
-        return result
+        return parse_head(html)
+    
+    @staticmethod
+    def _daily_expiry(fetched_at: float) -> float:
+        return next_day_boundary(datetime.fromtimestamp(fetched_at, timezone.utc)).timestamp()
+    
+    async def _get_daily(self, name: str) -> Optional[Dict]:
+        """Daily page from the stale-while-revalidate cache"""
+        url = self.daily_urls[name]
+        return await self.daily_cache.get(name, lambda: self._make_request(url))
+    
+    def warm_daily_cache(self):
+        """Load every daily page in the background so the first clicks are answered from cache"""
+        for name, url in self.daily_urls.items():
+            self.daily_cache.warm(name, lambda url=url: self._make_request(url))
     
     async def get_daily_study(self) -> Optional[Dict]:
         """Get daily study content from Chabad.org"""
-        url = f"{self.base_url}/library/article_cdo/aid/3146/jewish/Daily-Study.htm"
-        return await self._make_request(url)
+        return await self._get_daily('study')
     
     async def get_daily_wisdom(self) -> Optional[Dict]:
         """Get daily wisdom/quote from Chabad.org"""
-        url = f"{self.base_url}/library/article_cdo/aid/3147/jewish/Daily-Wisdom.htm"
-        return await self._make_request(url)
+        return await self._get_daily('wisdom')
     
     async def get_daily_mitzvah(self) -> Optional[Dict]:
         """Get daily mitzvah from Chabad.org"""
-        url = f"{self.base_url}/library/article_cdo/aid/3148/jewish/Daily-Mitzvah.htm"
-        return await self._make_request(url)
+        return await self._get_daily('mitzvah')
     
     async def search_articles(self, query: str, limit: int = 10) -> List[Dict]:
         """Search articles on Chabad.org"""
         url = f"{self.base_url}/search"
         params = {
-            'q': query,
+            'q': strip_marks(query),
             'limit': limit
         }
         
@@ -158,13 +181,11 @@ class ChabadClient:
     
     async def get_daily_tanya(self) -> Optional[Dict]:
         """Get today's Tanya lesson"""
-        url = f"{self.base_url}/library/tanya"
-        return await self._make_request(url)
+        return await self._get_daily('tanya')
     
     async def get_weekly_torah_study(self) -> Optional[Dict]:
         """Get weekly Torah study materials"""
-        url = f"{self.base_url}/parshah"
-        return await self._make_request(url)
+        return await self._get_daily('parshah')
     
     async def get_chassidic_stories(self, limit: int = 5) -> List[Dict]:
         """Get Chassidic stories"""
@@ -174,8 +195,109 @@ class ChabadClient:
             return [result]
         return []
     
+    async def refresh_directory(self) -> bool:
+        """Download the bulk center feed and rebuild the spatial index"""
+        if not self.directory_url:
+            return False
+        await self._ensure_session()
+        try:
+            timeout = aiohttp.ClientTimeout(total=60)
+            async with self.session.get(self.directory_url, timeout=timeout) as response:
+                if response.status != 200:
+                    logger.error(f"Chabad directory request failed: {response.status}")
+                    return False
+                records = json.loads(await response.read())
+        except Exception as e:
+            logger.error(f"Error downloading Chabad directory: {e}")
+            return False
+        
+        if isinstance(records, dict):
+            records = overpass_records(records['elements']) if 'elements' in records else records.get('centers', [])
+        loop = asyncio.get_running_loop()
+        directory = await loop.run_in_executor(None, ChabadDirectory.from_records, records)
+        if not directory:
+            logger.warning("Chabad directory feed had no centers with coordinates")
+            return False
+        self.directory = directory
+        await loop.run_in_executor(None, directory.save, self.directory_path)
+        logger.info(f"Loaded {len(directory)} Chabad centers")
+        return True
+    
+    async def _directory_refresh_loop(self, delay: float):
+        """Re-download the whole directory periodically instead of querying per lookup
+        
+        A failed download is retried after directory_retry_interval; lookups meanwhile
+        use what they have (or nothing) rather than downloading themselves.
+        """
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                refreshed = await self.refresh_directory()
+            except Exception as e:
+                logger.error(f"Chabad directory refresh failed: {e}")
+                refreshed = False
+            if refreshed:
+                self._directory_failed_at = None
+                delay = self.directory_refresh_interval
+            else:
+                self._directory_failed_at = time.monotonic()
+                delay = self.directory_retry_interval
+    
+    @property
+    def directory_configured(self) -> bool:
+        """Whether nearest-center lookups have a feed to download or a saved directory to read"""
+        return bool(self.directory_url) or self.directory is not None or os.path.exists(self.directory_path)
+    
+    async def get_directory(self) -> Optional[ChabadDirectory]:
+        """The local center directory, loaded from disk or downloaded on first use
+        
+        Only the first lookup downloads; once that has failed, lookups return None without
+        trying again and the refresh loop retries on its own schedule.
+        """
+        if self.directory is None and self._directory_failed_at is None:
+            async with self._directory_lock:
+                if self.directory is None and self._directory_failed_at is None:
+                    loop = asyncio.get_running_loop()
+                    self.directory = await loop.run_in_executor(None, ChabadDirectory.load, self.directory_path)
+                    if self.directory is None and not await self.refresh_directory():
+                        self._directory_failed_at = time.monotonic()
+        
+        if self.directory_url and (self._directory_task is None or self._directory_task.done()):
+            if self._directory_failed_at is not None:
+                delay = max(0.0, self.directory_retry_interval - (time.monotonic() - self._directory_failed_at))
+            else:
+                try:
+                    age = time.time() - os.path.getmtime(self.directory_path)
+                except OSError:
+                    age = self.directory_refresh_interval
+                delay = max(0.0, self.directory_refresh_interval - age)
+            self._directory_task = asyncio.create_task(self._directory_refresh_loop(delay))
+        
+        return self.directory
+    
+    async def find_centers(self, location: str = "", latitude: Optional[float] = None,
+                           longitude: Optional[float] = None, limit: int = 5) -> List[Dict]:
+        """Nearest centers to a known city or to coordinates, from the local directory"""
+        if latitude is None or longitude is None:
+            city = find_city(location)
+            if city is None:
+                return []
+            latitude, longitude = city.latitude, city.longitude
+        
+        directory = await self.get_directory()
+        if not directory:
+            return []
+        return directory.nearest(latitude, longitude, limit)
+    
     async def get_chabad_directory(self, location: str = "") -> Optional[Dict]:
         """Search Chabad centers directory"""
+        city = find_city(location) if location else None
+        if city is not None:
+            centers = await self.find_centers(location)
+            if centers:
+                return {'title': f"Chabad centers near {city.name}", 'centers': centers}
+        
+        # Unknown place or no local directory: fall back to the directory page
         url = f"{self.base_url}/centers"
         params = {}
         if location:
@@ -223,5 +345,8 @@ class ChabadClient:
     
     async def close(self):
         """Close the aiohttp session"""
+        self.daily_cache.cancel()
+        if self._directory_task:
+            self._directory_task.cancel()
         if self.session:
             await self.session.close()
\ No newline at end of file
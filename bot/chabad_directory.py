@@ -0,0 +1,98 @@
+"""
+Locally cached Chabad center directory with nearest-center lookups
+"""
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+
+from .geo_index import KDTree
+
+logger = logging.getLogger(__name__)
+
+# Fields kept per center; anything else in the bulk feed is dropped
+CENTER_FIELDS = ('name', 'address', 'city', 'country', 'phone', 'url')
+
+
+def _coordinate(record: Dict, *names: str) -> Optional[float]:
+    for name in names:
+        value = record.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def overpass_records(elements: Iterable[Dict]) -> List[Dict]:
+    """Feed records from an OpenStreetMap Overpass response (nodes, or ways and relations with `out center`)"""
+    records = []
+    for element in elements:
+        tags = element.get('tags') or {}
+        point = element.get('center') or element
+        street = ' '.join(part for part in (tags.get('addr:housenumber'), tags.get('addr:street')) if part)
+        records.append({
+            'name': tags.get('name:en') or tags.get('name'),
+            'address': street,
+            'city': tags.get('addr:city'),
+            'country': tags.get('addr:country'),
+            'phone': tags.get('phone') or tags.get('contact:phone'),
+            'url': tags.get('website') or tags.get('contact:website'),
+            'latitude': point.get('lat'),
+            'longitude': point.get('lon')
+        })
+    return records
+
+
+class ChabadDirectory:
+    """Centers plus a k-d tree over their coordinates"""
+
+    def __init__(self, centers: List[Dict]):
+        self.centers = centers
+        self.tree = KDTree([(center['latitude'], center['longitude']) for center in centers])
+
+    def __len__(self) -> int:
+        return len(self.centers)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'ChabadDirectory':
+        """Build from bulk feed records, skipping any without usable coordinates"""
+        centers = []
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            latitude = _coordinate(record, 'latitude', 'lat')
+            longitude = _coordinate(record, 'longitude', 'lng', 'lon')
+            if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                continue
+            center = {field: record[field] for field in CENTER_FIELDS if record.get(field)}
+            center['latitude'] = latitude
+            center['longitude'] = longitude
+            centers.append(center)
+        return cls(centers)
+
+    def nearest(self, latitude: float, longitude: float, count: int = 5,
+                max_km: Optional[float] = None) -> List[Dict]:
+        """Closest centers, each with a 'distance_km' key"""
+        return [
+            dict(self.centers[index], distance_km=round(distance, 1))
+            for index, distance in self.tree.nearest(latitude, longitude, count, max_km)
+        ]
+
+    def save(self, path: str):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.centers, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['ChabadDirectory']:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls.from_records(json.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable Chabad directory snapshot: {e}")
+            return None
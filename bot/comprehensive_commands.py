@@ -6,12 +6,51 @@ from discord.ext import commands
 from discord import app_commands
 import logging
 import asyncio
-from typing import Optional, Dict, Any, List
-from datetime import date
+import re
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Tuple
+from datetime import date, timedelta
 from deep_translator import GoogleTranslator
+from .nli_client import COMBINED_SEARCH, MATERIAL_TYPES, collection_query, material_query
+from . import gematria
+from .cache import LRUCache
+from .federated_search import FederatedSearch
+from .gematria_index import GematriaLibrary, verse_words
+from .guild_settings import GuildSettings
+from .ranking import SearchRanker
 
 logger = logging.getLogger(__name__)
 
+async def build_daf_yomi_embed(clients: Dict[str, Any], day: date) -> discord.Embed:
+    """Embed with the Daf Yomi, Rambam and Mishnah Yomit portions for a date"""
+    learning = clients['learning']
+    schedule = learning.for_date(day)
+    daf = schedule['daf_yomi']
+    
+    embed = discord.Embed(title=f"📜 Daf Yomi: {daf['tractate']} {daf['daf']}", color=0x16A085)
+    
+    text_data = await asyncio.wait_for(clients['sefaria'].get_text(daf['ref']), timeout=8.0)
+    if text_data:
+        content = text_data.get('text', '')
+        if isinstance(content, list):
+            content = '\n'.join(str(c) for c in content[:2] if c)
+        if content:
+            embed.description = content[:800] + "..." if len(content) > 800 else content
+    
+    embed.add_field(name="📖 Rambam (3 chapters)", value="\n".join(schedule['rambam']['chapters']), inline=False)
+    
+    if not learning.has_mishnah_yomit:
+        try:
+            await asyncio.wait_for(learning.load_mishnah_shape(clients['sefaria']), timeout=8.0)
+            schedule['mishnah_yomit'] = learning.mishnah_yomit(day)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out loading the Mishnah Yomit table")
+    if schedule['mishnah_yomit']:
+        embed.add_field(name="📘 Mishnah Yomit", value="\n".join(schedule['mishnah_yomit']['refs']), inline=False)
+    
+    embed.add_field(name="📚 Tanya", value=schedule['tanya']['refs'][0], inline=False)
+    embed.set_footer(text=f"{schedule['hebrew_date']} • Daf Yomi cycle {daf['cycle']}")
+    return embed
+
 class BaseView(discord.ui.View):
     def __init__(self, timeout: float = 300):
         super().__init__(timeout=timeout)
@@ -32,6 +71,399 @@ class BaseView(discord.ui.View):
             except:
                 pass
 
+def build_nli_page_embed(title: str, records: List[Dict], page: int, per_page: int, item_label: str, color: int = 0x8B4513) -> discord.Embed:
+    """Embed listing one page of NLI records, numbered across pages"""
+    embed = discord.Embed(title=title, color=color)
+    first = (page - 1) * per_page + 1
+    for i, item in enumerate(records[:per_page], first):
+        item_title = item.get('title', f'{item_label} {i}')
+        desc = item.get('description', f'Historical {item_label.lower()}')
+        embed.add_field(name=f"{i}. {item_title}"[:256], value=str(desc)[:150] or "—", inline=False)
+    embed.set_footer(text=f"Page {page} • National Library of Israel")
+    return embed
+
+async def attach_thumbnail(image_cache, embed: discord.Embed, records: List[Dict]) -> List[discord.File]:
+    """Show the first record image through the local image cache; returns files to send with the embed"""
+    url = next((item.get('thumbnail') for item in records if item.get('thumbnail')), None)
+    if not url or image_cache is None:
+        return []
+    public_url = image_cache.public_url(url)
+    if public_url:
+        # Served (and cached on first hit) by our own web server
+        embed.set_thumbnail(url=public_url)
+        return []
+    try:
+        path = await asyncio.wait_for(image_cache.get(url), timeout=5.0)
+    except asyncio.TimeoutError:
+        return []
+    if not path:
+        return []
+    embed.set_thumbnail(url="attachment://thumbnail.jpg")
+    return [discord.File(path, filename="thumbnail.jpg")]
+
+class PaginationView(BaseView):
+    """Previous/Next buttons over a paged search; pages are read through the client's page cache"""
+    def __init__(self, fetch_page: Callable[[int], Awaitable[List[Dict]]],
+                 render: Callable[[List[Dict], int], Awaitable[Tuple[discord.Embed, List[discord.File]]]],
+                 per_page: int, first_page: List[Dict]):
+        super().__init__()
+        self.fetch_page = fetch_page
+        self.render = render
+        self.per_page = per_page
+        self.page = 1
+        self._update_buttons(len(first_page))
+    
+    def _update_buttons(self, count: int):
+        self.previous_page.disabled = self.page <= 1
+        self.next_page.disabled = count < self.per_page
+    
+    async def _show(self, interaction: discord.Interaction, page: int):
+        await interaction.response.defer()
+        try:
+            records = await asyncio.wait_for(self.fetch_page(page), timeout=8.0)
+        except Exception as e:
+            logger.error(f"Pagination error: {e}")
+            return
+        if not records:
+            # Ran past the last page
+            self.next_page.disabled = True
+            await interaction.edit_original_response(view=self)
+            return
+        self.page = page
+        self._update_buttons(len(records))
+        embed, files = await self.render(records, page)
+        await interaction.edit_original_response(embed=embed, attachments=files, view=self)
+    
+    @discord.ui.button(label="Previous", emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+    
+    @discord.ui.button(label="Next", emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
+async def send_nli_pages(interaction: discord.Interaction, clients: Dict[str, Any], search_query: str, title: str,
+                         item_label: str, empty_message: str, per_page: int = 5):
+    """Send page 1 of an NLI search with pagination buttons when there is more to show"""
+    nli = clients['nli']
+    records = await asyncio.wait_for(nli.search_page(search_query, per_page=per_page), timeout=8.0)
+    if not records:
+        embed = discord.Embed(title=title, description=empty_message, color=0x8B4513)
+        await interaction.followup.send(embed=embed)
+        return
+    
+    async def render(page_records: List[Dict], page: int) -> Tuple[discord.Embed, List[discord.File]]:
+        embed = build_nli_page_embed(title, page_records, page, per_page, item_label)
+        return embed, await attach_thumbnail(clients.get('images'), embed, page_records)
+    
+    fetch_page = lambda page: nli.search_page(search_query, page=page, per_page=per_page)
+    view = PaginationView(fetch_page, render, per_page, records)
+    embed, files = await render(records, 1)
+    await interaction.followup.send(embed=embed, files=files, view=view)
+
+NLI_COLLECTION_LABELS = {
+    'manuscripts': "📜 Manuscripts",
+    'photos': "📷 Photos",
+    'books': "📚 Books",
+    'maps': "🗺️ Maps",
+    'audio': "🎧 Audio"
+}
+
+async def send_combined_nli_search(interaction: discord.Interaction, nli, query: str):
+    """Search all NLI collections concurrently, editing one embed as each collection arrives"""
+    embed = discord.Embed(title=f"🏛️ Archives: {query}", color=0x8B4513)
+    for collection in COMBINED_SEARCH:
+        embed.add_field(name=NLI_COLLECTION_LABELS[collection], value="⏳ Searching...", inline=False)
+    message = await interaction.followup.send(embed=embed, wait=True)
+    
+    finished = set()
+    async for collection, records in nli.search_all_materials(query, per_type=3, deadline=10.0):
+        finished.add(collection)
+        lines = [f"• {item.get('title', 'Untitled')}"[:150] for item in records[:3]]
+        embed.set_field_at(
+            COMBINED_SEARCH.index(collection),
+            name=NLI_COLLECTION_LABELS[collection],
+            value="\n".join(lines) if lines else "No results",
+            inline=False
+        )
+        await message.edit(embed=embed)
+    
+    if len(finished) < len(COMBINED_SEARCH):
+        for collection in COMBINED_SEARCH:
+            if collection not in finished:
+                embed.set_field_at(COMBINED_SEARCH.index(collection), name=NLI_COLLECTION_LABELS[collection],
+                                   value="Timed out — try this collection on its own", inline=False)
+        await message.edit(embed=embed)
+
+def build_gematria_embed(text: str, library: Optional[GematriaLibrary] = None) -> discord.Embed:
+    """Gematria of the text under every method, computed locally, plus Tanakh words and verses of equal value"""
+    embed = discord.Embed(title="🔢 Gematria Calculation", color=0x800080)
+    embed.add_field(name="Text", value=text[:1024], inline=False)
+    if not gematria.hebrew_letters(text):
+        embed.description = "Enter Hebrew letters to calculate their gematria."
+        return embed
+    values = gematria.values(text)
+    for method, total in values.items():
+        embed.add_field(name=gematria.METHOD_LABELS[method], value=str(total), inline=True)
+    
+    index = library.get() if library else None
+    if index is not None:
+        own = ' '.join(verse_words(text))
+        words = index.lookup(values['standard'], kind='word', limit=8, exclude=own)
+        words += index.lookup(values['standard'], kind='phrase', limit=4, exclude=own)
+        verses = index.lookup(values['standard'], kind='verse', limit=3)
+        if words:
+            embed.add_field(name=f"🟰 Words & Phrases = {values['standard']}",
+                            value=" · ".join(entry['text'] for entry in words)[:1024], inline=False)
+        if verses:
+            embed.add_field(name=f"📜 Verses = {values['standard']}",
+                            value="\n".join(f"**{entry['ref']}** {entry['text'][:150]}" for entry in verses)[:1024], inline=False)
+        if not words and not verses:
+            embed.set_footer(text="No word or verse in Tanakh has the same standard value")
+    elif library:
+        embed.set_footer(text="Tanakh equivalences will appear once the gematria index has been built")
+    return embed
+
+def build_lookup_embed(text_data: Optional[Dict], query: str) -> discord.Embed:
+    """A looked-up text with its Hebrew, or a not-found hint"""
+    if not text_data or not text_data.get('text'):
+        return discord.Embed(title="🔍 Text Not Found", description=f"Could not find '{query}'. Try specific references like 'Genesis 1:1' or 'Shabbat 31a'.", color=0x3498DB)
+    
+    title = text_data.get('title', query)
+    content = text_data.get('text', '')
+    if isinstance(content, list):
+        content = '\n'.join(str(c) for c in content[:3] if c)
+    
+    embed = discord.Embed(title=f"📖 {title}", color=0x2ECC71)
+    embed.description = content[:1500] + "..." if len(content) > 1500 else content
+    
+    # Add Hebrew if available
+    hebrew_text = text_data.get('he', '')
+    if hebrew_text:
+        if isinstance(hebrew_text, list):
+            hebrew_text = '\n'.join(str(h) for h in hebrew_text[:2] if h)
+        if hebrew_text:
+            embed.add_field(name="עברית", value=hebrew_text[:500], inline=False)
+    
+    # Add commentary if available
+    commentary = text_data.get('commentary', '')
+    if commentary:
+        embed.add_field(name="Commentary", value=commentary[:300], inline=False)
+    return embed
+
+
+# A text viewer page holds at most this many segments and roughly this much of each language.
+# The English goes in the description (4096 characters); the Hebrew is split over fields of
+# 1024, and the whole embed must stay under Discord's 6000
+VIEWER_SEGMENTS = 5
+VIEWER_CHARS = 1800
+VIEWER_HEBREW_CHARS = 2400
+_FIELD_CHARS = 1024
+_EMBED_CHARS = 5800
+_HTML_TAGS = re.compile(r'<[^>]+>')
+
+class TextCursor:
+    """One open text viewer: the full text (shared with the client cache, never copied), its page breaks and the current page"""
+    __slots__ = ('text_data', 'english', 'hebrew', 'breaks', 'first', 'page')
+    
+    def __init__(self, text_data: Dict):
+        self.text_data = text_data
+        self.english = _segments(text_data.get('text'))
+        self.hebrew = _segments(text_data.get('he'))
+        # Number segments from the ref's own start ("Genesis 1:3-8" starts at 3)
+        sections = text_data.get('sections') or []
+        depth = text_data.get('textDepth')
+        self.first = sections[-1] if depth and len(sections) == depth and isinstance(sections[-1], int) else 1
+        # A page ends before the segment that would overflow either language
+        self.breaks = [0]
+        english_size = hebrew_size = 0
+        for i in range(max(len(self.english), len(self.hebrew))):
+            english = len(self.english[i]) if i < len(self.english) else 0
+            hebrew = len(self.hebrew[i]) + 8 if i < len(self.hebrew) else 0
+            if i > self.breaks[-1] and (i - self.breaks[-1] >= VIEWER_SEGMENTS
+                                        or english_size + english > VIEWER_CHARS
+                                        or hebrew_size + hebrew > VIEWER_HEBREW_CHARS):
+                self.breaks.append(i)
+                english_size = hebrew_size = 0
+            english_size += english
+            hebrew_size += hebrew
+        self.page = 0
+    
+    @property
+    def pages(self) -> int:
+        return len(self.breaks)
+    
+    def page_range(self, page: int) -> Tuple[int, int]:
+        end = self.breaks[page + 1] if page + 1 < len(self.breaks) else max(len(self.english), len(self.hebrew))
+        return self.breaks[page], end
+
+def _segments(content: Any) -> List[str]:
+    """A text field as a flat list of segment strings with markup removed"""
+    if not content:
+        return []
+    if not isinstance(content, list):
+        content = [content]
+    flat = []
+    for item in content:
+        if isinstance(item, list):
+            flat.extend(str(part) for part in item if part)
+        else:
+            flat.append(str(item) if item else '')
+    return [' '.join(_HTML_TAGS.sub('', segment).split()) for segment in flat]
+
+def _field_chunks(lines: List[str], limit: int = _FIELD_CHARS) -> List[str]:
+    """Lines packed into field values of at most limit characters, splitting an overlong line between words"""
+    chunks, current = [], ''
+    for line in lines:
+        while len(line) > limit:
+            cut = line.rfind(' ', 0, limit)
+            cut = cut if cut > 0 else limit
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(line[:cut])
+            line = line[cut:].lstrip()
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = ''
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_text_page_embed(cursor: TextCursor, query: str) -> discord.Embed:
+    """One page of a text viewer, rendered from memory"""
+    start, end = cursor.page_range(cursor.page)
+    title = cursor.text_data.get('ref') or cursor.text_data.get('title', query)
+    embed = discord.Embed(title=f"📖 {title}", color=0x2ECC71)
+    lines = [f"**{cursor.first + i}** {segment}" for i, segment in enumerate(cursor.english[start:end], start) if segment]
+    description = '\n'.join(lines)
+    embed.description = description[:4000] + "..." if len(description) > 4000 else description
+    hebrew = [f"({cursor.first + i}) {segment}" for i, segment in enumerate(cursor.hebrew[start:end], start) if segment]
+    # Only a single segment longer than a whole page can run past the embed's total size
+    room = _EMBED_CHARS - len(embed.description) - len(embed.title)
+    for i, chunk in enumerate(_field_chunks(hebrew)):
+        if len(chunk) > room:
+            embed.add_field(name="עברית (המשך)" if i else "עברית", value=chunk[:max(room - 3, 0)] + "...", inline=False)
+            break
+        embed.add_field(name="עברית (המשך)" if i else "עברית", value=chunk, inline=False)
+        room -= len(chunk) + 20
+    embed.set_footer(text=f"Page {cursor.page + 1} of {cursor.pages}")
+    return embed
+
+# Cursors of open text viewers by message id; the least recently used go first past the
+# limit, and a viewer's entry (with its hold on the text) is dropped when it times out
+TEXT_CURSORS = LRUCache(maxsize=128)
+
+class TextPageView(BaseView):
+    """Previous/Next over a text fetched once; every page turn is an in-memory render"""
+    def __init__(self, query: str, pages: int):
+        super().__init__()
+        self.query = query
+        self.message_id: Optional[int] = None
+        self._update_buttons(0, pages)
+    
+    def _update_buttons(self, page: int, pages: int):
+        self.previous_page.disabled = page <= 0
+        self.next_page.disabled = page >= pages - 1
+    
+    async def _show(self, interaction: discord.Interaction, step: int):
+        cursor = TEXT_CURSORS.get(interaction.message.id)
+        if cursor is None:
+            # Evicted by newer viewers: leave the page as it is, without buttons
+            self.stop()
+            await interaction.response.edit_message(view=None)
+            return
+        cursor.page = min(max(cursor.page + step, 0), cursor.pages - 1)
+        self._update_buttons(cursor.page, cursor.pages)
+        await interaction.response.edit_message(embed=build_text_page_embed(cursor, self.query), view=self)
+    
+    @discord.ui.button(label="Previous", emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, -1)
+    
+    @discord.ui.button(label="Next", emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, 1)
+    
+    async def on_timeout(self):
+        if self.message_id is not None:
+            TEXT_CURSORS.pop(self.message_id)
+
+async def send_text_viewer(interaction: discord.Interaction, sefaria, query: str, footer: Optional[str] = None):
+    """Send a looked-up text: one embed for a short text, or a paged viewer over all of a longer one"""
+    text_data = await asyncio.wait_for(sefaria.get_text(query, full=True), timeout=10.0)
+    cursor = TextCursor(text_data) if text_data and (text_data.get('text') or text_data.get('he')) else None
+    if cursor is None or cursor.pages <= 1:
+        embed = build_text_page_embed(cursor, query) if cursor else build_lookup_embed(text_data, query)
+        if footer:
+            embed.set_footer(text=footer)
+        await interaction.followup.send(embed=embed)
+        return
+    
+    view = TextPageView(query, cursor.pages)
+    message = await interaction.followup.send(embed=build_text_page_embed(cursor, query), view=view, wait=True)
+    view.message_id = message.id
+    TEXT_CURSORS.set(message.id, cursor)
+
+
+def format_search_hits(hits: List[Dict], limit: int = 3) -> str:
+    """Field value listing a source's top hits"""
+    lines = []
+    for hit in hits[:limit]:
+        line = f"• **{hit['title'][:80]}**"
+        if hit.get('snippet'):
+            line += f" — {hit['snippet'][:90]}"
+        lines.append(line)
+    return "\n".join(lines)[:1024]
+
+def format_ranked_hits(hits: List[Dict], labels: Dict[str, str]) -> str:
+    """Field value for the merged top results, noting every library that found each one"""
+    lines = []
+    for i, hit in enumerate(hits, 1):
+        title = hit['ref'] or hit['title']
+        line = f"{i}. [{title[:80]}]({hit['url']})" if hit.get('url') else f"{i}. **{title[:80]}**"
+        line += " · " + ", ".join(labels.get(name, name) for name in hit['sources'])
+        lines.append(line)
+    return "\n".join(lines)[:1024]
+
+async def send_federated_search(interaction: discord.Interaction, clients: Dict[str, Any], query: str):
+    """Search every library concurrently, filling in one embed field per source as answers arrive
+    
+    The first field holds the merged BM25 top results, re-ranked each time a source answers.
+    """
+    federated = FederatedSearch(clients)
+    ranker = SearchRanker(query)
+    embed = discord.Embed(title=f"🔎 All Libraries: {query}", color=0x3498DB)
+    embed.add_field(name="🏆 Top Results", value="⏳ Searching...", inline=False)
+    for source in federated.sources:
+        embed.add_field(name=source.label, value="⏳ Searching...", inline=False)
+    message = await interaction.followup.send(embed=embed, wait=True)
+    
+    positions = {source.name: i for i, source in enumerate(federated.sources, 1)}
+    labels = {source.name: source.label.split(' ', 1)[-1] for source in federated.sources}
+    answered = set()
+    async for source, hits in federated.stream(query, limit=5):
+        answered.add(source.name)
+        if hits is None:
+            value = "Unavailable right now"
+        else:
+            value = format_search_hits(hits) or "No results"
+            ranker.add(hits)
+        embed.set_field_at(positions[source.name], name=source.label, value=value, inline=False)
+        top = ranker.top(5)
+        embed.set_field_at(0, name="🏆 Top Results",
+                           value=format_ranked_hits(top, labels) if top else "⏳ Searching...", inline=False)
+        await message.edit(embed=embed)
+    
+    if len(answered) < len(federated.sources) or not ranker.top(1):
+        for source in federated.sources:
+            if source.name not in answered:
+                embed.set_field_at(positions[source.name], name=source.label, value="Timed out", inline=False)
+        if not ranker.top(1):
+            embed.set_field_at(0, name="🏆 Top Results", value="No matching results", inline=False)
+        await message.edit(embed=embed)
+
 class StudyView(BaseView):
     def __init__(self, clients: Dict[str, Any]):
         super().__init__()
@@ -130,6 +562,10 @@ class ArchivesView(BaseView):
     @discord.ui.button(label="Maps", emoji="🗺️", style=discord.ButtonStyle.primary)
     async def maps(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.send_modal(ArchiveSearchModal(self.clients, "maps"))
+    
+    @discord.ui.button(label="All Collections", emoji="🏛️", style=discord.ButtonStyle.success)
+    async def all_collections(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(ArchiveSearchModal(self.clients, "all"))
 
 class HelpNavigationView(BaseView):
     """Navigation for help pages"""
@@ -164,22 +600,22 @@ class HelpNavigationView(BaseView):
         )
         embed.add_field(
             name="🏓 Core Commands",
-            value="`/ping` `/help` `/study` `/search` `/archives` `/advanced`",
+            value="`/ping` `/help` `/study` `/search` `/searchall` `/archives` `/advanced` `/autorefs`",
             inline=False
         )
         embed.add_field(
             name="📚 Study Commands", 
-            value="`/random` `/daily` `/wisdom` `/tanya` `/categories`",
+            value="`/lookup` `/random` `/daily` `/wisdom` `/tanya` `/dafyomi` `/categories`",
             inline=False
         )
         embed.add_field(
             name="📅 Calendar Commands",
-            value="`/calendar` `/shabbat` `/holidays`",
+            value="`/calendar` `/shabbat` `/holidays` `/centers`",
             inline=False
         )
         embed.add_field(
             name="🏛️ Archive Commands",
-            value="`/manuscripts` `/photos` `/books`",
+            value="`/manuscripts` `/photos` `/archivesearch` `/books` `/bookexcerpt`",
             inline=False
         )
         embed.add_field(
@@ -234,6 +670,10 @@ class SearchCenterView(BaseView):
     async def commentary_search(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.send_modal(CommentarySearchModal(self.clients))
     
+    @discord.ui.button(label="All Libraries", emoji="🔎", style=discord.ButtonStyle.success)
+    async def all_libraries(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(FederatedSearchModal(self.clients))
+    
     @discord.ui.button(label="Hebrew Search", emoji="🔤", style=discord.ButtonStyle.success)
     async def hebrew_search(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.send_modal(HebrewSearchModal(self.clients))
@@ -280,13 +720,11 @@ class DailyLearningView(BaseView):
     async def daily_tanya(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
         try:
-            from datetime import date
-            today = date.today()
-            day_of_year = today.timetuple().tm_yday
-            chapter_num = ((day_of_year - 1) % 53) + 1
+            lesson = self.clients['learning'].tanya(date.today())
+            chapter_num = lesson['chapter']
             
-            # Try to get real Tanya content from Sefaria
-            tanya_ref = f"Tanya, Likutei Amarim, Chapter {chapter_num}"
+            # Fetch the chapter nearest today's Chitas portion
+            tanya_ref = lesson['refs'][0]
             text_data = await asyncio.wait_for(self.clients['sefaria'].get_text(tanya_ref), timeout=10.0)
             
             embed = discord.Embed(title="📚 Today's Tanya Lesson", color=0xE67E22)
@@ -307,7 +745,7 @@ class DailyLearningView(BaseView):
             else:
                 embed.description = f"**Chapter {chapter_num} - Daily Study**\n\n*'The Divine soul is literally part of God above'*\n\nReflect on the divine spark within yourself and all beings."
                 
-            embed.set_footer(text=f"Daily study cycle - Chapter {chapter_num} of 53")
+            embed.set_footer(text=f"{lesson['hebrew_date']} • {lesson['title']} {chapter_num} • approximate; the Chitas portion may differ")
             await interaction.followup.send(embed=embed)
             
         except Exception as e:
@@ -315,6 +753,17 @@ class DailyLearningView(BaseView):
             embed = discord.Embed(title="📚 Tanya Study", description="*'Every descent is for the purpose of a subsequent ascent'* - Study today's Tanya lesson", color=0xE67E22)
             await interaction.followup.send(embed=embed)
     
+    @discord.ui.button(label="Daf Yomi", emoji="📜", style=discord.ButtonStyle.primary)
+    async def daf_yomi(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.defer()
+        try:
+            embed = await build_daf_yomi_embed(self.clients, date.today())
+            await interaction.followup.send(embed=embed)
+        except Exception as e:
+            logger.error(f"Daf Yomi error: {e}")
+            embed = discord.Embed(title="📜 Daf Yomi", description="*'Turn it over and over, for everything is in it.'* - Pirkei Avot 5:22", color=0x16A085)
+            await interaction.followup.send(embed=embed)
+    
     @discord.ui.button(label="Chassidic Wisdom", emoji="✡️", style=discord.ButtonStyle.secondary)
     async def chassidic_wisdom(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
@@ -431,7 +880,7 @@ class SimpleAdvancedView(BaseView):
     
     @discord.ui.button(label="Calculate Gematria", emoji="🔢", style=discord.ButtonStyle.primary)
     async def gematria_calc(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_modal(SimpleGematriaModal())
+        await interaction.response.send_modal(SimpleGematriaModal(self.clients.get('gematria')))
     
     @discord.ui.button(label="Translate Text", emoji="🌐", style=discord.ButtonStyle.secondary)
     async def translate_text(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -643,18 +1092,13 @@ class ExploreView(BaseView):
 class SimpleGematriaModal(discord.ui.Modal, title='Calculate Gematria'):
     text = discord.ui.TextInput(label='Hebrew Text', placeholder='e.g., שלום, אמת, תורה', max_length=100)
     
+    def __init__(self, library: Optional[GematriaLibrary] = None):
+        super().__init__()
+        self.library = library
+    
     async def on_submit(self, interaction: discord.Interaction):
-        await interaction.response.defer()
-        hebrew_values = {
-            'א': 1, 'ב': 2, 'ג': 3, 'ד': 4, 'ה': 5, 'ו': 6, 'ז': 7, 'ח': 8, 'ט': 9,
-            'י': 10, 'כ': 20, 'ל': 30, 'מ': 40, 'נ': 50, 'ס': 60, 'ע': 70, 'פ': 80, 'צ': 90,
-            'ק': 100, 'ר': 200, 'ש': 300, 'ת': 400, 'ך': 20, 'ם': 40, 'ן': 50, 'ף': 80, 'ץ': 90
-        }
-        total = sum(hebrew_values.get(char, 0) for char in self.text.value)
-        embed = discord.Embed(title="🔢 Gematria Calculation", color=0x800080)
-        embed.add_field(name="Text", value=self.text.value, inline=True)
-        embed.add_field(name="Value", value=str(total), inline=True)
-        await interaction.followup.send(embed=embed)
+        # Computed locally, so answer at once instead of deferring
+        await interaction.response.send_message(embed=build_gematria_embed(self.text.value, self.library))
 
 class SimpleTranslateModal(discord.ui.Modal, title='Translate Text'):
     text = discord.ui.TextInput(label='Text', placeholder='Enter text in any language', style=discord.TextStyle.paragraph, max_length=500)
@@ -707,7 +1151,7 @@ class AdvancedView(BaseView):
     
     @discord.ui.button(label="Gematria", emoji="🔢", style=discord.ButtonStyle.danger)
     async def gematria(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_modal(GematriaModal())
+        await interaction.response.send_modal(GematriaModal(self.clients.get('gematria')))
     
     @discord.ui.button(label="Torah Calc", emoji="📊", style=discord.ButtonStyle.danger)
     async def torah_calc(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -815,28 +1259,16 @@ class ArchiveSearchModal(discord.ui.Modal, title='Search Archives'):
     
     async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.defer()
-        results = None
         try:
-            if self.archive_type == "manuscripts":
-                results = await asyncio.wait_for(self.clients['nli'].search_hebrew_manuscripts(self.query.value), timeout=8.0)
-            elif self.archive_type == "photos":
-                results = await asyncio.wait_for(self.clients['nli'].search_historical_photos(self.query.value), timeout=8.0)
-            elif self.archive_type == "books":
-                results = await asyncio.wait_for(self.clients['nli'].search_jewish_books(self.query.value), timeout=8.0)
-            elif self.archive_type == "maps":
-                results = await asyncio.wait_for(self.clients['nli'].search_historical_maps(self.query.value), timeout=8.0)
-            else:
-                results = []
-            
-            embed = discord.Embed(title=f"🏛️ {self.archive_type.title()}: {self.query.value}", color=0x8B4513)
-            if results and isinstance(results, list):
-                for i, item in enumerate(results[:3], 1):
-                    title = item.get('title', f'Item {i}')
-                    desc = item.get('description', 'Historical archive item')
-                    embed.add_field(name=f"{i}. {title}", value=desc[:150], inline=False)
-            else:
-                embed.description = f"No {self.archive_type} found for your search."
-            await interaction.followup.send(embed=embed)
+            if self.archive_type == "all":
+                await send_combined_nli_search(interaction, self.clients['nli'], self.query.value)
+                return
+            await send_nli_pages(
+                interaction, self.clients, collection_query(self.query.value, self.archive_type),
+                title=f"🏛️ {self.archive_type.title()}: {self.query.value}",
+                item_label="Item",
+                empty_message=f"No {self.archive_type} found for your search."
+            )
         except Exception as e:
             logger.error(f"Archive search error: {e}")
             embed = discord.Embed(title=f"🏛️ {self.archive_type.title()} Archives", description="Historical Jewish archives from National Library of Israel", color=0x8B4513)
@@ -845,18 +1277,13 @@ class ArchiveSearchModal(discord.ui.Modal, title='Search Archives'):
 class GematriaModal(discord.ui.Modal, title='Gematria Calculator'):
     text = discord.ui.TextInput(label='Hebrew Text', placeholder='e.g., שלום, תורה, אמת', max_length=100)
     
+    def __init__(self, library: Optional[GematriaLibrary] = None):
+        super().__init__()
+        self.library = library
+    
     async def on_submit(self, interaction: discord.Interaction):
-        await interaction.response.defer()
-        hebrew_values = {
-            'א': 1, 'ב': 2, 'ג': 3, 'ד': 4, 'ה': 5, 'ו': 6, 'ז': 7, 'ח': 8, 'ט': 9,
-            'י': 10, 'כ': 20, 'ל': 30, 'מ': 40, 'נ': 50, 'ס': 60, 'ע': 70, 'פ': 80, 'צ': 90,
-            'ק': 100, 'ר': 200, 'ש': 300, 'ת': 400, 'ך': 20, 'ם': 40, 'ן': 50, 'ף': 80, 'ץ': 90
-        }
-        total = sum(hebrew_values.get(char, 0) for char in self.text.value)
-        embed = discord.Embed(title="🔢 Gematria Calculation", color=0x800080)
-        embed.add_field(name="Text", value=self.text.value, inline=True)
-        embed.add_field(name="Standard Value", value=str(total), inline=True)
-        await interaction.followup.send(embed=embed)
+        # Computed locally, so answer at once instead of deferring
+        await interaction.response.send_message(embed=build_gematria_embed(self.text.value, self.library))
 
 class TorahCalcModal(discord.ui.Modal, title='Torah Calculations'):
     def __init__(self, clients: Dict[str, Any]):
@@ -914,35 +1341,8 @@ class DirectLookupModal(discord.ui.Modal, title='Direct Text Lookup'):
         await interaction.response.defer()
         try:
             query = self.query.value.strip()
-            text_data = await asyncio.wait_for(self.clients['sefaria'].get_text(query), timeout=10.0)
-            
-            if text_data and text_data.get('text'):
-                title = text_data.get('title', query)
-                content = text_data.get('text', '')
-                
-                if isinstance(content, list):
-                    content = '\n'.join(str(c) for c in content[:3] if c)
-                
-                embed = discord.Embed(title=f"📖 {title}", color=0x2ECC71)
-                embed.description = content[:1500] + "..." if len(content) > 1500 else content
-                
-                # Add Hebrew if available
-                hebrew_text = text_data.get('he', '')
-                if hebrew_text:
-                    if isinstance(hebrew_text, list):
-                        hebrew_text = '\n'.join(str(h) for h in hebrew_text[:2] if h)
-                    if hebrew_text:
-                        embed.add_field(name="עברית", value=hebrew_text[:500], inline=False)
-                
-                # Add commentary if available
-                commentary = text_data.get('commentary', '')
-                if commentary:
-                    embed.add_field(name="Commentary", value=commentary[:300], inline=False)
-                        
-            else:
-                embed = discord.Embed(title="🔍 Text Not Found", description=f"Could not find '{query}'. Try specific references like 'Genesis 1:1' or 'Shabbat 31a'.", color=0x3498DB)
-                    
-            await interaction.followup.send(embed=embed)
+            await send_text_viewer(interaction, self.clients['sefaria'], query,
+                                   footer="Tip: /lookup suggests books, chapters and verses as you type")
             
         except Exception as e:
             logger.error(f"Direct lookup error: {e}")
@@ -982,6 +1382,22 @@ class TopicSearchModal(discord.ui.Modal, title='Topic Search'):
             embed = discord.Embed(title="🎯 Topic Search", description="Search for themes like 'love', 'justice', 'prayer', 'wisdom', or 'charity'", color=0x8E44AD)
             await interaction.followup.send(embed=embed)
 
+class FederatedSearchModal(discord.ui.Modal, title='Search All Libraries'):
+    def __init__(self, clients: Dict[str, Any]):
+        super().__init__()
+        self.clients = clients
+    
+    query = discord.ui.TextInput(label='Search Query', placeholder='e.g., Tanya, Shabbat, Rambam, tefillin', max_length=100)
+    
+    async def on_submit(self, interaction: discord.Interaction):
+        await interaction.response.defer()
+        try:
+            await send_federated_search(interaction, self.clients, self.query.value.strip())
+        except Exception as e:
+            logger.error(f"Federated search error: {e}")
+            embed = discord.Embed(title="🔎 All Libraries", description="Search Sefaria, Dicta, the National Library, Orayta and Chabad.org together", color=0x3498DB)
+            await interaction.followup.send(embed=embed)
+
 class RandomSearchModal(discord.ui.Modal, title='Random Text Discovery'):
     def __init__(self, clients: Dict[str, Any]):
         super().__init__()
@@ -1121,8 +1537,9 @@ class DictaSearchModal(discord.ui.Modal, title='Search AI-Enhanced Books'):
             if results and isinstance(results, list):
                 for i, book in enumerate(results[:3], 1):
                     title = book.get('title', f'Book {i}')
-                    author = book.get('author', 'Unknown')
+                    author = book.get('author') or book.get('authorEnglish') or 'Unknown'
                     embed.add_field(name=f"{i}. {title}", value=f"By: {author}", inline=False)
+                embed.set_footer(text="Tip: /books suggests titles as you type")
             else:
                 embed.description = "No books found. Try different search terms."
             await interaction.followup.send(embed=embed)
@@ -1168,11 +1585,23 @@ class ComprehensiveCommands(commands.Cog):
         embed.add_field(name="🎲 Random Discovery", value="Get random texts with filters", inline=True)
         embed.add_field(name="💬 Commentary Search", value="Find texts with commentaries", inline=True)
         embed.add_field(name="🔤 Hebrew Search", value="Search Hebrew text directly", inline=True)
+        embed.add_field(name="🔎 All Libraries", value="Search every library at once", inline=True)
         embed.set_footer(text="Enhanced search with Hebrew/English support • Click to begin")
         
         view = SearchCenterView(self.clients)
         await interaction.response.send_message(embed=embed, view=view)
     
+    @app_commands.command(name="searchall", description="Search Sefaria, Dicta, NLI, Orayta and Chabad.org at once")
+    @app_commands.describe(query="Text, topic or book to look for")
+    async def searchall_direct(self, interaction: discord.Interaction, query: str):
+        await interaction.response.defer()
+        try:
+            await send_federated_search(interaction, self.clients, query)
+        except Exception as e:
+            logger.error(f"Federated search error: {e}")
+            embed = discord.Embed(title="🔎 All Libraries", description="Search Sefaria, Dicta, the National Library, Orayta and Chabad.org together", color=0x3498DB)
+            await interaction.followup.send(embed=embed)
+    
     @app_commands.command(name="archives", description="Historical Jewish archives")
     async def archives(self, interaction: discord.Interaction):
         embed = discord.Embed(title="🏛️ National Library of Israel Archives", description="Explore historical Jewish materials:", color=0x8B4513)
@@ -1273,17 +1702,8 @@ class ComprehensiveCommands(commands.Cog):
     @app_commands.command(name="gematria", description="Calculate gematria values for Hebrew text")
     @app_commands.describe(text="Hebrew text to calculate")
     async def gematria_direct(self, interaction: discord.Interaction, text: str):
-        await interaction.response.defer()
-        hebrew_values = {
-            'א': 1, 'ב': 2, 'ג': 3, 'ד': 4, 'ה': 5, 'ו': 6, 'ז': 7, 'ח': 8, 'ט': 9,
-            'י': 10, 'כ': 20, 'ל': 30, 'מ': 40, 'נ': 50, 'ס': 60, 'ע': 70, 'פ': 80, 'צ': 90,
-            'ק': 100, 'ר': 200, 'ש': 300, 'ת': 400, 'ך': 20, 'ם': 40, 'ן': 50, 'ף': 80, 'ץ': 90
-        }
-        total = sum(hebrew_values.get(char, 0) for char in text)
-        embed = discord.Embed(title="🔢 Gematria Calculation", color=0x800080)
-        embed.add_field(name="Text", value=text, inline=True)
-        embed.add_field(name="Standard Value", value=str(total), inline=True)
-        await interaction.followup.send(embed=embed)
+        # Computed locally, so answer at once instead of deferring
+        await interaction.response.send_message(embed=build_gematria_embed(text, self.clients.get('gematria')))
     
     @app_commands.command(name="translate", description="Translate text between languages")
     @app_commands.describe(text="Text to translate", target_language="Target language (e.g., english, hebrew)")
@@ -1307,41 +1727,70 @@ class ComprehensiveCommands(commands.Cog):
     async def manuscripts_direct(self, interaction: discord.Interaction, query: str):
         await interaction.response.defer()
         try:
-            results = await asyncio.wait_for(self.clients['nli'].search_hebrew_manuscripts(query), timeout=8.0)
-            embed = discord.Embed(title=f"📜 Hebrew Manuscripts: {query}", color=0x8B4513)
-            if results and isinstance(results, list):
-                for i, item in enumerate(results[:3], 1):
-                    title = item.get('title', f'Manuscript {i}')
-                    desc = item.get('description', 'Historical manuscript')
-                    embed.add_field(name=f"{i}. {title}", value=desc[:150], inline=False)
-            else:
-                embed.description = "No manuscripts found for your search."
-            await interaction.followup.send(embed=embed)
+            await send_nli_pages(
+                interaction, self.clients, material_query(query, MATERIAL_TYPES['manuscripts']),
+                title=f"📜 Hebrew Manuscripts: {query}",
+                item_label="Manuscript",
+                empty_message="No manuscripts found for your search."
+            )
         except Exception as e:
             logger.error(f"Manuscripts search error: {e}")
             embed = discord.Embed(title="📜 Hebrew Manuscripts", description="Historical Hebrew manuscripts from National Library of Israel", color=0x8B4513)
             await interaction.followup.send(embed=embed)
     
+    @app_commands.command(name="archivesearch", description="Search all National Library of Israel collections at once")
+    @app_commands.describe(query="Search terms for manuscripts, photos, books, maps and audio")
+    async def archivesearch_direct(self, interaction: discord.Interaction, query: str):
+        await interaction.response.defer()
+        try:
+            await send_combined_nli_search(interaction, self.clients['nli'], query)
+        except Exception as e:
+            logger.error(f"Combined archive search error: {e}")
+            embed = discord.Embed(title="🏛️ Archives", description="Historical Jewish archives from National Library of Israel", color=0x8B4513)
+            await interaction.followup.send(embed=embed)
+    
     @app_commands.command(name="photos", description="Search historical Jewish photographs")
     @app_commands.describe(query="Search terms for historical photos")
     async def photos_direct(self, interaction: discord.Interaction, query: str):
         await interaction.response.defer()
         try:
-            results = await asyncio.wait_for(self.clients['nli'].search_historical_photos(query), timeout=8.0)
-            embed = discord.Embed(title=f"📷 Historical Photos: {query}", color=0x8B4513)
-            if results and isinstance(results, list):
-                for i, item in enumerate(results[:3], 1):
-                    title = item.get('title', f'Photo {i}')
-                    desc = item.get('description', 'Historical photograph')
-                    embed.add_field(name=f"{i}. {title}", value=desc[:150], inline=False)
-            else:
-                embed.description = "No photos found for your search."
-            await interaction.followup.send(embed=embed)
+            await send_nli_pages(
+                interaction, self.clients, material_query(query, MATERIAL_TYPES['photos']),
+                title=f"📷 Historical Photos: {query}",
+                item_label="Photo",
+                empty_message="No photos found for your search."
+            )
         except Exception as e:
             logger.error(f"Photos search error: {e}")
             embed = discord.Embed(title="📷 Historical Photos", description="Jewish historical photography collection", color=0x8B4513)
             await interaction.followup.send(embed=embed)
     
+    @app_commands.command(name="centers", description="Find the nearest Chabad centers to a city")
+    @app_commands.describe(location="City, e.g. London, Miami, Jerusalem")
+    async def centers_direct(self, interaction: discord.Interaction, location: str):
+        await interaction.response.defer()
+        if not self.clients['chabad'].directory_configured:
+            embed = discord.Embed(title="🕍 Chabad Centers", description="The center directory is not configured on this bot (CHABAD_DIRECTORY_URL), so nearby centers can't be looked up. Find a center at chabad.org/centers.", color=0xE67E22)
+            await interaction.followup.send(embed=embed)
+            return
+        try:
+            centers = await asyncio.wait_for(self.clients['chabad'].find_centers(location, limit=5), timeout=10.0)
+            embed = discord.Embed(title=f"🕍 Chabad Centers near {location}", color=0xE67E22)
+            if centers:
+                for center in centers:
+                    details = [part for part in (center.get('address'), center.get('city'), center.get('phone')) if part]
+                    details.append(f"{center['distance_km']} km away")
+                    if center.get('url'):
+                        details.append(center['url'])
+                    embed.add_field(name=center.get('name', 'Chabad House')[:256], value="\n".join(details)[:1024], inline=False)
+            else:
+                embed.description = "No nearby centers found. Try a major city name, or visit chabad.org/centers."
+            await interaction.followup.send(embed=embed)
+        except Exception as e:
+            logger.error(f"Chabad centers error: {e}")
+            embed = discord.Embed(title="🕍 Chabad Centers", description="Find a Chabad center near you at chabad.org/centers", color=0xE67E22)
+            await interaction.followup.send(embed=embed)
+    
     @app_commands.command(name="wisdom", description="Get daily Chassidic wisdom from Chabad.org")
     async def wisdom_direct(self, interaction: discord.Interaction):
         await interaction.response.defer()
@@ -1364,18 +1813,11 @@ class ComprehensiveCommands(commands.Cog):
     async def tanya_direct(self, interaction: discord.Interaction):
         await interaction.response.defer()
         try:
-            # Try to get real Tanya content from Sefaria first
-            from datetime import date
-            
-            # Calculate today's Tanya lesson based on date
-            today = date.today()
-            day_of_year = today.timetuple().tm_yday
-            
-            # Tanya has daily lessons, cycle through chapters
-            chapter_num = ((day_of_year - 1) % 53) + 1  # Tanya has 53 chapters in Likutei Amarim
+            # Nearest chapter to today's portion of the yearly Chitas cycle
+            lesson = self.clients['learning'].tanya(date.today())
+            chapter_num = lesson['chapter']
             
-            # Try to get from Sefaria
-            tanya_ref = f"Tanya, Likutei Amarim, Chapter {chapter_num}"
+            tanya_ref = lesson['refs'][0]
             text_data = await asyncio.wait_for(self.clients['sefaria'].get_text(tanya_ref), timeout=8.0)
             
             embed = discord.Embed(title="📖 Today's Tanya Lesson", color=0xE67E22)
@@ -1398,7 +1840,7 @@ class ComprehensiveCommands(commands.Cog):
                 embed.description = f"**Chapter {chapter_num} Study**\n\n*'The Divine soul... is literally part of God above'*\n\nStudy today's Tanya lesson for spiritual growth and understanding of the soul's divine nature."
                 embed.add_field(name="Daily Practice", value="Reflect on the divine spark within yourself and all beings.", inline=False)
             
-            embed.set_footer(text="Based on the Alter Rebbe's daily study cycle")
+            embed.set_footer(text=f"{lesson['hebrew_date']} • {lesson['title']} {chapter_num} • approximate; the Chitas portion may differ")
             await interaction.followup.send(embed=embed)
             
         except Exception as e:
@@ -1406,6 +1848,18 @@ class ComprehensiveCommands(commands.Cog):
             embed = discord.Embed(title="📖 Tanya Study", description="*'Every descent is for the purpose of a subsequent ascent'* - Tanya\n\nStudy today's Tanya lesson for spiritual insights.", color=0xE67E22)
             await interaction.followup.send(embed=embed)
     
+    @app_commands.command(name="dafyomi", description="Today's Daf Yomi, Rambam and Mishnah Yomit")
+    @app_commands.describe(days_ahead="Show the schedule for a later day (0 = today)")
+    async def dafyomi_direct(self, interaction: discord.Interaction, days_ahead: app_commands.Range[int, 0, 30] = 0):
+        await interaction.response.defer()
+        try:
+            embed = await build_daf_yomi_embed(self.clients, date.today() + timedelta(days=days_ahead))
+            await interaction.followup.send(embed=embed)
+        except Exception as e:
+            logger.error(f"Daf Yomi error: {e}")
+            embed = discord.Embed(title="📜 Daf Yomi", description="*'Turn it over and over, for everything is in it.'* - Pirkei Avot 5:22", color=0x16A085)
+            await interaction.followup.send(embed=embed)
+    
     @app_commands.command(name="books", description="Search AI-enhanced Jewish books")
     @app_commands.describe(query="Search terms for Jewish books")
     async def books_direct(self, interaction: discord.Interaction, query: str):
@@ -1416,8 +1870,13 @@ class ComprehensiveCommands(commands.Cog):
             if results and isinstance(results, list):
                 for i, book in enumerate(results[:5], 1):
                     title = book.get('title', f'Book {i}')
-                    author = book.get('author', 'Unknown')
+                    author = book.get('author') or book.get('authorEnglish') or 'Unknown'
                     embed.add_field(name=f"{i}. {title}", value=f"By: {author}", inline=False)
+                categories = sorted({book.get('categoryEnglish') for book in results if book.get('categoryEnglish')})
+                if categories:
+                    embed.set_footer(text=f"Categories: {', '.join(categories)}")
+            elif not self.clients['dicta'].catalog_available:
+                embed.description = "The Dicta library catalog could not be loaded. Try again in a few minutes."
             else:
                 embed.description = "No books found. Try different search terms."
             await interaction.followup.send(embed=embed)
@@ -1426,6 +1885,89 @@ class ComprehensiveCommands(commands.Cog):
             embed = discord.Embed(title="📖 Jewish Books", description="Access to 800+ Jewish books with AI processing from Dicta", color=0x9932CC)
             await interaction.followup.send(embed=embed)
     
+    @books_direct.autocomplete('query')
+    async def books_query_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+        books = self.clients['dicta'].suggest_books(current, limit=25)
+        return [
+            app_commands.Choice(name=book['title'][:100], value=book['title'][:100])
+            for book in books if book.get('title')
+        ]
+    
+    @app_commands.command(name="bookexcerpt", description="Read a passage from a Dicta book")
+    @app_commands.describe(book="Book title", paragraph="Paragraph to start from (1 = beginning)")
+    async def bookexcerpt_direct(self, interaction: discord.Interaction, book: str, paragraph: app_commands.Range[int, 1, 100000] = 1):
+        await interaction.response.defer()
+        try:
+            excerpt = await asyncio.wait_for(self.clients['dicta'].get_book_excerpt(book, paragraph - 1), timeout=60.0)
+            if not excerpt:
+                embed = discord.Embed(title=f"📖 {book}", description="This book's text isn't available right now.", color=0x9932CC)
+            elif not excerpt['paragraphs']:
+                embed = discord.Embed(title=f"📖 {excerpt['title']}", description=f"This book has {excerpt['total_paragraphs']} paragraphs.", color=0x9932CC)
+            else:
+                text = "\n\n".join(excerpt['paragraphs'])
+                embed = discord.Embed(title=f"📖 {excerpt['title']}", description=text[:4000], color=0x9932CC)
+                if excerpt.get('author'):
+                    embed.add_field(name="Author", value=excerpt['author'], inline=True)
+                last = paragraph + len(excerpt['paragraphs']) - 1
+                embed.set_footer(text=f"Paragraphs {paragraph}-{last} of {excerpt['total_paragraphs']} • Dicta")
+            await interaction.followup.send(embed=embed)
+        except Exception as e:
+            logger.error(f"Book excerpt error: {e}")
+            embed = discord.Embed(title="📖 Jewish Books", description="Couldn't load the book text. Try again later.", color=0x9932CC)
+            await interaction.followup.send(embed=embed)
+    
+    @bookexcerpt_direct.autocomplete('book')
+    async def bookexcerpt_book_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+        return await self.books_query_autocomplete(interaction, current)
+    
+    @app_commands.command(name="lookup", description="Look up a Sefaria text by reference")
+    @app_commands.describe(reference="Book, chapter and verse (or daf), e.g. Genesis 1:1 or Shabbat 31a")
+    async def lookup_direct(self, interaction: discord.Interaction, reference: str):
+        await interaction.response.defer()
+        try:
+            await send_text_viewer(interaction, self.clients['sefaria'], reference)
+        except Exception as e:
+            logger.error(f"Lookup error: {e}")
+            embed = discord.Embed(title="📖 Text Lookup", description="Try specific references like 'Genesis 1:1', 'Talmud Shabbat 31a', or 'Pirkei Avot 1:1'", color=0x3498DB)
+            await interaction.followup.send(embed=embed)
+    
+    @lookup_direct.autocomplete('reference')
+    async def lookup_reference_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+        # Local trie and shape tables only, so suggestions arrive well inside Discord's 3 s window
+        return [
+            app_commands.Choice(name=ref[:100], value=ref[:100])
+            for ref in self.clients['sefaria'].refs.suggest(current, limit=25)
+        ]
+    
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        """Answer references quoted in chat ("see Berakhot 2a"), in guilds that turned it on with /autorefs"""
+        if message.author.bot or not message.guild or not message.content:
+            return
+        if not self.clients['settings'].get(message.guild.id, 'inline_refs', False):
+            return
+        refs = self.clients['sefaria'].ref_detector.find(message.content)
+        if not refs:
+            return
+        try:
+            # One batched fetch for all the refs in the message
+            texts = await asyncio.wait_for(self.clients['sefaria'].get_texts([ref.key for ref in refs]), timeout=10.0)
+            embeds = [build_lookup_embed(text_data, ref.key) for ref, text_data in zip(refs, texts) if text_data]
+            if embeds:
+                await message.reply(embeds=embeds, mention_author=False)
+        except Exception as e:
+            logger.error(f"Inline reference error: {e}")
+    
+    @app_commands.command(name="autorefs", description="Turn automatic replies to quoted references on or off for this server")
+    @app_commands.describe(enabled="Reply with the text when a message quotes a reference like 'Berakhot 2a'")
+    @app_commands.guild_only()
+    @app_commands.default_permissions(manage_guild=True)
+    async def autorefs_direct(self, interaction: discord.Interaction, enabled: bool):
+        self.clients['settings'].set(interaction.guild_id, 'inline_refs', enabled)
+        state = "on" if enabled else "off"
+        embed = discord.Embed(title="📖 Inline References", description=f"Automatic replies to quoted references are now **{state}** for this server.", color=0x2ECC71)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+    
     @app_commands.command(name="random", description="Get random Jewish text from Sefaria")
     @app_commands.describe(category="Optional category (torah, talmud, mishnah, etc.)")
     async def random_direct(self, interaction: discord.Interaction, category: Optional[str] = None):
@@ -1456,6 +1998,7 @@ class ComprehensiveCommands(commands.Cog):
         embed.add_field(name="📖 Torah Portion", value="Weekly parsha", inline=True)
         embed.add_field(name="📚 Tanya Lesson", value="Daily mystical study", inline=True)
         embed.add_field(name="✡️ Chassidic Wisdom", value="Daily teaching", inline=True)
+        embed.add_field(name="📜 Daf Yomi", value="Daf, Rambam & Mishnah Yomit", inline=True)
         embed.add_field(name="🎲 Random Text", value="Surprise me!", inline=True)
         embed.set_footer(text="Simple one-click learning")
         
@@ -1552,10 +2095,13 @@ async def setup(bot):
     from .orayta_client import OraytaClient
     from .opensiddur_client import OpenSiddurClient
     from .pninim_client import PninimClient
+    from .learning_schedule import LearningSchedule
+    from .image_cache import ImageCache
     
     # Initialize ALL clients for complete functionality
+    sefaria = SefariaClient()
     clients = {
-        'sefaria': SefariaClient(),
+        'sefaria': sefaria,
         'hebcal': HebcalClient(),
         'nli': NLIClient(),
         'chabad': ChabadClient(),
@@ -1565,7 +2111,11 @@ async def setup(bot):
         'torahcalc': TorahCalcClient(),
         'orayta': OraytaClient(),
         'opensiddur': OpenSiddurClient(),
-        'pninim': PninimClient()
+        'pninim': PninimClient(),
+        'learning': LearningSchedule(),
+        'images': ImageCache(),
+        'gematria': GematriaLibrary(sefaria),
+        'settings': GuildSettings()
     }
     
     await bot.add_cog(ComprehensiveCommands(bot, **clients))
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Compact columnar storage for the Dicta books catalog
+"""
+import logging
+import os
+import pickle
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Free-text columns kept per book; everything else in books.json is dropped
+TEXT_FIELDS = ('displayName', 'displayNameEnglish', 'author', 'authorEnglish', 'fileName')
+
+
+class DictaCatalog:
+    """Dicta catalog held as parallel columns instead of one dict per book"""
+
+    def __init__(self):
+        self.columns: Dict[str, List[str]] = {field: [] for field in TEXT_FIELDS}
+        # (english, hebrew) pairs referenced by small integer IDs
+        self.categories: List[Tuple[str, str]] = []
+        self.locations: List[Tuple[str, str]] = []
+        self.category_ids = array('H')
+        self.location_ids = array('H')
+        self.years = array('h')  # 0 when the print year is unknown
+
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+
+        # Aggregates, recomputed whenever the columns are replaced
+        self.category_counts = array('I')
+        self.author_count = 0
+        self.location_count = 0
+        self.year_histogram: Dict[int, int] = {}  # Books per decade
+        self.sorted_years = array('h')  # Known print years, ascending
+        self.year_order = array('I')  # Book index for each entry of sorted_years
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    @classmethod
+    def from_books(cls, books: Iterable[Dict], etag: Optional[str] = None,
+                   last_modified: Optional[str] = None) -> 'DictaCatalog':
+        """Build a catalog from the raw books.json entries"""
+        catalog = cls()
+        catalog.etag = etag
+        catalog.last_modified = last_modified
+        category_index: Dict[Tuple[str, str], int] = {}
+        location_index: Dict[Tuple[str, str], int] = {}
+
+        for book in books:
+            if not isinstance(book, dict):
+                continue
+
+            for field in TEXT_FIELDS:
+                value = book.get(field) or ''
+                catalog.columns[field].append(sys.intern(str(value)))
+
+            category = (book.get('categoryEnglish') or '', book.get('category') or '')
+            if category not in category_index:
+                category_index[category] = len(catalog.categories)
+                catalog.categories.append((sys.intern(category[0]), sys.intern(category[1])))
+            catalog.category_ids.append(category_index[category])
+
+            location = (book.get('printLocationEnglish') or '', book.get('printLocation') or '')
+            if location not in location_index:
+                location_index[location] = len(catalog.locations)
+                catalog.locations.append((sys.intern(location[0]), sys.intern(location[1])))
+            catalog.location_ids.append(location_index[location])
+
+            year = book.get('printYear')
+            catalog.years.append(year if isinstance(year, int) and -32768 < year < 32768 else 0)
+
+        catalog._compute_aggregates()
+        return catalog
+
+    def _compute_aggregates(self):
+        """One pass over the columns for statistics plus the year-sorted book order"""
+        self.category_counts = array('I', [0] * len(self.categories))
+        for category_id in self.category_ids:
+            self.category_counts[category_id] += 1
+
+        self.author_count = len(set(author for author in self.columns['authorEnglish'] if author))
+        used_locations = set(self.location_ids)
+        self.location_count = sum(1 for location_id in used_locations if self.locations[location_id][0])
+
+        dated = sorted((year, index) for index, year in enumerate(self.years) if year)
+        self.sorted_years = array('h', (year for year, _ in dated))
+        self.year_order = array('I', (index for _, index in dated))
+
+        histogram: Dict[int, int] = {}
+        for year in self.sorted_years:
+            decade = year - year % 10
+            histogram[decade] = histogram.get(decade, 0) + 1
+        self.year_histogram = histogram
+
+    def books_between(self, min_year: int, max_year: int) -> Sequence[int]:
+        """Indices of books printed in [min_year, max_year], oldest first (binary search)"""
+        start = bisect_left(self.sorted_years, min_year)
+        end = bisect_right(self.sorted_years, max_year)
+        return self.year_order[start:end]
+
+    @property
+    def year_range(self) -> Tuple[int, int]:
+        if not self.sorted_years:
+            return 0, 0
+        return self.sorted_years[0], self.sorted_years[-1]
+
+    def book(self, index: int) -> Dict:
+        """Materialize one book as a dict with the books.json field names"""
+        category_en, category_he = self.categories[self.category_ids[index]]
+        location_en, location_he = self.locations[self.location_ids[index]]
+        book = {field: self.columns[field][index] for field in TEXT_FIELDS}
+        book.update({
+            'categoryEnglish': category_en,
+            'category': category_he,
+            'printLocationEnglish': location_en,
+            'printLocation': location_he
+        })
+        if self.years[index]:
+            book['printYear'] = self.years[index]
+        # Key the Discord embeds read
+        book['title'] = book['displayNameEnglish'] or book['displayName']
+        return book
+
+    def books(self, indices: Iterable[int]) -> List[Dict]:
+        return [self.book(index) for index in indices]
+
+    def save(self, path: str):
+        """Write a snapshot atomically so a crash never leaves a torn file"""
+        state = {
+            'version': SNAPSHOT_VERSION,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'columns': self.columns,
+            'categories': self.categories,
+            'locations': self.locations,
+            'category_ids': self.category_ids.tobytes(),
+            'location_ids': self.location_ids.tobytes(),
+            'years': self.years.tobytes()
+        }
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['DictaCatalog']:
+        """Load a snapshot written by save(), or None if it is missing or unusable"""
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable Dicta catalog snapshot: {e}")
+            return None
+
+        if not isinstance(state, dict) or state.get('version') != SNAPSHOT_VERSION:
+            return None
+
+        catalog = cls()
+        catalog.etag = state['etag']
+        catalog.last_modified = state['last_modified']
+        catalog.columns = {
+            field: [sys.intern(value) for value in state['columns'][field]]
+            for field in TEXT_FIELDS
+        }
+        catalog.categories = state['categories']
+        catalog.locations = state['locations']
+        catalog.category_ids.frombytes(state['category_ids'])
+        catalog.location_ids.frombytes(state['location_ids'])
+        catalog.years.frombytes(state['years'])
+        catalog._compute_aggregates()
+        return catalog
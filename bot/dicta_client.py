@@ -5,12 +5,22 @@ import aiohttp
 import asyncio
 import logging
 import json
-from typing import Dict, List, Optional, Union
+import os
+import time
+from typing import Dict, List, Optional, Tuple, Union
 from urllib.parse import quote
 import random
 
+from .dicta_catalog import DictaCatalog
+from .dicta_files import DictaFileCache
+from .dicta_index import DictaIndex
+from .storage import cache_path
+
 logger = logging.getLogger(__name__)
 
+# First wait before retrying a catalog that could not be loaded; doubles up to the refresh interval
+CATALOG_RETRY_DELAY = 120
+
 class DictaClient:
     """Client for Dicta Israel Center for Text Analysis"""
     
@@ -22,7 +32,18 @@ class DictaClient:
         
         self.session = None
         self.last_request_time = 0
-        self.books_cache = None
+        
+        # Catalog is kept as compact columns and persisted between restarts
+        self.catalog: Optional[DictaCatalog] = None
+        self.index: Optional[DictaIndex] = None
+        self.catalog_path = cache_path('dicta', 'catalog.pickle')
+        self.catalog_refresh_interval = 6 * 3600  # Seconds between conditional GETs
+        self._catalog_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._load_task: Optional[asyncio.Task] = None
+        
+        # Full book texts are streamed to a size-capped disk cache and read through mmap
+        self.file_cache = DictaFileCache(cache_path('dicta', 'books'))
         
     async def _ensure_session(self):
         """Ensure aiohttp session exists"""
@@ -63,88 +84,197 @@ class DictaClient:
             logger.error(f"Error making Dicta request: {e}")
             return None
     
-    async def get_books_library(self) -> List[Dict]:
-        """Get the complete Dicta books library catalog"""
-        if self.books_cache is None:
-            result = await self._make_request(self.books_json_url)
-            if result and isinstance(result, list):
-                self.books_cache = result
+    async def _fetch_catalog(self, current: Optional[DictaCatalog] = None) -> Optional[DictaCatalog]:
+        """Download books.json, or return None when the server reports it unchanged"""
+        await self._ensure_session()
+        await self._rate_limit()
+        
+        headers = {}
+        if current is not None:
+            if current.etag:
+                headers['If-None-Match'] = current.etag
+            if current.last_modified:
+                headers['If-Modified-Since'] = current.last_modified
+        
+        try:
+            timeout = aiohttp.ClientTimeout(total=30, connect=10)
+            async with self.session.get(self.books_json_url, headers=headers, timeout=timeout) as response:
+                if response.status == 304:
+                    return None
+                if response.status != 200:
+                    logger.error(f"Dicta catalog request failed: {response.status}")
+                    return None
+                
+                # raw.githubusercontent.com serves JSON as text/plain
+                books = json.loads(await response.text())
+                if not isinstance(books, list):
+                    logger.error("Dicta catalog is not a list")
+                    return None
+                
+                return DictaCatalog.from_books(
+                    books,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
+        except Exception as e:
+            logger.error(f"Error downloading Dicta catalog: {e}")
+            return None
+    
+    async def refresh_catalog(self) -> bool:
+        """Refresh the catalog with a conditional GET; returns True when a new version was loaded"""
+        catalog = await self._fetch_catalog(self.catalog)
+        if catalog is None or not len(catalog):
+            if self.catalog is not None and os.path.exists(self.catalog_path):
+                os.utime(self.catalog_path)  # Unchanged upstream, so the snapshot is fresh again
+            return False
+        
+        await self._set_catalog(catalog)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, catalog.save, self.catalog_path)
+        except OSError as e:
+            logger.warning(f"Could not write Dicta catalog snapshot: {e}")
+        logger.info(f"Loaded Dicta catalog with {len(catalog)} books")
+        return True
+    
+    async def _set_catalog(self, catalog: DictaCatalog):
+        """Swap in a catalog together with its search index (built off the event loop)"""
+        index = await asyncio.get_running_loop().run_in_executor(None, DictaIndex, catalog)
+        self.catalog, self.index = catalog, index
+    
+    async def _refresh_loop(self, delay: float):
+        """Keep the catalog fresh in the background, retrying soon (with backoff) while none is loaded"""
+        retry_delay = CATALOG_RETRY_DELAY
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh_catalog()
+            except Exception as e:
+                logger.error(f"Dicta catalog refresh failed: {e}")
+            if self.catalog is None:
+                delay, retry_delay = retry_delay, min(retry_delay * 2, self.catalog_refresh_interval)
             else:
-                self.books_cache = []
-        return self.books_cache
+                delay, retry_delay = self.catalog_refresh_interval, CATALOG_RETRY_DELAY
+    
+    def _schedule_refresh(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        if self.catalog is None:
+            delay = CATALOG_RETRY_DELAY
+        else:
+            try:
+                age = time.time() - os.path.getmtime(self.catalog_path)
+            except OSError:
+                age = self.catalog_refresh_interval
+            delay = max(0.0, self.catalog_refresh_interval - age)
+        self._refresh_task = asyncio.create_task(self._refresh_loop(delay))
+    
+    async def get_catalog(self) -> DictaCatalog:
+        """Get the columnar catalog, loading the on-disk snapshot before touching the network
+        
+        While no catalog could be loaded an empty one is returned but not kept; the
+        background refresh retries within minutes instead of at the next 6-hourly refresh.
+        """
+        if self.catalog is None and (self._refresh_task is None or self._refresh_task.done()):
+            async with self._catalog_lock:
+                if self.catalog is None and (self._refresh_task is None or self._refresh_task.done()):
+                    snapshot = DictaCatalog.load(self.catalog_path)
+                    if snapshot is not None:
+                        await self._set_catalog(snapshot)
+                    else:
+                        await self.refresh_catalog()
+                    self._schedule_refresh()
+        
+        self._schedule_refresh()
+        return self.catalog if self.catalog is not None else DictaCatalog()
+    
+    @property
+    def catalog_available(self) -> bool:
+        return self.catalog is not None
+    
+    async def _library(self) -> Tuple[DictaCatalog, DictaIndex]:
+        """The catalog with its search index, or an empty pair while the catalog is unavailable"""
+        await self.get_catalog()
+        catalog, index = self.catalog, self.index
+        if catalog is None:
+            catalog = DictaCatalog()
+            return catalog, DictaIndex(catalog)
+        return catalog, index
+    
+    async def get_books_library(self) -> List[Dict]:
+        """Get the complete Dicta books library catalog (materializes every book; prefer get_catalog)"""
+        catalog = await self.get_catalog()
+        return catalog.books(range(len(catalog)))
     
     async def search_books(self, query: str, category: str = "", author: str = "", limit: int = 10) -> List[Dict]:
-        """Search books in the Dicta library"""
-        books = await self.get_books_library()
-        
-        # Filter books based on search criteria
-        filtered_books = []
-        query_lower = query.lower()
-        category_lower = category.lower()
-        author_lower = author.lower()
-        
-        for book in books:
-            match = False
-            
-            # Search in display name (both Hebrew and English)
-            if (query_lower in book.get('displayName', '').lower() or 
-                query_lower in book.get('displayNameEnglish', '').lower()):
-                match = True
-            
-            # Search in author (both Hebrew and English)
-            if (query_lower in book.get('author', '').lower() or 
-                query_lower in book.get('authorEnglish', '').lower()):
-                match = True
-            
-            # Filter by category if specified
-            if category and category_lower not in book.get('categoryEnglish', '').lower():
-                match = False
-            
-            # Filter by author if specified
-            if author and (author_lower not in book.get('author', '').lower() and 
-                          author_lower not in book.get('authorEnglish', '').lower()):
-                match = False
-            
-            if match:
-                filtered_books.append(book)
-                if len(filtered_books) >= limit:
-                    break
-        
-        return filtered_books
+        """Search books in the Dicta library (ranked, typo-tolerant, niqqud-insensitive)"""
+        catalog, index = await self._library()
+        return catalog.books(index.search(query, category=category, author=author, limit=limit))
+    
+    def suggest_books(self, prefix: str, limit: int = 25) -> List[Dict]:
+        """Title suggestions for autocomplete; empty until the catalog has been loaded"""
+        if self.index is None:
+            # Start loading once; later keystrokes wait for that load (or its retries)
+            if self._load_task is None or self._load_task.done():
+                self._load_task = asyncio.create_task(self.get_catalog())
+            return []
+        return self.catalog.books(self.index.suggest(prefix, limit=limit))
+    
+    async def get_book_excerpt(self, title: str, paragraph: int = 0, count: int = 3) -> Optional[Dict]:
+        """Paragraphs from a book's full text, downloaded once to the disk cache"""
+        catalog, index = await self._library()
+        matches = index.search(title, limit=1)
+        if not matches:
+            return None
+        
+        book = catalog.book(matches[0])
+        file_name = book.get('fileName')
+        if not file_name:
+            return None
+        
+        await self._ensure_session()
+        url = f"{self.files_url}/{quote(file_name)}"
+        if not await self.file_cache.fetch(self.session, url, file_name):
+            return None
+        
+        loop = asyncio.get_running_loop()
+        paragraphs = await loop.run_in_executor(None, self.file_cache.excerpt, file_name, paragraph, count)
+        return {
+            'title': book['title'],
+            'author': book.get('author') or book.get('authorEnglish'),
+            'paragraph': paragraph,
+            'total_paragraphs': self.file_cache.paragraph_count(file_name),
+            'paragraphs': paragraphs
+        }
+    
+    async def _books_in_categories(self, categories: List[str], limit: int) -> List[Dict]:
+        """Books in any of several categories, resolved through the index in one pass"""
+        catalog, index = await self._library()
+        category_ids = set()
+        for category in categories:
+            category_ids |= index.categories_matching(category)
+        return catalog.books(index.books_in_categories(category_ids)[:limit])
     
     async def get_book_categories(self) -> List[Dict]:
-        """Get all unique categories from the library"""
-        books = await self.get_books_library()
-        categories = {}
-        
-        for book in books:
-            cat_en = book.get('categoryEnglish', '')
-            cat_he = book.get('category', '')
-            if cat_en and cat_en not in categories:
-                categories[cat_en] = {
-                    'english': cat_en,
-                    'hebrew': cat_he,
-                    'count': 1
-                }
-            elif cat_en in categories:
-                categories[cat_en]['count'] += 1
-        
-        return list(categories.values())
+        """Get all unique categories from the library, largest first"""
+        catalog = await self.get_catalog()
+        categories = [
+            {'english': cat_en, 'hebrew': cat_he, 'count': count}
+            for (cat_en, cat_he), count in zip(catalog.categories, catalog.category_counts)
+            if cat_en
+        ]
+        categories.sort(key=lambda category: category['count'], reverse=True)
+        return categories
     
     async def get_random_book(self, category: str = "") -> Optional[Dict]:
         """Get a random book from the library"""
-        books = await self.get_books_library()
+        catalog, index = await self._library()
+        indices = range(len(catalog))
         
         if category:
-            category_lower = category.lower()
-            filtered_books = [
-                book for book in books 
-                if category_lower in book.get('categoryEnglish', '').lower()
-            ]
-            books = filtered_books
-        
-        if books:
-            return random.choice(books)
+            indices = index.books_in_categories(index.categories_matching(category))
+        
+        if indices:
+            return catalog.book(random.choice(indices))
         return None
     
     async def get_chassidic_books(self, limit: int = 10) -> List[Dict]:
@@ -161,68 +291,37 @@ class DictaClient:
     
     async def get_biblical_commentaries(self, limit: int = 10) -> List[Dict]:
         """Get biblical commentary books"""
-        categories = ["Bible Commentary", "Biblical Commentary"]
-        all_books = []
-        for category in categories:
-            books = await self.search_books("", category=category, limit=limit)
-            all_books.extend(books)
-        return all_books[:limit]
+        return await self._books_in_categories(["Bible Commentary", "Biblical Commentary"], limit)
     
     async def get_halachic_books(self, limit: int = 10) -> List[Dict]:
         """Get Halachic (Jewish law) books"""
-        categories = ["Commentaries on Shulchan Aruch", "Halakhah"]
-        all_books = []
-        for category in categories:
-            books = await self.search_books("", category=category, limit=limit)
-            all_books.extend(books)
-        return all_books[:limit]
+        return await self._books_in_categories(["Commentaries on Shulchan Aruch", "Halakhah"], limit)
     
     async def get_books_by_author(self, author: str, limit: int = 10) -> List[Dict]:
         """Get books by a specific author"""
         return await self.search_books("", author=author, limit=limit)
     
     async def get_books_by_period(self, min_year: int = 1800, max_year: int = 2000, limit: int = 10) -> List[Dict]:
-        """Get books from a specific time period"""
-        books = await self.get_books_library()
-        
-        filtered_books = []
-        for book in books:
-            year = book.get('printYear', 0)
-            if isinstance(year, int) and min_year <= year <= max_year:
-                filtered_books.append(book)
-                if len(filtered_books) >= limit:
-                    break
-        
-        return filtered_books
+        """Get books from a specific time period, oldest first"""
+        catalog = await self.get_catalog()
+        return catalog.books(catalog.books_between(min_year, max_year)[:limit])
     
     async def get_library_statistics(self) -> Dict:
-        """Get statistics about the Dicta library"""
-        books = await self.get_books_library()
+        """Get statistics about the Dicta library (precomputed when the catalog loads)"""
+        catalog = await self.get_catalog()
         categories = await self.get_book_categories()
-        
-        # Calculate statistics
-        total_books = len(books)
-        authors = set()
-        years = []
-        locations = set()
-        
-        for book in books:
-            if book.get('authorEnglish'):
-                authors.add(book['authorEnglish'])
-            if book.get('printYear') and isinstance(book['printYear'], int):
-                years.append(book['printYear'])
-            if book.get('printLocationEnglish'):
-                locations.add(book['printLocationEnglish'])
+        earliest, latest = catalog.year_range
         
         stats = {
-            'total_books': total_books,
+            'total_books': len(catalog),
             'total_categories': len(categories),
-            'total_authors': len(authors),
-            'total_locations': len(locations),
+            'total_authors': catalog.author_count,
+            'total_locations': catalog.location_count,
             'year_range': {
-                'earliest': min(years) if years else 0,
-                'latest': max(years) if years else 0
+                'earliest': earliest,
+                'latest': latest
             },
+            'books_per_decade': dict(catalog.year_histogram),
             'categories': categories[:10]  # Top 10 categories
         }
         
@@ -230,5 +329,8 @@ class DictaClient:
     
     async def close(self):
         """Close the aiohttp session"""
+        for task in (self._refresh_task, self._load_task):
+            if task:
+                task.cancel()
         if self.session:
             await self.session.close()
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+Size-capped disk cache for Dicta book files with memory-mapped paragraph reads
+"""
+import aiohttp
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+from array import array
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Each book has a sidecar index of (start, end) byte offsets, one pair per non-empty paragraph,
+# stored as native unsigned 64-bit integers
+_OFFSET_TYPE = 'Q'
+_OFFSET_SIZE = array(_OFFSET_TYPE).itemsize
+
+
+class DictaFileCache:
+    """Streams book files to disk in chunks and reads paragraph excerpts without loading whole books"""
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, chunk_size: int = 64 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._downloads: Dict[str, asyncio.Task] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key: str):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, name)
+        return f"{base}.txt", f"{base}.idx"
+
+    def is_cached(self, key: str) -> bool:
+        text_path, index_path = self._paths(key)
+        return os.path.exists(text_path) and os.path.exists(index_path)
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str, key: str) -> bool:
+        """Make sure a book is on disk, streaming it in chunks if needed; returns False on failure
+
+        Concurrent requests for one book share a single download.
+        """
+        if self.is_cached(key):
+            os.utime(self._paths(key)[0])  # Mark as recently used for eviction
+            return True
+
+        task = self._downloads.get(key)
+        if task is None:
+            task = asyncio.create_task(self._download(session, url, key))
+            self._downloads[key] = task
+            task.add_done_callback(lambda _: self._downloads.pop(key, None))
+        # Shielded so a caller that gives up does not cancel the download for the others
+        return await asyncio.shield(task)
+
+    async def _download(self, session: aiohttp.ClientSession, url: str, key: str) -> bool:
+        text_path, index_path = self._paths(key)
+        try:
+            timeout = aiohttp.ClientTimeout(total=None, connect=10, sock_read=30)
+            async with session.get(url, timeout=timeout) as response:
+                if response.status != 200:
+                    logger.error(f"Dicta file request failed: {response.status}")
+                    return False
+                offsets = await self._stream_to_disk(response, text_path)
+        except Exception as e:
+            logger.error(f"Error downloading Dicta file: {e}")
+            for path in (f"{text_path}.part", text_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return False
+
+        if offsets is None:
+            return False
+
+        # Scanning every line of a large book and the eviction pass stay off the event loop
+        await asyncio.to_thread(self._finish, text_path, index_path, offsets)
+        return True
+
+    def _finish(self, text_path: str, index_path: str, offsets: array):
+        paragraphs = self._paragraph_spans(text_path, offsets)
+        temp_path = f"{index_path}.part"
+        with open(temp_path, 'wb') as f:
+            paragraphs.tofile(f)
+        os.replace(temp_path, index_path)
+        self._evict()
+
+    async def _stream_to_disk(self, response: aiohttp.ClientResponse, text_path: str) -> Optional[array]:
+        """Write the body chunk by chunk, recording where each line starts"""
+        offsets = array(_OFFSET_TYPE, [0])
+        position = 0
+        partial_path = f"{text_path}.part"
+
+        with open(partial_path, 'wb') as f:
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                if position + len(chunk) > self.max_bytes:
+                    logger.warning("Dicta file exceeds the cache size limit, skipping")
+                    f.close()
+                    os.remove(partial_path)
+                    return None
+
+                f.write(chunk)
+                newline = chunk.find(b'\n')
+                while newline != -1:
+                    offsets.append(position + newline + 1)
+                    newline = chunk.find(b'\n', newline + 1)
+                position += len(chunk)
+
+        if offsets[-1] != position:
+            offsets.append(position)
+        os.replace(partial_path, text_path)
+        return offsets
+
+    @staticmethod
+    def _paragraph_spans(text_path: str, line_offsets: array) -> array:
+        """Keep the (start, end) spans of lines that hold text, skipping blank lines"""
+        spans = array(_OFFSET_TYPE)
+        if line_offsets[-1] == 0:
+            return spans
+
+        with open(text_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as text_map:
+            for start, end in zip(line_offsets, line_offsets[1:]):
+                if text_map[start:end].strip():
+                    spans.append(start)
+                    spans.append(end)
+        return spans
+
+    def _evict(self):
+        """Delete least recently used books until the cache fits its byte budget"""
+        books = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.txt'):
+                continue
+            stat = entry.stat()
+            index_path = entry.path[:-4] + '.idx'
+            size = stat.st_size + (os.path.getsize(index_path) if os.path.exists(index_path) else 0)
+            books.append((stat.st_mtime, entry.path, index_path, size))
+            total += size
+
+        books.sort()
+        while total > self.max_bytes and len(books) > 1:
+            _, text_path, index_path, size = books.pop(0)
+            for path in (text_path, index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+            logger.info(f"Evicted Dicta file {os.path.basename(text_path)}")
+
+    def paragraph_count(self, key: str) -> int:
+        """Number of non-empty paragraphs in a cached book"""
+        _, index_path = self._paths(key)
+        try:
+            return os.path.getsize(index_path) // (2 * _OFFSET_SIZE)
+        except OSError:
+            return 0
+
+    def excerpt(self, key: str, paragraph: int, count: int = 1) -> List[str]:
+        """Paragraphs [paragraph, paragraph + count) of a cached book, read through memory maps"""
+        text_path, index_path = self._paths(key)
+        total = self.paragraph_count(key)
+        if paragraph < 0 or paragraph >= total or not os.path.exists(text_path):
+            return []
+
+        last = min(total, paragraph + count)
+        with open(text_path, 'rb') as text_file, open(index_path, 'rb') as index_file, \
+                mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index_map, \
+                mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ) as text_map:
+            spans = memoryview(index_map).cast(_OFFSET_TYPE)
+            try:
+                return [
+                    text_map[spans[2 * i]:spans[2 * i + 1]].strip().decode('utf-8', errors='replace')
+                    for i in range(paragraph, last)
+                ]
+            finally:
+                spans.release()
@@ -0,0 +1,177 @@
+"""
+Inverted trigram index over the Dicta catalog for ranked, typo-tolerant book search
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .dicta_catalog import DictaCatalog
+from .hebrew_text import normalize, normalize_batch, tokenize
+
+# Relative weight of a trigram hit in each field group
+FIELD_WEIGHTS = {'title': 3.0, 'author': 2.0, 'category': 1.0}
+# Share of the query's trigrams a field must contain to count as a (fuzzy) match
+MIN_COVERAGE = 0.5
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of each word padded with spaces, so short words and word edges still index"""
+    grams = set()
+    for word in tokenize(text):
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class DictaIndex:
+    """Trigram postings for titles, authors and categories, plus category and author facets"""
+
+    def __init__(self, catalog: DictaCatalog):
+        self.catalog = catalog
+        self.postings: Dict[str, Dict[str, array]] = {field: {} for field in FIELD_WEIGHTS}
+        self.by_category: List[array] = [array('I') for _ in catalog.categories]
+        self.by_author: Dict[str, array] = {}
+        self.titles: List[Tuple[str, int]] = []
+        self.normalized_names: List[str] = []
+        self.category_names: List[Tuple[str, str]] = []
+        self._build()
+
+    def _build(self):
+        catalog = self.catalog
+        postings = {field: defaultdict(lambda: array('I')) for field in FIELD_WEIGHTS}
+
+        category_grams = [
+            trigrams(f"{cat_en} {cat_he}") for cat_en, cat_he in catalog.categories
+        ]
+        columns = catalog.columns
+        # Whole columns go through one batched normalization pass each
+        titles_en = normalize_batch(columns['displayNameEnglish'])
+        titles_he = normalize_batch(columns['displayName'])
+        authors_en = normalize_batch(columns['authorEnglish'])
+        authors_he = normalize_batch(columns['author'])
+        for index in range(len(catalog)):
+            names = f"{columns['displayName'][index]} {columns['displayNameEnglish'][index]}"
+            authors = f"{columns['author'][index]} {columns['authorEnglish'][index]}"
+            category_id = catalog.category_ids[index]
+
+            for gram in trigrams(names):
+                postings['title'][gram].append(index)
+            for gram in trigrams(authors):
+                postings['author'][gram].append(index)
+            for gram in category_grams[category_id]:
+                postings['category'][gram].append(index)
+
+            self.by_category[category_id].append(index)
+            for author in (authors_he[index], authors_en[index]):
+                if author:
+                    self.by_author.setdefault(author, array('I')).append(index)
+
+            for name in (titles_en[index], titles_he[index]):
+                if name:
+                    self.titles.append((name, index))
+            self.normalized_names.append(f"{titles_he[index]} {titles_en[index]}".strip())
+
+        self.postings = {field: dict(grams) for field, grams in postings.items()}
+        self.titles.sort()
+        self.category_names = list(zip(normalize_batch(cat_en for cat_en, _ in catalog.categories),
+                                       normalize_batch(cat_he for _, cat_he in catalog.categories)))
+
+    def categories_matching(self, category: str) -> Set[int]:
+        """IDs of categories whose English or Hebrew name contains the text"""
+        wanted = normalize(category)
+        return {
+            category_id for category_id, (cat_en, cat_he) in enumerate(self.category_names)
+            if wanted in cat_en or wanted in cat_he
+        }
+
+    def books_by_author(self, author: str) -> Set[int]:
+        """Books whose Hebrew or English author contains the text"""
+        wanted = normalize(author)
+        books = set()
+        for name, indices in self.by_author.items():
+            if wanted in name:
+                books.update(indices)
+        return books
+
+    def books_in_categories(self, category_ids: Iterable[int]) -> List[int]:
+        """Books in any of the categories, in catalog order"""
+        books = set()
+        for category_id in category_ids:
+            books.update(self.by_category[category_id])
+        return sorted(books)
+
+    def search(self, query: str, category: str = "", author: str = "", limit: int = 10) -> List[int]:
+        """Ranked book indices matching the query, optionally restricted by category and author facets"""
+        allowed: Optional[Set[int]] = None
+        if category:
+            allowed = set(self.books_in_categories(self.categories_matching(category)))
+        if author:
+            authors = self.books_by_author(author)
+            allowed = authors if allowed is None else allowed & authors
+
+        query_grams = trigrams(query)
+        if not query_grams:
+            # No free text: list the facet in catalog order
+            if allowed is None:
+                return list(range(min(limit, len(self.catalog))))
+            return sorted(allowed)[:limit]
+
+        scores: Dict[int, float] = defaultdict(float)
+        best_coverage: Dict[int, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            postings = self.postings[field]
+            hits = Counter(chain.from_iterable(postings.get(gram, ()) for gram in query_grams))
+            for index, count in hits.items():
+                coverage = count / len(query_grams)
+                scores[index] += weight * coverage
+                if coverage > best_coverage[index]:
+                    best_coverage[index] = coverage
+
+        wanted = normalize(query)
+        names = self.normalized_names
+        ranked = []
+        for index, score in scores.items():
+            if best_coverage[index] < MIN_COVERAGE:
+                continue
+            if allowed is not None and index not in allowed:
+                continue
+            # Exact substring hits outrank fuzzy ones
+            if wanted in names[index]:
+                score += FIELD_WEIGHTS['title']
+            ranked.append((-score, index))
+
+        ranked.sort()
+        return [index for _, index in ranked[:limit]]
+
+    def suggest(self, prefix: str, limit: int = 25) -> List[int]:
+        """Books whose title starts with the prefix, falling back to fuzzy search"""
+        wanted = normalize(prefix)
+        if not wanted:
+            return []
+
+        suggestions = []
+        position = bisect_left(self.titles, (wanted, -1))
+        while position < len(self.titles) and len(suggestions) < limit:
+            name, index = self.titles[position]
+            if not name.startswith(wanted):
+                break
+            if index not in suggestions:
+                suggestions.append(index)
+            position += 1
+
+        if len(suggestions) < limit:
+            for index in self.search(prefix, limit=limit):
+                if index not in suggestions:
+                    suggestions.append(index)
+                    if len(suggestions) >= limit:
+                        break
+        return suggestions
+
+    def category_facets(self, indices: Iterable[int]) -> Dict[str, int]:
+        """Result counts per English category name"""
+        counts: Dict[str, int] = defaultdict(int)
+        for index in indices:
+            counts[self.catalog.categories[self.catalog.category_ids[index]][0]] += 1
+        return dict(counts)
@@ -4,6 +4,7 @@ Main Discord bot class for Sefaria integration
 import discord
 from discord.ext import commands
 import logging
+from typing import Optional
 # Streamlined commands only
 from .sefaria_client import SefariaClient
 from .hebcal_client import HebcalClient
@@ -16,13 +17,17 @@ from .orayta_client import OraytaClient
 from .opensiddur_client import OpenSiddurClient
 from .pninim_client import PninimClient
 from .ai_client import AIClient
+from .learning_schedule import LearningSchedule
+from .image_cache import ImageCache
+from .gematria_index import GematriaLibrary
+from .guild_settings import GuildSettings
 
 logger = logging.getLogger(__name__)
 
 class SefariaBot(commands.Bot):
     """Discord bot for Sefaria Jewish texts"""
     
-    def __init__(self):
+    def __init__(self, image_cache: Optional[ImageCache] = None):
         # Configure intents - need message content for @mentions to work
         intents = discord.Intents.default()
         intents.message_content = True  # Required for reading message content when @mentioned
@@ -45,6 +50,10 @@ class SefariaBot(commands.Bot):
         self.opensiddur_client = OpenSiddurClient()
         self.pninim_client = PninimClient()
         self.ai_client = AIClient()
+        self.learning_schedule = LearningSchedule()
+        self.image_cache = image_cache or ImageCache()
+        self.gematria_library = GematriaLibrary(self.sefaria_client)
+        self.guild_settings = GuildSettings()
         
         # Track processed messages to prevent duplicates
         self.processed_messages = set()
@@ -66,10 +75,24 @@ class SefariaBot(commands.Bot):
                 torahcalc=self.torahcalc_client,
                 orayta=self.orayta_client,
                 opensiddur=self.opensiddur_client,
-                pninim=self.pninim_client
+                pninim=self.pninim_client,
+                learning=self.learning_schedule,
+                images=self.image_cache,
+                gematria=self.gematria_library,
+                settings=self.guild_settings
             ))
             logger.info("Loaded comprehensive commands with ALL APIs and functionality")
             
+            # Daily Chabad pages are served from cache; fill it before the first click
+            self.chabad_client.warm_daily_cache()
+            # Loads the gematria equivalence index, or starts its one-time build
+            self.gematria_library.get()
+            # Indexes the offline corpus for local full-text search, and loads every title for ref parsing
+            self.sefaria_client.warm_text_index()
+            self.sefaria_client.warm_ref_index()
+            # Keeps today's and tomorrow's Tanya, Daf Yomi, Rambam and Mishnah Yomit texts cached
+            self.sefaria_client.warm_schedule(self.learning_schedule)
+            
             # Add AI message handling for @mentions
             try:
                 from .ai_message_handler import AIMessageHandler
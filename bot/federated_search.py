@@ -0,0 +1,127 @@
+"""
+Federated search: one query fanned out to every library at once
+"""
+import asyncio
+import logging
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from .nli_client import title_query
+
+logger = logging.getLogger(__name__)
+
+_TAGS = re.compile(r'<[^>]+>')
+
+
+def _plain(value: Any) -> str:
+    """Text without HTML tags, joining lists of segments"""
+    if isinstance(value, list):
+        value = ' '.join(str(part) for part in value if part)
+    return _TAGS.sub('', str(value or '')).strip()
+
+
+def _hit(source: str, title: str, snippet: str = "", ref: str = "", url: str = "") -> Dict[str, str]:
+    return {'source': source, 'title': title, 'snippet': snippet, 'ref': ref, 'url': url}
+
+
+async def _search_sefaria(clients: Dict[str, Any], query: str, limit: int) -> List[Dict]:
+    hits = []
+    for result in await clients['sefaria'].search_texts(query, limit=limit):
+        ref = result.get('ref', '')
+        hits.append(_hit(
+            'sefaria', result.get('title') or ref, _plain(result.get('text')), ref,
+            f"https://www.sefaria.org/{quote(ref.replace(' ', '_'))}" if ref else ""
+        ))
+    return hits
+
+
+async def _search_dicta(clients: Dict[str, Any], query: str, limit: int) -> List[Dict]:
+    hits = []
+    for book in await clients['dicta'].search_books(query, limit=limit):
+        byline = book.get('author') or book.get('authorEnglish') or ''
+        category = book.get('categoryEnglish') or book.get('category') or ''
+        hits.append(_hit('dicta', book.get('title', ''), ' · '.join(part for part in (byline, category) if part)))
+    return hits
+
+
+async def _search_nli(clients: Dict[str, Any], query: str, limit: int) -> List[Dict]:
+    records = await clients['nli'].search_page(title_query(query), per_page=limit, prefetch=False)
+    return [_hit('nli', record.get('title', ''), _plain(record.get('description'))) for record in records]
+
+
+async def _search_orayta(clients: Dict[str, Any], query: str, limit: int) -> List[Dict]:
+    hits = []
+    for result in await clients['orayta'].search_cross_platform_texts(query):
+        # The client answers with a single placeholder entry when the API has nothing
+        if 'sources' in result and 'query' in result:
+            continue
+        hits.append(_hit('orayta', result.get('title', ''), _plain(result.get('description') or result.get('text')),
+                         result.get('ref', ''), result.get('url', '')))
+    return hits[:limit]
+
+
+async def _search_chabad(clients: Dict[str, Any], query: str, limit: int) -> List[Dict]:
+    hits = []
+    for result in await clients['chabad'].search_articles(query, limit=limit):
+        if result.get('title'):
+            hits.append(_hit('chabad', result['title'], _plain(result.get('description'))))
+    return hits
+
+
+class Source(NamedTuple):
+    name: str
+    label: str
+    deadline: float  # Seconds this source may take before it is dropped
+    search: Callable[[Dict[str, Any], str, int], Awaitable[List[Dict]]]
+
+
+SOURCES = (
+    Source('sefaria', "📚 Sefaria", 8.0, _search_sefaria),
+    Source('dicta', "📖 Dicta", 8.0, _search_dicta),
+    Source('nli', "🏛️ National Library", 8.0, _search_nli),
+    Source('orayta', "📜 Orayta", 6.0, _search_orayta),
+    Source('chabad', "🕯️ Chabad.org", 6.0, _search_chabad),
+)
+
+
+class FederatedSearch:
+    """Queries every source concurrently and yields each source's hits as soon as they arrive"""
+
+    def __init__(self, clients: Dict[str, Any], sources: Tuple[Source, ...] = SOURCES, budget: float = 10.0):
+        self.clients = clients
+        self.sources = tuple(source for source in sources if source.name in clients)
+        self.budget = budget
+
+    async def _run(self, source: Source, query: str, limit: int) -> List[Dict]:
+        return await asyncio.wait_for(source.search(self.clients, query, limit), timeout=source.deadline)
+
+    async def stream(self, query: str, limit: int = 5) -> AsyncIterator[Tuple[Source, Optional[List[Dict]]]]:
+        """Yield (source, hits) in completion order; hits is None when the source failed or timed out
+
+        Sources still running when the overall budget runs out are cancelled and never yielded.
+        """
+        loop = asyncio.get_running_loop()
+        end = loop.time() + self.budget
+        tasks = {asyncio.create_task(self._run(source, query, limit)): source for source in self.sources}
+        pending = set(tasks)
+        try:
+            while pending:
+                remaining = end - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    source = tasks[task]
+                    if task.exception() is not None:
+                        logger.warning(f"Federated search: {source.name} failed: {task.exception()!r}")
+                        yield source, None
+                    else:
+                        yield source, task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def search(self, query: str, limit: int = 5) -> Dict[str, Optional[List[Dict]]]:
+        """All answers that arrived within the budget, keyed by source name"""
+        return {source.name: hits async for source, hits in self.stream(query, limit)}
@@ -0,0 +1,324 @@
+"""
+Offline index from gematria values to the Tanakh words, phrases and verses that share them
+"""
+import asyncio
+import json
+import logging
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import gematria
+from .hebrew_text import MAQAF
+from .storage import cache_path
+
+logger = logging.getLogger(__name__)
+
+WORD, PHRASE, VERSE = 0, 1, 2
+KIND_NAMES = ('word', 'phrase', 'verse')
+INDEX_VERSION = 1
+# Wait before retrying an incomplete build, doubled after each failure up to the maximum
+BUILD_RETRY_DELAY = 10 * 60
+BUILD_RETRY_MAX_DELAY = 6 * 3600
+
+# Sefaria's Tanakh markup: tags, entities and the {פ} / {ס} paragraph markers, none of which count
+_MARKUP = re.compile(r'<[^>]+>|&[#\w]+;|\{[^}]*\}')
+_ITEM_TYPE = 'I'
+_ITEM_SIZE = array(_ITEM_TYPE).itemsize
+
+
+def verse_words(text: str) -> List[str]:
+    """Unvocalized words of a verse (maqaf-joined words counted separately), final letters kept"""
+    text = _MARKUP.sub(' ', text).replace(MAQAF, ' ')
+    return [word for word in (gematria.hebrew_letters(token) for token in text.split()) if word]
+
+
+def _collect(verses: Iterable[Tuple[str, str]]) -> Tuple[List[Tuple[str, str]], List[int]]:
+    """Entries as (ref, text) in id order (words, then two-word phrases, then verses) and where each kind starts"""
+    words: Dict[str, List] = {}
+    phrases: Dict[str, List] = {}
+    verse_entries = []
+    for ref, text in verses:
+        letters = verse_words(text)
+        if not letters:
+            continue
+        for word in letters:
+            seen = words.setdefault(word, [0, ref])
+            seen[0] += 1
+        for first, second in zip(letters, letters[1:]):
+            seen = phrases.setdefault(f"{first} {second}", [0, ref])
+            seen[0] += 1
+        verse_entries.append((ref, ' '.join(letters)))
+
+    # Common words and phrases first, so the start of a match list is the most familiar part
+    entries = [(ref, word) for word, (_, ref) in sorted(words.items(), key=lambda item: -item[1][0])]
+    kind_starts = [0, len(entries)]
+    entries.extend((ref, phrase) for phrase, (_, ref) in sorted(phrases.items(), key=lambda item: -item[1][0]))
+    kind_starts.append(len(entries))
+    entries.extend(verse_entries)
+    return entries, kind_starts
+
+
+class GematriaIndex:
+    """Per method, sorted distinct values with offsets into entry ids grouped by value (CSR layout)
+
+    Everything lives in two files that are memory-mapped rather than loaded: entries.txt
+    (one "ref<TAB>text" line per entry) and index.bin (native unsigned 32-bit arrays).
+    """
+
+    def __init__(self, directory: str, meta: Dict):
+        self.directory = directory
+        self.entry_count = meta['entries']
+        self.kind_starts = meta['kind_starts'] + [self.entry_count]
+        self._files = [open(os.path.join(directory, name), 'rb') for name in ('index.bin', 'entries.txt')]
+        self._maps = [mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) for f in self._files]
+        self._view = memoryview(self._maps[0]).cast(_ITEM_TYPE)
+        self.sections = {name: self._view[start:start + count] for name, (start, count) in meta['sections'].items()}
+        self._entries = self._maps[1]
+
+    @staticmethod
+    def build(verses: Iterable[Tuple[str, str]], directory: str) -> int:
+        """Write the index for (ref, Hebrew verse) pairs into a directory; returns the number of entries"""
+        entries, kind_starts = _collect(verses)
+        os.makedirs(directory, exist_ok=True)
+
+        offsets = array(_ITEM_TYPE, [0])
+        temp_entries = os.path.join(directory, 'entries.txt.tmp')
+        with open(temp_entries, 'wb') as f:
+            for ref, text in entries:
+                line = f"{ref}\t{text}\n".encode('utf-8')
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+
+        texts = [text for _, text in entries]
+        sections = {'offsets': offsets}
+        for method in gematria.METHODS:
+            scores = gematria.score_verses(texts, method)
+            order = sorted(range(len(scores)), key=scores.__getitem__)
+            values, starts = array(_ITEM_TYPE), array(_ITEM_TYPE)
+            for position, entry in enumerate(order):
+                if not values or scores[entry] != values[-1]:
+                    values.append(scores[entry])
+                    starts.append(position)
+            starts.append(len(order))
+            sections[f'{method}.values'] = values
+            sections[f'{method}.starts'] = starts
+            sections[f'{method}.ids'] = array(_ITEM_TYPE, order)
+
+        layout = {}
+        temp_index = os.path.join(directory, 'index.bin.tmp')
+        with open(temp_index, 'wb') as f:
+            position = 0
+            for name, section in sections.items():
+                section.tofile(f)
+                layout[name] = (position, len(section))
+                position += len(section)
+
+        os.replace(temp_entries, os.path.join(directory, 'entries.txt'))
+        os.replace(temp_index, os.path.join(directory, 'index.bin'))
+        # Written last: a directory without it is an unfinished build
+        meta = {'version': INDEX_VERSION, 'entries': len(entries), 'kind_starts': kind_starts, 'sections': layout}
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return len(entries)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional['GematriaIndex']:
+        try:
+            with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != INDEX_VERSION:
+                return None
+            return cls(directory, meta)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable gematria index: {e}")
+            return None
+
+    def entry(self, entry_id: int) -> Dict:
+        offsets = self.sections['offsets']
+        line = self._entries[offsets[entry_id]:offsets[entry_id + 1] - 1].decode('utf-8')
+        ref, text = line.split('\t', 1)
+        kind = bisect_left(self.kind_starts, entry_id + 1) - 1
+        return {'kind': KIND_NAMES[kind], 'text': text, 'ref': ref}
+
+    def lookup(self, number: int, method: str = 'standard', kind: Optional[str] = None,
+               limit: int = 10, exclude: str = "") -> List[Dict]:
+        """Entries whose value under the method equals the number, optionally of one kind"""
+        values = self.sections[f'{method}.values']
+        position = bisect_left(values, number)
+        if position == len(values) or values[position] != number:
+            return []
+        starts = self.sections[f'{method}.starts']
+        ids = self.sections[f'{method}.ids'][starts[position]:starts[position + 1]]
+
+        # Ids are ascending within a value and each kind is a contiguous id range
+        low, high = 0, len(ids)
+        if kind is not None:
+            kind_id = KIND_NAMES.index(kind)
+            low = bisect_left(ids, self.kind_starts[kind_id])
+            high = bisect_left(ids, self.kind_starts[kind_id + 1])
+
+        matches = []
+        for i in range(low, high):
+            entry = self.entry(ids[i])
+            if entry['text'] != exclude:
+                matches.append(entry)
+                if len(matches) == limit:
+                    break
+        return matches
+
+    def close(self):
+        for section in self.sections.values():
+            section.release()
+        self._view.release()
+        for handle in self._maps + self._files:
+            handle.close()
+
+
+class GematriaLibrary:
+    """Owns the Tanakh equivalence index: loads it from disk, or builds it once in the background
+
+    Without the offline corpus the verses are crawled from the API one chapter at a time, only
+    while the shared rate limiter is idle. Finished chapters are appended to a checkpoint so a
+    restarted or failed build resumes where it stopped, and the index is only written once every
+    chapter in the category's shape has arrived in full; until then the build is retried with backoff.
+    """
+
+    def __init__(self, sefaria_client, directory: Optional[str] = None, category: str = "Tanakh"):
+        self.sefaria = sefaria_client
+        self.directory = directory or os.path.dirname(cache_path('gematria', 'meta.json'))
+        self.category = category
+        self.checkpoint_path = os.path.join(self.directory, 'chapters.jsonl')
+        self.index: Optional[GematriaIndex] = None
+        self._loaded = False
+        self._build_task: Optional[asyncio.Task] = None
+
+    def get(self) -> Optional[GematriaIndex]:
+        """The index if it is ready; otherwise None, and a build is started if none is running"""
+        if not self._loaded:
+            self._loaded = True
+            self.index = GematriaIndex.load(self.directory)
+        if self.index is None and self._build_task is None:
+            self._build_task = asyncio.create_task(self._build_loop())
+        return self.index
+
+    async def _build_loop(self):
+        delay = BUILD_RETRY_DELAY
+        while self.index is None:
+            try:
+                if await self._build():
+                    return
+            except Exception as e:
+                logger.error(f"Error building gematria index: {e}")
+            logger.info(f"Gematria index incomplete, retrying in {delay // 60} min")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BUILD_RETRY_MAX_DELAY)
+
+    async def _build(self) -> bool:
+        logger.info(f"Building the gematria index from Sefaria's {self.category}")
+        if self.sefaria.has_local_category(self.category):
+            verses = [verse async for verse in self.sefaria.iter_category_verses(self.category)]
+        else:
+            verses = await self._crawl()
+        if not verses:
+            return False
+        count = await asyncio.to_thread(GematriaIndex.build, verses, self.directory)
+        self.index = GematriaIndex.load(self.directory)
+        if self.index is None:
+            return False
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        logger.info(f"Gematria index ready: {count} entries from {len(verses)} verses")
+        return True
+
+    def _read_checkpoint(self) -> Dict[str, List[str]]:
+        chapters = {}
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short by a crash
+                    chapters[record['ref']] = record['verses']
+        except FileNotFoundError:
+            pass
+        return chapters
+
+    async def _crawl(self) -> Optional[List[Tuple[str, str]]]:
+        """Every (ref, verse) of the category from the API, or None while some chapter is still missing"""
+        await self.sefaria.rate_limiter.wait_idle()
+        chapters = [
+            (f"{book.get('title') or book.get('book')} {number}", count)
+            for book in await self.sefaria.get_shape(self.category)
+            if isinstance(book.get('chapters'), list)
+            for number, count in enumerate(book['chapters'], 1)
+        ]
+        if not chapters:
+            return None
+
+        done = self._read_checkpoint()
+        missing = 0
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+            for ref, count in chapters:
+                if ref in done:
+                    continue
+                await self.sefaria.rate_limiter.wait_idle()
+                verses = await self.sefaria.get_chapter_verses(ref)
+                # The shape gives each chapter's verse count; a short or empty answer is a failure
+                if not any(verses) or (isinstance(count, int) and len(verses) < count):
+                    missing += 1
+                    continue
+                done[ref] = verses
+                checkpoint.write(json.dumps({'ref': ref, 'verses': verses}, ensure_ascii=False) + '\n')
+                checkpoint.flush()
+
+        if missing:
+            logger.warning(f"Gematria crawl missing {missing} of {len(chapters)} chapters")
+            return None
+        return [
+            (f"{ref}:{number}", text)
+            for ref, _ in chapters
+            for number, text in enumerate(done[ref], 1)
+            if text
+        ]
+
+    async def close(self):
+        if self._build_task and not self._build_task.done():
+            self._build_task.cancel()
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+
+if __name__ == "__main__":
+    # Benchmark: build over a synthetic corpus, then time lookups
+    import random
+    import tempfile
+    import time
+
+    random.seed(3)
+    letters = gematria.LETTERS
+    corpus = [
+        (f"Book {i // 30 + 1}:{i % 30 + 1}",
+         ' '.join(''.join(random.choices(letters, k=random.randint(2, 6))) for _ in range(random.randint(6, 18))))
+        for i in range(23000)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        count = GematriaIndex.build(corpus, directory)
+        print(f"built {count} entries in {time.perf_counter() - start:.1f} s")
+        index = GematriaIndex.load(directory)
+        targets = [random.randint(1, 3000) for _ in range(10000)]
+        start = time.perf_counter()
+        for number in targets:
+            index.lookup(number, 'standard', limit=10)
+        print(f"lookup: {(time.perf_counter() - start) / len(targets) * 1e6:.1f} us")
+        print(index.lookup(26, 'standard', kind='word', limit=3))
+        index.close()
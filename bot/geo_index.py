@@ -0,0 +1,90 @@
+"""
+k-d tree over points on the globe for nearest-neighbour lookups
+"""
+import heapq
+import math
+from typing import List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def to_unit_vector(latitude: float, longitude: float) -> Tuple[float, float, float]:
+    """Point on the unit sphere; straight-line distance between these orders pairs like great-circle distance"""
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+def chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class KDTree:
+    """Static 3-d tree built once from (latitude, longitude) pairs; node i is stored in flat lists"""
+
+    def __init__(self, coordinates: Sequence[Tuple[float, float]]):
+        self.points = [to_unit_vector(lat, lon) for lat, lon in coordinates]
+        # Per node: the point index it holds, its split axis and its children (-1 for none)
+        self.node_point: List[int] = []
+        self.node_axis: List[int] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.root = self._build(list(range(len(self.points))), 0)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _build(self, indices: List[int], depth: int) -> int:
+        if not indices:
+            return -1
+        axis = depth % 3
+        indices.sort(key=lambda i: self.points[i][axis])
+        middle = len(indices) // 2
+
+        node = len(self.node_point)
+        self.node_point.append(indices[middle])
+        self.node_axis.append(axis)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.left[node] = self._build(indices[:middle], depth + 1)
+        self.right[node] = self._build(indices[middle + 1:], depth + 1)
+        return node
+
+    def nearest(self, latitude: float, longitude: float, count: int = 5,
+                max_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        """(point index, distance in km) for the closest points, nearest first"""
+        if self.root < 0 or count <= 0:
+            return []
+        target = to_unit_vector(latitude, longitude)
+        # Max-heap of (-squared chord, index) holding the best `count` so far
+        best: List[Tuple[float, int]] = []
+        limit = (2 * math.sin(max_km / (2 * EARTH_RADIUS_KM))) ** 2 if max_km is not None else math.inf
+        points, node_point, node_axis, left, right = self.points, self.node_point, self.node_axis, self.left, self.right
+
+        # (node, squared distance from the target to that node's side of its parent's plane)
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= (-best[0][0] if len(best) == count else limit):
+                continue
+            point_index = node_point[node]
+            point = points[point_index]
+            dx, dy, dz = point[0] - target[0], point[1] - target[1], point[2] - target[2]
+            distance = dx * dx + dy * dy + dz * dz
+            worst = -best[0][0] if len(best) == count else limit
+            if distance < worst:
+                if len(best) == count:
+                    heapq.heapreplace(best, (-distance, point_index))
+                else:
+                    heapq.heappush(best, (-distance, point_index))
+                worst = -best[0][0] if len(best) == count else limit
+
+            axis = node_axis[node]
+            offset = target[axis] - point[axis]
+            near, far = (left[node], right[node]) if offset < 0 else (right[node], left[node])
+            # The far side is only searched if the splitting plane is closer than the worst match kept
+            if far >= 0 and offset * offset < worst:
+                stack.append((far, offset * offset))
+            if near >= 0:
+                stack.append((near, 0.0))
+
+        return [(index, chord_to_km(math.sqrt(-negative))) for negative, index in sorted(best, reverse=True)]
@@ -0,0 +1,36 @@
+"""
+Per-guild feature switches, kept in a small JSON file in the cache directory
+"""
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from .storage import cache_path
+
+logger = logging.getLogger(__name__)
+
+
+class GuildSettings:
+    """{guild id: {setting: value}}, saved on every change"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or cache_path('guild_settings.json')
+        self._settings: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._settings = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable guild settings: {e}")
+
+    def get(self, guild_id: int, name: str, default: Any = None) -> Any:
+        return self._settings.get(str(guild_id), {}).get(name, default)
+
+    def set(self, guild_id: int, name: str, value: Any):
+        self._settings.setdefault(str(guild_id), {})[name] = value
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._settings, f)
+        os.replace(temp_path, self.path)
@@ -7,6 +7,8 @@ import logging
 from typing import Optional, Dict, List
 from datetime import datetime, date
 
+from .locations import geonameid_for
+
 logger = logging.getLogger(__name__)
 
 class HebcalClient:
@@ -64,18 +66,7 @@ class HebcalClient:
         """Get Shabbat candle lighting and havdalah times"""
         try:
             # For simplicity, use geoid for major cities
-            location_map = {
-                "new york": "5128581",
-                "los angeles": "5368361", 
-                "chicago": "4887398",
-                "miami": "4164138",
-                "jerusalem": "281184",
-                "tel aviv": "293397",
-                "london": "2643743",
-                "paris": "2988507"
-            }
-            
-            geonameid = location_map.get(location.lower(), "5128581")  # Default to NYC
+            geonameid = geonameid_for(location)
             
             params = {
                 "cfg": "json",
@@ -169,18 +160,7 @@ class HebcalClient:
                 date_obj = date.today()
             
             # Use same location mapping as Shabbat times
-            location_map = {
-                "new york": "5128581",
-                "los angeles": "5368361", 
-                "chicago": "4887398",
-                "miami": "4164138",
-                "jerusalem": "281184",
-                "tel aviv": "293397",
-                "london": "2643743",
-                "paris": "2988507"
-            }
-            
-            geonameid = location_map.get(location.lower(), "5128581")
+            geonameid = geonameid_for(location)
             
             params = {
                 "cfg": "json",
@@ -0,0 +1,154 @@
+"""
+Local Hebrew calendar arithmetic (no network required)
+"""
+import math
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple
+
+# Month numbers follow the biblical count used by Hebcal: Nisan = 1 ... Adar = 12, Adar II = 13
+NISAN, IYYAR, SIVAN, TAMUZ, AV, ELUL = 1, 2, 3, 4, 5, 6
+TISHREI, CHESHVAN, KISLEV, TEVET, SHVAT, ADAR_I, ADAR_II = 7, 8, 9, 10, 11, 12, 13
+
+MONTH_NAMES = {
+    NISAN: "Nisan", IYYAR: "Iyyar", SIVAN: "Sivan", TAMUZ: "Tamuz", AV: "Av", ELUL: "Elul",
+    TISHREI: "Tishrei", CHESHVAN: "Cheshvan", KISLEV: "Kislev", TEVET: "Tevet", SHVAT: "Sh'vat",
+    ADAR_I: "Adar", ADAR_II: "Adar II"
+}
+
+# Fixed (R.D.) day number preceding 1 Tishrei AM 1; date.toordinal() uses the same R.D. count
+_EPOCH = -1373428
+
+_elapsed_cache = {}
+
+# Jerusalem, used for the default Hebrew-day boundary
+JERUSALEM = (31.778, 35.235)
+
+
+class HebrewDate(NamedTuple):
+    """A Hebrew calendar date"""
+    year: int
+    month: int
+    day: int
+
+    def month_name(self) -> str:
+        if self.month == ADAR_I and is_leap_year(self.year):
+            return "Adar I"
+        return MONTH_NAMES[self.month]
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.month_name()} {self.year}"
+
+
+def is_leap_year(year: int) -> bool:
+    """Whether the Hebrew year has 13 months"""
+    return (7 * year + 1) % 19 < 7
+
+
+def months_in_year(year: int) -> int:
+    return 13 if is_leap_year(year) else 12
+
+
+def elapsed_days(year: int) -> int:
+    """Days from the calendar epoch to 1 Tishrei of the given year (molad and dechiyot applied)"""
+    cached = _elapsed_cache.get(year)
+    if cached is not None:
+        return cached
+
+    prev = year - 1
+    months_elapsed = 235 * (prev // 19) + 12 * (prev % 19) + (7 * (prev % 19) + 1) // 19
+    parts_elapsed = 204 + 793 * (months_elapsed % 1080)
+    hours_elapsed = 5 + 12 * months_elapsed + 793 * (months_elapsed // 1080) + parts_elapsed // 1080
+    day = 1 + 29 * months_elapsed + hours_elapsed // 24
+    parts = 1080 * (hours_elapsed % 24) + parts_elapsed % 1080
+
+    if (parts >= 19440
+            or (day % 7 == 2 and parts >= 9924 and not is_leap_year(year))
+            or (day % 7 == 1 and parts >= 16789 and is_leap_year(prev))):
+        day += 1
+    if day % 7 in (0, 3, 5):
+        day += 1
+
+    _elapsed_cache[year] = day
+    return day
+
+
+def days_in_year(year: int) -> int:
+    return elapsed_days(year + 1) - elapsed_days(year)
+
+
+def days_in_month(month: int, year: int) -> int:
+    if month in (IYYAR, TAMUZ, ELUL, TEVET, ADAR_II):
+        return 29
+    if month == ADAR_I and not is_leap_year(year):
+        return 29
+    if month == CHESHVAN and days_in_year(year) % 10 != 5:
+        return 29
+    if month == KISLEV and days_in_year(year) % 10 == 3:
+        return 29
+    return 30
+
+
+def _month_order(year: int):
+    """Months in calendar order starting from Tishrei"""
+    return list(range(TISHREI, months_in_year(year) + 1)) + list(range(NISAN, TISHREI))
+
+
+def to_ordinal(hdate: HebrewDate) -> int:
+    """Convert a Hebrew date to a proleptic Gregorian ordinal (compatible with date.toordinal)"""
+    day = hdate.day
+    for month in _month_order(hdate.year):
+        if month == hdate.month:
+            break
+        day += days_in_month(month, hdate.year)
+    return _EPOCH + elapsed_days(hdate.year) + day - 1
+
+
+def from_ordinal(ordinal: int) -> HebrewDate:
+    """Convert a proleptic Gregorian ordinal to a Hebrew date"""
+    year = (ordinal - _EPOCH) // 366 + 1
+    while to_ordinal(HebrewDate(year + 1, TISHREI, 1)) <= ordinal:
+        year += 1
+
+    day = ordinal - to_ordinal(HebrewDate(year, TISHREI, 1)) + 1
+    for month in _month_order(year):
+        length = days_in_month(month, year)
+        if day <= length:
+            return HebrewDate(year, month, day)
+        day -= length
+    raise ValueError(f"Ordinal {ordinal} could not be converted")
+
+
+def to_hebrew(gregorian: date) -> HebrewDate:
+    """Convert a Gregorian date to a Hebrew date"""
+    return from_ordinal(gregorian.toordinal())
+
+
+def to_gregorian(hdate: HebrewDate) -> date:
+    """Convert a Hebrew date to a Gregorian date"""
+    return date.fromordinal(to_ordinal(hdate))
+
+
+def sunset_utc(day: date, latitude: float = JERUSALEM[0], longitude: float = JERUSALEM[1]) -> datetime:
+    """Approximate sunset (NOAA solar equations, within a couple of minutes) as an aware UTC datetime"""
+    gamma = 2 * math.pi / 365 * (day.timetuple().tm_yday - 1)
+    equation_of_time = 229.18 * (0.000075 + 0.001868 * math.cos(gamma) - 0.032077 * math.sin(gamma)
+                                 - 0.014615 * math.cos(2 * gamma) - 0.040849 * math.sin(2 * gamma))
+    declination = (0.006918 - 0.399912 * math.cos(gamma) + 0.070257 * math.sin(gamma)
+                   - 0.006758 * math.cos(2 * gamma) + 0.000907 * math.sin(2 * gamma)
+                   - 0.002697 * math.cos(3 * gamma) + 0.00148 * math.sin(3 * gamma))
+    lat = math.radians(latitude)
+    cos_hour_angle = (math.cos(math.radians(90.833)) / (math.cos(lat) * math.cos(declination))
+                      - math.tan(lat) * math.tan(declination))
+    hour_angle = math.degrees(math.acos(max(-1.0, min(1.0, cos_hour_angle))))
+    minutes = 720 - 4 * (longitude - hour_angle) - equation_of_time
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(minutes=minutes)
+
+
+def next_day_boundary(now: datetime, latitude: float = JERUSALEM[0], longitude: float = JERUSALEM[1]) -> datetime:
+    """Next sunset after `now` (aware), when the Hebrew date advances"""
+    day = now.astimezone(timezone.utc).date() - timedelta(days=1)
+    while True:
+        boundary = sunset_utc(day, latitude, longitude)
+        if boundary > now:
+            return boundary
+        day += timedelta(days=1)
@@ -0,0 +1,87 @@
+"""
+Incremental extraction of page metadata (JSON-LD, <title>, meta description) from an HTML <head>
+"""
+import codecs
+import json
+from html.parser import HTMLParser
+from typing import Dict, Optional
+
+
+class HeadParser(HTMLParser):
+    """Feed HTML in chunks; `done` turns True once everything of interest in <head> has been read
+
+    Only the first JSON-LD block that parses is kept, matching what the regex-based
+    extraction used to return.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.result: Dict = {}
+        self.done = False
+        self._title_parts = []
+        self._in_title = False
+        self._jsonld_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            self.done = True
+        elif tag == 'title' and 'title' not in self.result:
+            self._in_title = True
+        elif tag == 'script':
+            attributes = dict(attrs)
+            if (attributes.get('type') or '').lower() == 'application/ld+json' and 'structured_data' not in self.result:
+                self._jsonld_parts = []
+        elif tag == 'meta' and 'description' not in self.result:
+            attributes = dict(attrs)
+            if (attributes.get('name') or '').lower() == 'description' and attributes.get('content'):
+                self.result['description'] = attributes['content'].strip()
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.done = True
+        elif tag == 'title' and self._in_title:
+            self._in_title = False
+            self.result['title'] = ''.join(self._title_parts).strip()
+        elif tag == 'script' and self._jsonld_parts is not None:
+            try:
+                self.result['structured_data'] = json.loads(''.join(self._jsonld_parts).strip())
+            except json.JSONDecodeError:
+                pass
+            self._jsonld_parts = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+        elif self._jsonld_parts is not None:
+            self._jsonld_parts.append(data)
+
+
+class HeadReader:
+    """Decodes byte chunks and feeds them to a HeadParser"""
+
+    def __init__(self, encoding: Optional[str] = None):
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.parser = HeadParser()
+        self.bytes_read = 0
+
+    @property
+    def done(self) -> bool:
+        return self.parser.done
+
+    def feed(self, chunk: bytes):
+        self.bytes_read += len(chunk)
+        self.parser.feed(self._decoder.decode(chunk))
+
+    def result(self) -> Dict:
+        return self.parser.result
+
+
+def parse_head(html: str) -> Dict:
+    """Metadata from a complete HTML document"""
+    parser = HeadParser()
+    parser.feed(html)
+    parser.close()
+    return parser.result
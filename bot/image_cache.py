@@ -0,0 +1,170 @@
+"""
+Disk-backed thumbnail cache for archive images (NLI photos and manuscripts)
+"""
+import aiohttp
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from PIL import Image
+
+from .cache import LRUCache
+from .storage import cache_path
+
+logger = logging.getLogger(__name__)
+
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{40}$')
+
+
+class ImageCache:
+    """Downloads each image once, keeps a resized JPEG on disk and evicts least recently used files past a byte budget"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 128 * 1024 * 1024,
+                 max_dimension: int = 512, max_download: int = 15 * 1024 * 1024):
+        self.directory = directory or cache_path('images')
+        self.max_bytes = max_bytes
+        self.max_dimension = max_dimension
+        self.max_download = max_download
+        # Base URL the web server is reachable at; without it images are sent as attachments
+        self.public_base_url = os.getenv('PUBLIC_BASE_URL', '').rstrip('/')
+        self.session = None
+
+        # Upstream URL for each key handed out, so the web route can fill a cold miss
+        self.sources = LRUCache(maxsize=4096)
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._sizes: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the LRU order from file modification times left by a previous run"""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.jpg'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._sizes[key] = size
+            self._total += size
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def public_url(self, url: str) -> Optional[str]:
+        """URL on our own web server that serves the cached thumbnail, if one is configured"""
+        if not self.public_base_url:
+            return None
+        key = self.key_for(url)
+        self.sources.set(key, url)
+        return f"{self.public_base_url}/images/{key}.jpg"
+
+    async def _ensure_session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+
+    def _touch(self, key: str):
+        self._sizes.move_to_end(key)
+        try:
+            os.utime(self.path_for(key))
+        except OSError:
+            pass
+
+    async def get(self, url: str) -> Optional[str]:
+        """Local path of the thumbnail for an image URL, downloading it on first use"""
+        key = self.key_for(url)
+        self.sources.set(key, url)
+        return await self.get_by_key(key)
+
+    async def get_by_key(self, key: str) -> Optional[str]:
+        """Local path for a cache key, or None if the key is unknown or the download fails"""
+        if not _KEY_PATTERN.match(key):
+            return None
+        if key in self._sizes:
+            self._touch(key)
+            return self.path_for(key)
+
+        url = self.sources.get(key)
+        if url is None:
+            return None
+
+        # Concurrent requests for one image share a single download
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, url))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, url: str) -> Optional[str]:
+        data = await self._download(url)
+        if data is None:
+            return None
+        loop = asyncio.get_running_loop()
+        size = await loop.run_in_executor(None, self._write_thumbnail, data, self.path_for(key))
+        if size is None:
+            return None
+        self._sizes[key] = size
+        self._total += size
+        self._evict()
+        return self.path_for(key)
+
+    async def _download(self, url: str) -> Optional[bytes]:
+        await self._ensure_session()
+        try:
+            timeout = aiohttp.ClientTimeout(total=20)
+            async with self.session.get(url, timeout=timeout) as response:
+                if response.status != 200 or not response.content_type.startswith('image/'):
+                    logger.error(f"Image request failed: {response.status} {response.content_type}")
+                    return None
+                chunks = []
+                received = 0
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    received += len(chunk)
+                    if received > self.max_download:
+                        logger.warning(f"Image too large to cache: {url}")
+                        return None
+                    chunks.append(chunk)
+                return b''.join(chunks)
+        except Exception as e:
+            logger.error(f"Error downloading image: {e}")
+            return None
+
+    def _write_thumbnail(self, data: bytes, path: str) -> Optional[int]:
+        """Resize to fit max_dimension and store as JPEG; returns the file size"""
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.thumbnail((self.max_dimension, self.max_dimension))
+                if image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                temp_path = f"{path}.part"
+                image.save(temp_path, format='JPEG', quality=85, optimize=True)
+            os.replace(temp_path, path)
+            return os.path.getsize(path)
+        except Exception as e:
+            logger.error(f"Could not create thumbnail: {e}")
+            return None
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._sizes) > 1:
+            key, size = self._sizes.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+
+    async def close(self):
+        for task in list(self._loading.values()):
+            task.cancel()
+        if self.session:
+            await self.session.close()
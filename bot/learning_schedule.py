@@ -0,0 +1,289 @@
+"""
+Local learning-cycle engine for Tanya (approximate), Daf Yomi, Rambam and Mishnah Yomit
+"""
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .hebrew_calendar import HebrewDate, KISLEV, to_hebrew, to_ordinal
+
+logger = logging.getLogger(__name__)
+
+# Daf Yomi: (Sefaria title, number of blatt as counted by the cycle)
+# Cycles 1-7 learned Shekalim over 13 blatt, later cycles over 22 (Vilna Yerushalmi)
+DAF_YOMI_TRACTATES = [
+    ("Berakhot", 64), ("Shabbat", 157), ("Eruvin", 105), ("Pesachim", 121), ("Shekalim", 22),
+    ("Yoma", 88), ("Sukkah", 56), ("Beitzah", 40), ("Rosh Hashanah", 35), ("Taanit", 31),
+    ("Megillah", 32), ("Moed Katan", 29), ("Chagigah", 27), ("Yevamot", 122), ("Ketubot", 112),
+    ("Nedarim", 91), ("Nazir", 66), ("Sotah", 49), ("Gittin", 90), ("Kiddushin", 82),
+    ("Bava Kamma", 119), ("Bava Metzia", 119), ("Bava Batra", 176), ("Sanhedrin", 113),
+    ("Makkot", 24), ("Shevuot", 49), ("Avodah Zarah", 76), ("Horayot", 14), ("Zevachim", 120),
+    ("Menachot", 110), ("Chullin", 142), ("Bekhorot", 61), ("Arakhin", 34), ("Temurah", 34),
+    ("Keritot", 28), ("Meilah", 22), ("Kinnim", 4), ("Tamid", 10), ("Middot", 4), ("Niddah", 73)
+]
+# Kinnim, Tamid and Middot are printed at the end of Meilah, so their pages continue its numbering
+_DAF_YOMI_PAGE_OFFSETS = {"Kinnim": 21, "Tamid": 24, "Middot": 32}
+_DAF_YOMI_FIRST_CYCLE = date(1923, 9, 11)
+_DAF_YOMI_EIGHTH_CYCLE = date(1975, 6, 24)
+
+# Rambam, three chapters a day: 1017 units (Sefer HaMitzvot introduction + 1000 chapters) over 339 days
+RAMBAM_HILCHOT = [
+    ("Transmission of the Oral Law", 4), ("Positive Mitzvot", 5), ("Negative Mitzvot", 5),
+    ("Overview of Mishneh Torah Contents", 3),
+    ("Foundations of the Torah", 10), ("Human Dispositions", 7), ("Torah Study", 7),
+    ("Foreign Worship and Customs of the Nations", 12), ("Repentance", 10),
+    ("Reading the Shema", 4), ("Prayer and the Priestly Blessing", 15),
+    ("Tefillin, Mezuzah and the Torah Scroll", 10), ("Fringes", 3), ("Blessings", 11), ("Circumcision", 3),
+    ("Sabbath", 30), ("Eruvin", 8), ("Rest on the Tenth of Tishrei", 3), ("Rest on a Holiday", 8),
+    ("Leavened and Unleavened Bread", 8), ("Shofar, Sukkah and Lulav", 8), ("Sheqel Dues", 4),
+    ("Sanctification of the New Month", 19), ("Fasts", 5), ("Scroll of Esther and Hanukkah", 4),
+    ("Marriage", 25), ("Divorce", 13), ("Levirate Marriage and Release", 8), ("Virgin Maiden", 3),
+    ("Woman Suspected of Infidelity", 4),
+    ("Forbidden Intercourse", 22), ("Forbidden Foods", 17), ("Ritual Slaughter", 14),
+    ("Oaths", 12), ("Vows", 13), ("Nazariteship", 10), ("Appraisals and Devoted Property", 8),
+    ("Diverse Species", 10), ("Gifts to the Poor", 10), ("Heave Offerings", 15), ("Tithes", 14),
+    ("Second Tithes and Fourth Year's Fruit", 11),
+    ("First Fruits and other Gifts to Priests Outside the Sanctuary", 12),
+    ("Sabbatical Year and the Jubilee", 13),
+    ("The Chosen Temple", 8), ("Vessels of the Sanctuary and Those who Serve Therein", 10),
+    ("Admission into the Sanctuary", 9), ("Things Forbidden on the Altar", 7), ("Sacrificial Procedure", 19),
+    ("Daily Offerings and Additional Offerings", 10), ("Sacrifices Rendered Unfit", 19),
+    ("Service on the Day of Atonement", 5), ("Trespass", 8),
+    ("Paschal Offering", 10), ("Festival Offering", 3), ("Firstlings", 8),
+    ("Offerings for Unintentional Transgressions", 15), ("Offerings for Those with Incomplete Atonement", 5),
+    ("Substitution", 4),
+    ("Defilement by a Corpse", 25), ("Red Heifer", 15), ("Defilement by Leprosy", 16),
+    ("Those Who Defile Bed or Seat", 13), ("Other Sources of Defilement", 20), ("Defilement of Foods", 16),
+    ("Vessels", 28), ("Immersion Pools", 11),
+    ("Damages to Property", 14), ("Theft", 9), ("Robbery and Lost Property", 18),
+    ("One Who Injures a Person or Property", 8), ("Murderer and the Preservation of Life", 13),
+    ("Sales", 30), ("Ownerless Property and Gifts", 12), ("Neighbors", 14), ("Agents and Partners", 10),
+    ("Slaves", 9),
+    ("Hiring", 13), ("Borrowing and Deposit", 8), ("Creditor and Debtor", 27), ("Plaintiff and Defendant", 16),
+    ("Inheritances", 11),
+    ("The Sanhedrin and the Penalties within their Jurisdiction", 26), ("Testimony", 22), ("Rebels", 7),
+    ("Mourning", 14), ("Kings and Wars", 12)
+]
+_RAMBAM_CYCLE_START = date(1984, 4, 29)
+_RAMBAM_CHAPTERS_PER_DAY = 3
+
+# Tanya: (Sefaria title, chapters). The yearly cycle runs from 19 Kislev to 18 Kislev.
+TANYA_PARTS = [
+    ("Tanya, Part I; Likkutei Amarim", 53),
+    ("Tanya, Part II; Sha'ar HaYichud VehaEmunah", 12),
+    ("Tanya, Part III; Igeret HaTeshuvah", 12),
+    ("Tanya, Part IV; Igeret HaKodesh", 32),
+    ("Tanya, Part V; Kuntres Acharon", 9)
+]
+
+# Mishnah Yomit: two mishnayot a day through the six orders
+MISHNAH_TRACTATES = [
+    "Berakhot", "Peah", "Demai", "Kilayim", "Sheviit", "Terumot", "Maasrot", "Maaser Sheni", "Challah",
+    "Orlah", "Bikkurim",
+    "Shabbat", "Eruvin", "Pesachim", "Shekalim", "Yoma", "Sukkah", "Beitzah", "Rosh Hashanah", "Taanit",
+    "Megillah", "Moed Katan", "Chagigah",
+    "Yevamot", "Ketubot", "Nedarim", "Nazir", "Sotah", "Gittin", "Kiddushin",
+    "Bava Kamma", "Bava Metzia", "Bava Batra", "Sanhedrin", "Makkot", "Shevuot", "Eduyot", "Avodah Zarah",
+    "Avot", "Horayot",
+    "Zevachim", "Menachot", "Chullin", "Bekhorot", "Arakhin", "Temurah", "Keritot", "Meilah", "Tamid",
+    "Middot", "Kinnim",
+    "Kelim", "Oholot", "Negaim", "Parah", "Tahorot", "Mikvaot", "Niddah", "Makhshirin", "Zavim",
+    "Tevul Yom", "Yadayim", "Oktzin"
+]
+_MISHNAH_YOMIT_CYCLE_START = date(1947, 5, 20)
+_MISHNAYOT_PER_DAY = 2
+
+
+def mishnah_title(tractate: str) -> str:
+    """Sefaria title of a Mishnah tractate"""
+    return "Pirkei Avot" if tractate == "Avot" else f"Mishnah {tractate}"
+
+
+class LearningSchedule:
+    """Computes the daily learning cycles from calendar arithmetic and bundled tables"""
+
+    def __init__(self, mishnah_shape: Optional[Dict[str, List[int]]] = None):
+        # Flatten the Rambam table once so a day's chapters are a slice
+        self._rambam_units: List[Tuple[str, int]] = [
+            (title, chapter)
+            for title, chapters in RAMBAM_HILCHOT
+            for chapter in range(1, chapters + 1)
+        ]
+        self._rambam_cycle_days = len(self._rambam_units) // _RAMBAM_CHAPTERS_PER_DAY
+
+        self._tanya_units: List[Tuple[str, int]] = [
+            (title, chapter)
+            for title, chapters in TANYA_PARTS
+            for chapter in range(1, chapters + 1)
+        ]
+
+        self._mishnah_units: List[Tuple[str, int, int]] = []
+        if mishnah_shape:
+            self.set_mishnah_shape(mishnah_shape)
+
+    def set_mishnah_shape(self, shape: Dict[str, List[int]]):
+        """Load mishnayot-per-chapter counts, keyed by tractate (as in MISHNAH_TRACTATES)"""
+        units = []
+        for tractate in MISHNAH_TRACTATES:
+            for chapter, count in enumerate(shape.get(tractate, []), 1):
+                units.extend((tractate, chapter, mishnah) for mishnah in range(1, count + 1))
+        self._mishnah_units = units
+        logger.info(f"Loaded Mishnah Yomit table with {len(units)} mishnayot")
+
+    @property
+    def has_mishnah_yomit(self) -> bool:
+        return bool(self._mishnah_units)
+
+    async def load_mishnah_shape(self, sefaria_client) -> bool:
+        """Fetch the Mishnah chapter lengths from Sefaria once (a single category request)"""
+        if self._mishnah_units:
+            return True
+
+        titles = {mishnah_title(tractate): tractate for tractate in MISHNAH_TRACTATES}
+        shape = {}
+        for book in await sefaria_client.get_shape("Mishnah"):
+            tractate = titles.get(book.get('title', book.get('book', '')))
+            chapters = book.get('chapters')
+            if tractate and isinstance(chapters, list):
+                shape[tractate] = [count for count in chapters if isinstance(count, int)]
+
+        if len(shape) < len(MISHNAH_TRACTATES):
+            logger.warning(f"Mishnah shape incomplete ({len(shape)} of {len(MISHNAH_TRACTATES)} tractates)")
+            return False
+
+        self.set_mishnah_shape(shape)
+        return True
+
+    def daf_yomi(self, day: date) -> Dict:
+        """Daf Yomi page for a date"""
+        if day < _DAF_YOMI_FIRST_CYCLE:
+            raise ValueError("Daf Yomi began on 1923-09-11")
+
+        if day < _DAF_YOMI_EIGHTH_CYCLE:
+            elapsed = (day - _DAF_YOMI_FIRST_CYCLE).days
+            cycle, page_index = 1 + elapsed // 2702, elapsed % 2702
+        else:
+            elapsed = (day - _DAF_YOMI_EIGHTH_CYCLE).days
+            cycle, page_index = 8 + elapsed // 2711, elapsed % 2711
+
+        total = 0
+        for tractate, blatt in DAF_YOMI_TRACTATES:
+            if tractate == "Shekalim" and cycle <= 7:
+                blatt = 13
+            total += blatt - 1
+            if page_index < total:
+                daf = blatt + 1 - (total - page_index) + _DAF_YOMI_PAGE_OFFSETS.get(tractate, 0)
+                return {
+                    'cycle': cycle,
+                    'tractate': tractate,
+                    'daf': daf,
+                    'ref': f"{tractate} {daf}"
+                }
+        raise ValueError(f"Daf Yomi table does not cover {day}")
+
+    def rambam(self, day: date) -> Dict:
+        """Rambam three-chapters-a-day portion for a date"""
+        elapsed = (day - _RAMBAM_CYCLE_START).days
+        if elapsed < 0:
+            raise ValueError("The Rambam cycle began on 1984-04-29")
+
+        start = (elapsed % self._rambam_cycle_days) * _RAMBAM_CHAPTERS_PER_DAY
+        units = self._rambam_units[start:start + _RAMBAM_CHAPTERS_PER_DAY]
+        return {
+            'cycle': 1 + elapsed // self._rambam_cycle_days,
+            'chapters': [f"{title} {chapter}" for title, chapter in units],
+            'refs': _group_refs((f"Mishneh Torah, {title}", chapter) for title, chapter in units)
+        }
+
+    def tanya(self, day: date) -> Dict:
+        """Approximate Tanya chapter for a date, spreading the book evenly over the year from 19 Kislev
+
+        The published Chitas schedule (Hayom Yom) divides chapters unevenly and is not
+        bundled here, so this is only near the real portion; callers should say so.
+        """
+        hdate = to_hebrew(day)
+        ordinal = day.toordinal()
+        year = hdate.year if ordinal >= to_ordinal(HebrewDate(hdate.year, KISLEV, 19)) else hdate.year - 1
+        cycle_start = to_ordinal(HebrewDate(year, KISLEV, 19))
+        cycle_days = to_ordinal(HebrewDate(year + 1, KISLEV, 19)) - cycle_start
+        day_index = ordinal - cycle_start
+
+        # There are fewer chapters than days, so each chapter is learned over consecutive days
+        index = day_index * len(self._tanya_units) // cycle_days
+
+        title, chapter = self._tanya_units[index]
+        return {
+            'hebrew_date': str(hdate),
+            'title': title,
+            'chapter': chapter,
+            'approximate': True,
+            'refs': [f"{title} {chapter}"]
+        }
+
+    def mishnah_yomit(self, day: date) -> Optional[Dict]:
+        """Mishnah Yomit portion for a date, or None until the Mishnah table is loaded"""
+        if not self._mishnah_units:
+            return None
+
+        elapsed = (day - _MISHNAH_YOMIT_CYCLE_START).days
+        if elapsed < 0:
+            raise ValueError("Mishnah Yomit began on 1947-05-20")
+
+        cycle_days = -(-len(self._mishnah_units) // _MISHNAYOT_PER_DAY)
+        start = (elapsed % cycle_days) * _MISHNAYOT_PER_DAY
+        units = self._mishnah_units[start:start + _MISHNAYOT_PER_DAY]
+
+        refs = []
+        for tractate, chapter, mishnah in units:
+            title = mishnah_title(tractate)
+            if refs and refs[-1][0] == title and refs[-1][1] == chapter:
+                refs[-1][3] = mishnah
+            else:
+                refs.append([title, chapter, mishnah, mishnah])
+        return {
+            'cycle': 1 + elapsed // cycle_days,
+            'refs': [
+                f"{title} {chapter}:{first}" if first == last else f"{title} {chapter}:{first}-{last}"
+                for title, chapter, first, last in refs
+            ]
+        }
+
+    def for_date(self, day: date) -> Dict:
+        """All learning cycles for a single date"""
+        return {
+            'date': day.isoformat(),
+            'hebrew_date': str(to_hebrew(day)),
+            'tanya': self.tanya(day),
+            'daf_yomi': self.daf_yomi(day),
+            'rambam': self.rambam(day),
+            'mishnah_yomit': self.mishnah_yomit(day)
+        }
+
+    def get_schedule(self, start: date, days: int = 7) -> List[Dict]:
+        """Learning cycles for a range of dates"""
+        return [self.for_date(start + timedelta(days=offset)) for offset in range(days)]
+
+    def refs_for_range(self, start: date, days: int = 7) -> List[str]:
+        """Every Sefaria ref scheduled in a date range, in order and without duplicates"""
+        refs = []
+        for entry in self.get_schedule(start, days):
+            refs.extend(entry['tanya']['refs'])
+            refs.append(entry['daf_yomi']['ref'])
+            refs.extend(entry['rambam']['refs'])
+            if entry['mishnah_yomit']:
+                refs.extend(entry['mishnah_yomit']['refs'])
+        return list(dict.fromkeys(refs))
+
+
+def _group_refs(units) -> List[str]:
+    """Collapse consecutive (title, chapter) pairs into chapter-range refs"""
+    groups = []
+    for title, chapter in units:
+        if groups and groups[-1][0] == title and groups[-1][2] == chapter - 1:
+            groups[-1][2] = chapter
+        else:
+            groups.append([title, chapter, chapter])
+    return [
+        f"{title} {first}" if first == last else f"{title} {first}-{last}"
+        for title, first, last in groups
+    ]
@@ -0,0 +1,87 @@
+"""
+Known cities with coordinates (and Hebcal GeoNames IDs where the bot uses them)
+"""
+from typing import Dict, NamedTuple, Optional
+
+from .hebrew_text import normalize
+
+
+class City(NamedTuple):
+    name: str
+    latitude: float
+    longitude: float
+    geonameid: Optional[str] = None
+
+
+CITIES: Dict[str, City] = {normalize(city.name): city for city in (
+    City("New York", 40.7128, -74.0060, "5128581"),
+    City("Los Angeles", 34.0522, -118.2437, "5368361"),
+    City("Chicago", 41.8781, -87.6298, "4887398"),
+    City("Miami", 25.7617, -80.1918, "4164138"),
+    City("Jerusalem", 31.7683, 35.2137, "281184"),
+    City("Tel Aviv", 32.0853, 34.7818, "293397"),
+    City("London", 51.5074, -0.1278, "2643743"),
+    City("Paris", 48.8566, 2.3522, "2988507"),
+    City("Crown Heights", 40.6694, -73.9422),
+    City("Toronto", 43.6532, -79.3832),
+    City("Montreal", 45.5017, -73.5673),
+    City("Boston", 42.3601, -71.0589),
+    City("Philadelphia", 39.9526, -75.1652),
+    City("Baltimore", 39.2904, -76.6122),
+    City("Washington", 38.9072, -77.0369),
+    City("Atlanta", 33.7490, -84.3880),
+    City("Cleveland", 41.4993, -81.6944),
+    City("Detroit", 42.3314, -83.0458),
+    City("St. Louis", 38.6270, -90.1994),
+    City("Minneapolis", 44.9778, -93.2650),
+    City("Dallas", 32.7767, -96.7970),
+    City("Houston", 29.7604, -95.3698),
+    City("Denver", 39.7392, -104.9903),
+    City("Phoenix", 33.4484, -112.0740),
+    City("San Francisco", 37.7749, -122.4194),
+    City("Seattle", 47.6062, -122.3321),
+    City("Mexico City", 19.4326, -99.1332),
+    City("Buenos Aires", -34.6037, -58.3816),
+    City("Sao Paulo", -23.5505, -46.6333),
+    City("Manchester", 53.4808, -2.2426),
+    City("Antwerp", 51.2194, 4.4025),
+    City("Amsterdam", 52.3676, 4.9041),
+    City("Berlin", 52.5200, 13.4050),
+    City("Rome", 41.9028, 12.4964),
+    City("Milan", 45.4642, 9.1900),
+    City("Moscow", 55.7558, 37.6173),
+    City("Kyiv", 50.4501, 30.5234),
+    City("Haifa", 32.7940, 34.9896),
+    City("Tzfat", 32.9646, 35.4960),
+    City("Bnei Brak", 32.0807, 34.8338),
+    City("Kfar Chabad", 31.9877, 34.8528),
+    City("Johannesburg", -26.2041, 28.0473),
+    City("Sydney", -33.8688, 151.2093),
+    City("Melbourne", -37.8136, 144.9631),
+    City("Hong Kong", 22.3193, 114.1694),
+    City("Bangkok", 13.7563, 100.5018),
+)}
+
+ALIASES = {
+    "nyc": "new york",
+    "ny": "new york",
+    "brooklyn": "crown heights",
+    "la": "los angeles",
+    "sf": "san francisco",
+    "dc": "washington",
+    "safed": "tzfat",
+    "kiev": "kyiv",
+    "tel aviv yafo": "tel aviv",
+}
+
+
+def find_city(text: str) -> Optional[City]:
+    """Look up a city by name or common alias, ignoring case, spacing and punctuation"""
+    key = normalize(text)
+    return CITIES.get(ALIASES.get(key, key))
+
+
+def geonameid_for(text: str, default: str = CITIES["new york"].geonameid) -> str:
+    """Hebcal GeoNames ID for a city, falling back to New York"""
+    city = find_city(text)
+    return city.geonameid if city and city.geonameid else default
@@ -3,12 +3,63 @@ Client for interacting with the National Library of Israel API
 """
 import aiohttp
 import asyncio
+import json
 import logging
-from typing import Dict, List, Optional, Union
+import random
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 from urllib.parse import quote
 
+from .cache import LRUCache
+from .hebrew_text import normalize, strip_marks
+from .nli_records import NLIRecord, decode_search
+from .rate_limiter import TokenBucket
+
 logger = logging.getLogger(__name__)
 
+# NLI material_type values behind the bot's archive categories
+MATERIAL_TYPES = {
+    'manuscripts': 'manuscript',
+    'photos': 'photograph',
+    'maps': 'map',
+    'audio': 'audio'
+}
+
+# Collections searched together by search_all_materials, in display order
+COMBINED_SEARCH = ('manuscripts', 'photos', 'books', 'maps', 'audio')
+
+
+def normalize_terms(text: str) -> str:
+    """Case-, whitespace- and niqqud-insensitive form of user search terms, used in queries and cache keys
+
+    Catalog titles are unvocalized, so a vocalized query would otherwise find nothing.
+    """
+    return ' '.join(strip_marks(text).lower().split())
+
+
+def title_query(terms: str, condition: str = "") -> str:
+    """NLI query string for a title search, optionally ANDed with another condition"""
+    query = f'title,contains,{quote(normalize_terms(terms))}'
+    return f'{query},AND;{condition}' if condition else query
+
+
+def material_query(terms: str, material_type: str) -> str:
+    """Title search restricted to one NLI material type"""
+    return title_query(terms, f'material_type,exact,{material_type}')
+
+
+def collection_query(terms: str, collection: str) -> str:
+    """Query string for one of the bot's archive collections ('books' means Hebrew-language titles)"""
+    if collection in MATERIAL_TYPES:
+        return material_query(terms, MATERIAL_TYPES[collection])
+    return title_query(terms, 'language,exact,heb')
+
+
+def record_key(record: NLIRecord) -> str:
+    """Stable identity for de-duplicating records returned by several queries"""
+    if record.recordid:
+        return record.recordid
+    return normalize(record.title or '')
+
 class NLIClient:
     """Client for National Library of Israel API interactions"""
     
@@ -19,7 +70,12 @@ class NLIClient:
         # Load API key from environment or use provided key
         self.api_key = api_key or os.getenv('NLI_API_KEY', 'DVQyidFLOAjp12ib92pNJPmflmB5IessOq1CJQDK')
         self.session = None
-        self.last_request_time = 0
+        # One request per second on average, with room for a combined search to start at once
+        self.rate_limiter = TokenBucket(rate=1.0, capacity=len(COMBINED_SEARCH))
+        
+        # Result pages keyed by (query, page, items_per_page); prefetches in flight share one task
+        self.page_cache = LRUCache(maxsize=512, ttl=1800)
+        self._pending_pages: Dict[tuple, asyncio.Task] = {}
         
     async def _ensure_session(self):
         """Ensure aiohttp session exists"""
@@ -27,14 +83,12 @@ class NLIClient:
             self.session = aiohttp.ClientSession()
     
     async def _rate_limit(self):
-        """Implement rate limiting for NLI API"""
-        current_time = asyncio.get_event_loop().time()
-        if current_time - self.last_request_time < 1.0:
-            await asyncio.sleep(1.0 - (current_time - self.last_request_time))
-        self.last_request_time = asyncio.get_event_loop().time()
-    
-    async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
-        """Make a request to the NLI API"""
+        """Implement rate limiting for NLI API (shared by concurrent requests)"""
+        await self.rate_limiter.acquire()
+    
+    async def _make_request(self, endpoint: str, params: Optional[Dict] = None,
+                            decode: Callable[[bytes], Any] = json.loads) -> Optional[Any]:
+        """Make a request to the NLI API, decoding the raw body with `decode`"""
         await self._ensure_session()
         await self._rate_limit()
         
@@ -48,7 +102,7 @@ class NLIClient:
         try:
             async with self.session.get(url, params=params) as response:
                 if response.status == 200:
-                    return await response.json()
+                    return decode(await response.read())
                 else:
                     logger.error(f"NLI API request failed: {response.status}")
                     return None
@@ -56,159 +110,152 @@ class NLIClient:
             logger.error(f"Error making NLI API request: {e}")
             return None
     
-    async def search_hebrew_manuscripts(self, query: str, limit: int = 10) -> Optional[List[Dict]]:
-        """Search for Hebrew manuscripts"""
+    async def _fetch_page(self, query: str, page: int, per_page: int) -> List[NLIRecord]:
         params = {
-            'query': f'title,contains,{quote(query)},AND;material_type,exact,manuscript',
-            'items_per_page': str(limit),
+            'query': query,
+            'items_per_page': str(per_page),
+            'page': str(page),
             'output_format': 'json'
         }
         
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            return result['result'].get('records', [])
-        return []
+        records = await self._make_request('search', params, decode=decode_search)
+        if records is None:
+            return []
+        self.page_cache.set((query, page, per_page), records)
+        return records
     
-    async def search_historical_photos(self, query: str, limit: int = 10) -> Optional[List[Dict]]:
-        """Search for historical photographs"""
-        params = {
-            'query': f'title,contains,{quote(query)},AND;material_type,exact,photograph',
-            'items_per_page': str(limit),
-            'output_format': 'json'
-        }
+    def _page_task(self, query: str, page: int, per_page: int) -> asyncio.Task:
+        """One task per page, shared by callers and prefetches until it finishes"""
+        key = (query, page, per_page)
+        task = self._pending_pages.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_page(query, page, per_page))
+            self._pending_pages[key] = task
+            task.add_done_callback(lambda _: self._pending_pages.pop(key, None))
+        return task
+    
+    def prefetch_page(self, query: str, page: int, per_page: int = 10):
+        """Start loading a page in the background unless it is cached or already loading"""
+        if self.page_cache.get((query, page, per_page)) is None:
+            self._page_task(query, page, per_page)
+    
+    async def search_page(self, query: str, page: int = 1, per_page: int = 10, prefetch: bool = True) -> List[NLIRecord]:
+        """One page of results for an NLI query string, served from cache when possible
         
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            return result['result'].get('records', [])
-        return []
+        When the page is full, the following page is prefetched so a Next click is instant.
+        """
+        records = self.page_cache.get((query, page, per_page))
+        if records is None:
+            records = await asyncio.shield(self._page_task(query, page, per_page))
+        if prefetch and len(records) >= per_page:
+            self.prefetch_page(query, page + 1, per_page)
+        return records
     
-    async def search_jewish_books(self, query: str, language: str = 'heb', limit: int = 10) -> Optional[List[Dict]]:
-        """Search for Jewish books in Hebrew or other languages"""
-        params = {
-            'query': f'title,contains,{quote(query)},AND;language,exact,{language}',
-            'items_per_page': str(limit),
-            'output_format': 'json'
-        }
+    async def iter_search(self, query: str, per_page: int = 10, max_pages: Optional[int] = None) -> AsyncIterator[List[NLIRecord]]:
+        """Yield result pages one by one, loading page n+1 while the caller handles page n"""
+        page = 1
+        while max_pages is None or page <= max_pages:
+            records = await self.search_page(query, page, per_page, prefetch=max_pages is None or page < max_pages)
+            if records:
+                yield records
+            if len(records) < per_page:
+                return
+            page += 1
+    
+    async def search_all_materials(self, query: str, per_type: int = 3,
+                                   deadline: float = 10.0) -> AsyncIterator[Tuple[str, List[NLIRecord]]]:
+        """Search every archive collection at once, yielding (collection, records) as each one finishes
         
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            return result['result'].get('records', [])
-        return []
+        Records already yielded for an earlier collection are dropped. Collections still
+        running when the deadline passes are abandoned; their pages keep loading into the cache.
+        """
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline
+        tasks = {
+            asyncio.create_task(self.search_page(collection_query(query, collection), per_page=per_type, prefetch=False)): collection
+            for collection in COMBINED_SEARCH
+        }
+        pending = set(tasks)
+        seen = set()
+        try:
+            while pending:
+                remaining = end - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: COMBINED_SEARCH.index(tasks[t])):
+                    if task.exception():
+                        logger.error(f"NLI {tasks[task]} search failed: {task.exception()}")
+                        records = []
+                    else:
+                        records = task.result() or []
+                    unique = []
+                    for record in records:
+                        key = record_key(record)
+                        if key not in seen:
+                            seen.add(key)
+                            unique.append(record)
+                    yield tasks[task], unique
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def search_hebrew_manuscripts(self, query: str, limit: int = 10) -> List[NLIRecord]:
+        """Search for Hebrew manuscripts"""
+        return await self.search_page(material_query(query, MATERIAL_TYPES['manuscripts']), per_page=limit)
     
-    async def search_maps(self, location: str, limit: int = 10) -> Optional[List[Dict]]:
+    async def search_historical_photos(self, query: str, limit: int = 10) -> List[NLIRecord]:
+        """Search for historical photographs"""
+        return await self.search_page(material_query(query, MATERIAL_TYPES['photos']), per_page=limit)
+    
+    async def search_jewish_books(self, query: str, language: str = 'heb', limit: int = 10) -> List[NLIRecord]:
+        """Search for Jewish books in Hebrew or other languages"""
+        return await self.search_page(title_query(query, f'language,exact,{language}'), per_page=limit)
+    
+    async def search_maps(self, location: str, limit: int = 10) -> List[NLIRecord]:
         """Search for historical maps"""
-        params = {
-            'query': f'title,contains,{quote(location)},AND;material_type,exact,map',
-            'items_per_page': str(limit),
-            'output_format': 'json'
-        }
-        
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            return result['result'].get('records', [])
-        return []
+        return await self.search_page(material_query(location, MATERIAL_TYPES['maps']), per_page=limit)
     
-    async def search_audio_recordings(self, query: str, limit: int = 10) -> Optional[List[Dict]]:
+    async def search_audio_recordings(self, query: str, limit: int = 10) -> List[NLIRecord]:
         """Search for audio recordings"""
-        params = {
-            'query': f'title,contains,{quote(query)},AND;material_type,exact,audio',
-            'items_per_page': str(limit),
-            'output_format': 'json'
-        }
-        
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            return result['result'].get('records', [])
-        return []
+        return await self.search_page(material_query(query, MATERIAL_TYPES['audio']), per_page=limit)
     
-    async def search_by_creator(self, creator: str, limit: int = 10) -> Optional[List[Dict]]:
+    async def search_by_creator(self, creator: str, limit: int = 10) -> List[NLIRecord]:
         """Search for works by a specific creator/author"""
-        params = {
-            'query': f'creator,contains,{quote(creator)}',
-            'items_per_page': str(limit),
-            'output_format': 'json'
-        }
-        
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            return result['result'].get('records', [])
-        return []
+        return await self.search_page(f'creator,contains,{quote(normalize_terms(creator))}', per_page=limit)
     
-    async def search_by_subject(self, subject: str, limit: int = 10) -> Optional[List[Dict]]:
+    async def search_by_subject(self, subject: str, limit: int = 10) -> List[NLIRecord]:
         """Search for works by subject"""
-        params = {
-            'query': f'subject,contains,{quote(subject)}',
-            'items_per_page': str(limit),
-            'output_format': 'json'
-        }
-        
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            return result['result'].get('records', [])
-        return []
+        return await self.search_page(f'subject,contains,{quote(normalize_terms(subject))}', per_page=limit)
     
-    async def search_by_date_range(self, start_year: int, end_year: int, query: str = "", limit: int = 10) -> Optional[List[Dict]]:
+    async def search_by_date_range(self, start_year: int, end_year: int, query: str = "", limit: int = 10) -> List[NLIRecord]:
         """Search for works within a date range"""
-        if query:
-            search_query = f'title,contains,{quote(query)},AND;start_date,range,{start_year},{end_year}'
-        else:
-            search_query = f'start_date,range,{start_year},{end_year}'
-            
-        params = {
-            'query': search_query,
-            'items_per_page': str(limit),
-            'output_format': 'json'
-        }
-        
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            return result['result'].get('records', [])
-        return []
+        date_range = f'start_date,range,{start_year},{end_year}'
+        search_query = title_query(query, date_range) if query else date_range
+        return await self.search_page(search_query, per_page=limit)
     
-    async def search_jerusalem_collection(self, query: str = "", limit: int = 10) -> Optional[List[Dict]]:
+    async def search_jerusalem_collection(self, query: str = "", limit: int = 10) -> List[NLIRecord]:
         """Search specifically for Jerusalem-related items"""
-        if query:
-            search_query = f'title,contains,{quote(query)},AND;subject,contains,Jerusalem'
-        else:
-            search_query = 'subject,contains,Jerusalem'
-            
-        params = {
-            'query': search_query,
-            'items_per_page': str(limit),
-            'output_format': 'json'
-        }
-        
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            return result['result'].get('records', [])
-        return []
+        jerusalem = 'subject,contains,Jerusalem'
+        search_query = title_query(query, jerusalem) if query else jerusalem
+        return await self.search_page(search_query, per_page=limit)
     
-    async def get_random_item(self, material_type: str = "") -> Optional[Dict]:
+    async def get_random_item(self, material_type: str = "") -> Optional[NLIRecord]:
         """Get a random item from the collection"""
-        # Use a broad search and pick randomly
-        import random
-        
+        # A random page of a broad search; pages are cached, so repeat calls rarely hit the API
         if material_type:
-            params = {
-                'query': f'material_type,exact,{material_type}',
-                'items_per_page': '50',
-                'output_format': 'json'
-            }
+            search_query = f'material_type,exact,{material_type}'
         else:
-            params = {
-                'query': 'language,exact,heb',  # Broad search
-                'items_per_page': '50',
-                'output_format': 'json'
-            }
+            search_query = 'language,exact,heb'
         
-        result = await self._make_request('search', params)
-        if result and 'result' in result:
-            records = result['result'].get('records', [])
-            if records:
-                return random.choice(records)
+        records = await self.search_page(search_query, page=random.randint(1, 5), prefetch=False)
+        if records:
+            return random.choice(records)
         return None
     
     async def close(self):
         """Close the aiohttp session"""
+        for task in list(self._pending_pages.values()):
+            task.cancel()
         if self.session:
             await self.session.close()
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Compact record types for National Library of Israel search results
+
+The API returns Dublin Core records with dozens of fields, each wrapped as
+[{"@value": ...}]. Only the handful of fields the embeds use are kept, on
+slotted objects, so cached pages stay small.
+"""
+import json
+import sys
+from typing import Any, Dict, List, Optional, Union
+
+_DUBLIN_CORE = 'http://purl.org/dc/elements/1.1/'
+# Long descriptions are cut here; embeds show at most a few hundred characters
+MAX_DESCRIPTION = 300
+
+
+def _first_value(raw: Dict, field: str) -> Optional[str]:
+    """First value of a field, under its plain or Dublin Core name, unwrapping JSON-LD lists"""
+    value = raw.get(field)
+    if value is None:
+        value = raw.get(_DUBLIN_CORE + field)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get('@value') or value.get('@id')
+    if value is None:
+        return None
+    return str(value)
+
+
+class NLIRecord:
+    """One NLI search result with only the fields the bot displays
+
+    Supports `record.get(field, default)` so code written against raw record dicts keeps working.
+    """
+    __slots__ = ('recordid', 'title', 'description', 'creator', 'date', 'type', 'thumbnail')
+
+    def __init__(self, recordid: Optional[str] = None, title: Optional[str] = None,
+                 description: Optional[str] = None, creator: Optional[str] = None,
+                 date: Optional[str] = None, type: Optional[str] = None, thumbnail: Optional[str] = None):
+        self.recordid = recordid
+        self.title = title
+        self.description = description
+        self.creator = creator
+        self.date = date
+        self.type = type
+        self.thumbnail = thumbnail
+
+    @classmethod
+    def from_payload(cls, raw: Dict) -> 'NLIRecord':
+        description = _first_value(raw, 'description')
+        if description and len(description) > MAX_DESCRIPTION:
+            description = description[:MAX_DESCRIPTION]
+        material_type = _first_value(raw, 'type')
+        return cls(
+            recordid=_first_value(raw, 'recordid') or _first_value(raw, 'id'),
+            title=_first_value(raw, 'title'),
+            description=description,
+            creator=_first_value(raw, 'creator'),
+            date=_first_value(raw, 'date'),
+            # Few distinct values, shared across every record
+            type=sys.intern(material_type) if material_type else None,
+            thumbnail=_first_value(raw, 'thumbnail')
+        )
+
+    def get(self, field: str, default: Any = None) -> Any:
+        value = getattr(self, field, None) if field in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, field: str) -> Any:
+        value = self.get(field)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def to_dict(self) -> Dict[str, str]:
+        return {field: getattr(self, field) for field in self.__slots__ if getattr(self, field) is not None}
+
+    def __repr__(self) -> str:
+        return f"NLIRecord({self.recordid!r}, {self.title!r})"
+
+
+def decode_search(body: Union[bytes, str]) -> Optional[List[NLIRecord]]:
+    """Decode a search response body straight into records, or None if it is not a search payload"""
+    payload = json.loads(body)
+    if isinstance(payload, dict):
+        result = payload.get('result')
+        if not isinstance(result, dict):
+            return None
+        raw_records = result.get('records') or []
+    elif isinstance(payload, list):
+        raw_records = payload
+    else:
+        return None
+    return [NLIRecord.from_payload(raw) for raw in raw_records if isinstance(raw, dict)]
+
+
+if __name__ == "__main__":
+    # Benchmark: memory held by a cached page of raw dicts vs. NLIRecord objects
+    import time
+    import tracemalloc
+
+    def sample_record(i: int) -> Dict:
+        record = {
+            _DUBLIN_CORE + field: [{'@value': f"{field} value {i} " * 3}]
+            for field in ('contributor', 'coverage', 'format', 'identifier', 'language', 'publisher',
+                          'relation', 'rights', 'source', 'subject', 'accessRights', 'extent',
+                          'isPartOf', 'medium', 'provenance', 'spatial', 'temporal', 'audience',
+                          'lds01', 'lds02', 'lds03', 'lds04', 'lds05', 'lds06', 'lds07', 'lds08')
+        }
+        record[_DUBLIN_CORE + 'recordid'] = [{'@value': f"99000{i}"}]
+        record[_DUBLIN_CORE + 'title'] = [{'@value': f"Manuscript {i}"}]
+        record[_DUBLIN_CORE + 'description'] = [{'@value': "A long catalog description. " * 40}]
+        record[_DUBLIN_CORE + 'type'] = [{'@value': "manuscript"}]
+        record[_DUBLIN_CORE + 'thumbnail'] = [{'@id': f"https://example.org/thumb/{i}.jpg"}]
+        return record
+
+    body = json.dumps({'result': {'records': [sample_record(i) for i in range(2000)]}}).encode('utf-8')
+
+    def measure(build):
+        tracemalloc.start()
+        start = time.perf_counter()
+        value = build()
+        elapsed = time.perf_counter() - start
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return value, size, elapsed
+
+    _, raw_size, raw_time = measure(lambda: json.loads(body)['result']['records'])
+    _, compact_size, compact_time = measure(lambda: decode_search(body))
+    print(f"raw dicts:   {raw_size / 1024:8.0f} KiB  {raw_time * 1000:6.1f} ms")
+    print(f"NLIRecord:   {compact_size / 1024:8.0f} KiB  {compact_time * 1000:6.1f} ms")
+    print(f"reduction:   {raw_size / compact_size:8.1f}x")
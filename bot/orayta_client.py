@@ -7,6 +7,8 @@ import logging
 from typing import Optional, Dict, List, Union
 import time
 
+from .hebrew_text import strip_marks
+
 logger = logging.getLogger(__name__)
 
 class OraytaClient:
@@ -52,7 +54,7 @@ class OraytaClient:
     async def search_cross_platform_texts(self, query: str, source: str = "") -> List[Dict]:
         """Search texts across multiple Jewish libraries"""
         try:
-            params = {'query': query}
+            params = {'query': strip_marks(query)}
             if source:
                 params['source'] = source
             
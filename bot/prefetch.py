@@ -0,0 +1,96 @@
+"""
+Background prefetching of the texts a reader is likely to ask for next, on spare request budget only
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from .cache import LRUCache
+from .rate_limiter import TokenBucket
+from .sefaria_refs import Ref
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for a quiet moment on the shared limiter
+IDLE_CHECK = 0.5
+
+
+class Prefetcher:
+    """Fetches refs into the text cache while interactive traffic leaves the rate limiter idle
+
+    A prefetch waits until the shared limiter's burst is fully refilled (nobody has made a
+    request for a while) and also spends from its own, smaller per-minute budget. Newest
+    requests come first and the queue is short, so a reader who moves on drops stale work.
+    """
+
+    def __init__(self, load: Callable[[Ref], Awaitable[Optional[Dict]]], is_cached: Callable[[str], bool],
+                 limiter: TokenBucket, per_minute: float = 12, queue_size: int = 8):
+        self.load = load
+        self.is_cached = is_cached
+        self.limiter = limiter
+        self.budget = TokenBucket(rate=per_minute / 60)
+        self.queue: deque = deque(maxlen=queue_size)
+        # Refs known in advance (upcoming days of the learning cycles), fetched once the queue is empty
+        self.backlog: deque = deque()
+        # Keys fetched ahead of time and not yet asked for
+        self.pending = LRUCache(maxsize=512)
+        self.issued = 0
+        self.hits = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of prefetched texts that were asked for while still cached"""
+        return self.hits / self.issued if self.issued else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {'issued': self.issued, 'hits': self.hits, 'hit_rate': round(self.hit_rate, 3)}
+
+    def note_request(self, key: str, cached: bool):
+        """Record an interactive request, counting a hit if it was prefetched and is still cached"""
+        if self.pending.pop(key) and cached:
+            self.hits += 1
+
+    def schedule(self, refs: Iterable[Optional[Ref]]):
+        for ref in refs:
+            if ref is None or self.is_cached(ref.key) or ref in self.queue:
+                continue
+            self.queue.appendleft(ref)
+        self._start()
+
+    def warm(self, refs: Iterable[Optional[Ref]]):
+        """Fetch refs on the same spare budget, after whatever readers are likely to ask for next"""
+        for ref in refs:
+            if ref is None or self.is_cached(ref.key) or ref in self.backlog:
+                continue
+            self.backlog.append(ref)
+        self._start()
+
+    def _start(self):
+        if (self.queue or self.backlog) and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self.queue or self.backlog:
+            await self.budget.acquire()
+            await self.limiter.wait_idle(IDLE_CHECK)
+            if not self.queue and not self.backlog:
+                return
+            ref = self.queue.popleft() if self.queue else self.backlog.popleft()
+            if self.is_cached(ref.key):
+                continue
+            self.issued += 1
+            try:
+                if await self.load(ref) is not None:
+                    self.pending.set(ref.key, True)
+            except Exception as e:
+                logger.debug(f"Prefetch of {ref.key} failed: {e}")
+            if self.issued % 50 == 0:
+                logger.info(f"Prefetch stats: {self.stats()}")
+
+    def cancel(self):
+        self.queue.clear()
+        self.backlog.clear()
+        if self._task:
+            self._task.cancel()
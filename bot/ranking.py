@@ -0,0 +1,215 @@
+"""
+BM25 ranking and de-duplication of federated search hits
+"""
+import math
+import re
+from typing import Dict, List, Optional, Sequence
+
+from .hebrew_text import normalize, normalize_batch, tokenize
+from .learning_schedule import TANYA_PARTS
+from .sefaria_refs import Ref, RefParser
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+# A title token counts this many times, so a title match outranks a snippet mention
+TITLE_WEIGHT = 2
+
+# Built-in titles only: enough to make "Bereishit 1:1" and "Genesis 1:1" the same hit
+_REFS = RefParser()
+# Plus the Tanya parts under the names other libraries (Chabad.org, Dicta) title them by
+_TANYA_ALIASES = [
+    ["Tanya", "Likkutei Amarim", "Likutei Amarim", "Tanya Likkutei Amarim", "Tanya Likutei Amarim", "ליקוטי אמרים"],
+    ["Shaar HaYichud VehaEmunah", "Shaar Hayichud Vehaemunah", "Sha'ar HaYichud", "Shaar HaYichud", "שער היחוד והאמונה"],
+    ["Igeret HaTeshuvah", "Iggeret HaTeshuvah", "Igeret Hateshuva", "אגרת התשובה"],
+    ["Igeret HaKodesh", "Iggeret HaKodesh", "Igeret Hakodesh", "אגרת הקודש"],
+    ["Kuntres Acharon", "Kuntres Acharon", "קונטרס אחרון"],
+]
+for (_title, _chapters), _aliases in zip(TANYA_PARTS, _TANYA_ALIASES):
+    _REFS.add_title(_title, _aliases, depth=1, sections=_chapters)
+
+# Words that only announce a section number in a hit's title ("Likutei Amarim, Chapter 5")
+_SECTION_WORDS = re.compile(r'\b(?:chapter|chap|ch|perek|daf)\b\.?|פרק|דף', re.I)
+# Punctuation between a title and its number, kept between numbers ("1:1")
+_TITLE_PUNCTUATION = re.compile(r'(?<!\d)[,:;.\-–—]+')
+
+
+def _title_ref(title: str) -> Optional[Ref]:
+    """A known book and section named in a free-text title, e.g. Chabad's "Tanya: Likutei Amarim, Chapter 5" """
+    if not any(char.isdigit() for char in title):
+        return None
+    text = _TITLE_PUNCTUATION.sub(' ', _SECTION_WORDS.sub(' ', title))
+    ref = _REFS.parse(text)
+    if ref is None or ref.title not in _REFS.books or not ref.sections:
+        return None
+    return ref
+
+
+def canonical_key(hit: Dict) -> str:
+    """Identity used to collapse the same text found through several sources
+
+    Hits with a ref use its canonical form; hits from sources without refs (Chabad, Dicta)
+    get the same key when their title names a known book and section.
+    """
+    ref = hit.get('ref')
+    if ref:
+        parsed = _REFS.parse(ref)
+        return 'ref:' + normalize(parsed.key if parsed else ref)
+    parsed = _title_ref(hit.get('title', ''))
+    if parsed is not None:
+        return 'ref:' + normalize(parsed.key)
+    return 'title:' + normalize(hit.get('title', ''))
+
+
+def padded(text: str) -> str:
+    """Normalized text with every word between two spaces of its own, the form bm25_scores counts words in"""
+    return f" {text.replace(' ', '  ')} " if text else ''
+
+
+def bm25_scores(query: str, documents: Sequence[str], titles: Optional[Sequence[str]] = None,
+                lengths: Optional[Sequence[int]] = None) -> List[float]:
+    """BM25 score of each padded() text against the query, with IDF taken over these documents
+
+    With titles, each document's title words count TITLE_WEIGHT times in its term
+    frequencies and length. Lengths so weighted can be passed in when already known.
+    """
+    terms = set(tokenize(query))
+    if not terms or not documents:
+        return [0.0] * len(documents)
+
+    count = len(documents)
+    if lengths is None:
+        lengths = [text.count(' ') // 2 for text in documents]
+        if titles is not None:
+            lengths = [length + TITLE_WEIGHT * (title.count(' ') // 2) for length, title in zip(lengths, titles)]
+    # Term frequencies for the query terms only: a C-level substring count per document,
+    # where the doubled spaces make every whole-word occurrence count
+    frequencies = {term: [text.count(f" {term} ") for text in documents] for term in terms}
+    if titles is not None:
+        for term, tfs in frequencies.items():
+            frequencies[term] = [tf + TITLE_WEIGHT * title.count(f" {term} ") for tf, title in zip(tfs, titles)]
+    average_length = sum(lengths) / count or 1.0
+    idf = {}
+    for term, tfs in frequencies.items():
+        df = count - tfs.count(0)
+        idf[term] = math.log(1 + (count - df + 0.5) / (df + 0.5))
+
+    scores = [0.0] * count
+    for term, tfs in frequencies.items():
+        weight = idf[term] * (K1 + 1)
+        for index, tf in enumerate(tfs):
+            if tf:
+                scores[index] += weight * tf / (tf + K1 * (1 - B + B * lengths[index] / average_length))
+    return scores
+
+
+class SearchRanker:
+    """Accumulates hits as sources answer and ranks everything seen so far
+    
+    Each batch of hits is normalized once, in one pass, when it is added, so re-ranking
+    after every source costs only the scoring pass. Identity keys (a ref parse
+    each) are worked out only for hits that reach the top and kept for later rankings.
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self.hits: List[Dict] = []
+        self.titles: List[str] = []
+        self.snippets: List[str] = []
+        self.lengths: List[int] = []
+        self.keys: Dict[int, str] = {}
+
+    def add(self, hits: Sequence[Dict]):
+        hits = list(hits)
+        texts = normalize_batch([hit.get('title', '') for hit in hits] + [hit.get('snippet', '') for hit in hits])
+        self.hits.extend(hits)
+        self.titles.extend(map(padded, texts[:len(hits)]))
+        self.snippets.extend(map(padded, texts[len(hits):]))
+        self.lengths.extend(
+            TITLE_WEIGHT * (title.count(' ') + 1 if title else 0) + (snippet.count(' ') + 1 if snippet else 0)
+            for title, snippet in zip(texts[:len(hits)], texts[len(hits):])
+        )
+
+    def _key(self, index: int) -> str:
+        key = self.keys.get(index)
+        if key is None:
+            key = self.keys[index] = canonical_key(self.hits[index])
+        return key
+
+    def top(self, top_k: int = 10) -> List[Dict]:
+        """Merged top-k: duplicates collapsed into their best-scoring copy
+        
+        Each returned hit is a copy with 'score' and 'sources' (every source whose copy
+        scored above the cut). Hits are taken best first until top_k distinct texts are in,
+        plus the rest of the last score tied with the cut.
+        """
+        scores = bm25_scores(self.query, self.snippets, self.titles, self.lengths)
+        order = sorted((index for index, score in enumerate(scores) if score > 0), key=scores.__getitem__, reverse=True)
+        best: Dict[str, Dict] = {}
+        cut = None
+        for index in order:
+            score = scores[index]
+            if cut is not None and score < cut:
+                break
+            hit = self.hits[index]
+            key = self._key(index)
+            current = best.get(key)
+            if current is None:
+                best[key] = dict(hit, score=score, sources=[hit.get('source')])
+                if len(best) == top_k:
+                    cut = score
+            elif hit.get('source') not in current['sources']:
+                current['sources'].append(hit.get('source'))
+
+        merged = list(best.values())
+        # Found in several libraries breaks ties
+        merged.sort(key=lambda hit: (-hit['score'], -len(hit['sources'])))
+        return merged[:top_k]
+
+
+def rank_hits(query: str, hits: Sequence[Dict], top_k: int = 10) -> List[Dict]:
+    """BM25 over title and snippet with duplicates collapsed; see SearchRanker.top"""
+    ranker = SearchRanker(query)
+    ranker.add(hits)
+    return ranker.top(top_k)
+
+
+if __name__ == "__main__":
+    # Benchmark: ranking a few hundred candidates
+    import random
+    import time
+
+    # The same Tanya chapter from Sefaria and from Chabad.org collapses into one hit
+    same_chapter = [
+        {'source': 'sefaria', 'title': "Tanya, Part I; Likkutei Amarim 5", 'snippet': "tanya chapter five",
+         'ref': "Tanya, Part I; Likkutei Amarim 5"},
+        {'source': 'chabad', 'title': "Tanya: Likutei Amarim, Chapter 5", 'snippet': "tanya chapter five"},
+        {'source': 'chabad', 'title': "Likutei Amarim, Chapter 6", 'snippet': "tanya chapter six"},
+        {'source': 'sefaria', 'title': "Genesis 1:1", 'snippet': "in the beginning", 'ref': "Bereishit 1:1"},
+        {'source': 'orayta', 'title': "Genesis, Chapter 1:1", 'snippet': "in the beginning"},
+    ]
+    merged = rank_hits("tanya chapter beginning", same_chapter, top_k=10)
+    assert sorted(sorted(hit['sources']) for hit in merged) == [['chabad'], ['chabad', 'sefaria'], ['orayta', 'sefaria']], merged
+    print("duplicates:", [(hit['title'], hit['sources']) for hit in merged])
+
+    words = ("tanya chapter likkutei amarim shabbat prayer torah talmud berakhot rambam hilchot "
+             "teshuvah mishnah avot תניא שבת תפילה תורה").split()
+    random.seed(7)
+    candidates = [
+        {
+            'source': random.choice(('sefaria', 'dicta', 'nli', 'orayta', 'chabad')),
+            'title': ' '.join(random.choices(words, k=4)),
+            'snippet': ' '.join(random.choices(words, k=30)),
+            'ref': f"Tanya {random.randint(1, 53)}" if random.random() < 0.3 else ''
+        }
+        for _ in range(500)
+    ]
+    runs = 50
+    for size in (100, 300, 500):
+        # Best of the runs: on a shared machine the mean mostly measures the neighbours
+        elapsed = float('inf')
+        for _ in range(runs):
+            start = time.perf_counter()
+            top = rank_hits("tanya chapter shabbat", candidates[:size], top_k=10)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        print(f"{size} candidates -> {len(top)} hits in {elapsed * 1000:.2f} ms")
@@ -0,0 +1,47 @@
+"""
+Token-bucket rate limiting shared by concurrent API requests
+"""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Allows short bursts of up to `capacity` requests while holding the long-run rate to `rate` per second
+
+    Unlike a last-request timestamp, the bucket stays correct when many coroutines
+    ask for a slot at once: waiters are served one at a time, in order.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self) -> float:
+        """Tokens that could be taken right now"""
+        self._refill()
+        return self._tokens
+
+    async def wait_idle(self, poll: float = 0.5):
+        """Wait until the bucket is full, i.e. nothing has been taken from it for a while
+
+        Background work calls this before each request so it only uses capacity nobody else wants.
+        """
+        while self.available() < self.capacity:
+            await asyncio.sleep(poll)
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` are available and take them"""
+        async with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
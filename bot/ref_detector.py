@@ -0,0 +1,151 @@
+"""
+Finds Sefaria references quoted inside ordinary chat messages with an Aho-Corasick automaton over every title and alias
+"""
+import re
+from typing import Dict, List, Tuple
+
+from .hebrew_text import fold
+from .sefaria_refs import Ref, RefParser
+
+# No reference without a number or a chapter:verse colon; most messages are rejected by this alone
+_HINT = re.compile(r'[\d:]')
+# What may follow a title: daf or chapter, then further sections and an optional range,
+# in digits or (with a colon, so plain Hebrew words do not qualify) in Hebrew numerals
+_NUMBER = r'(?:\d+[ab]?|[א-ת]{1,3}[\'"׳״]?[א-ת]?)'
+_SECTIONS = re.compile(
+    r'[ \t,.]{0,3}(\d+[ab]?(?:\s?[:.]\s?\d+){0,2}(?:\s?[-–]\s?\d+[ab]?(?:[:.]\d+)?)?'
+    rf'|{_NUMBER}(?:\s?:\s?{_NUMBER}){{1,2}})(?![\w:])'
+)
+
+
+class RefDetector:
+    """Aho-Corasick automaton over the parser's normalized names
+
+    A message is folded to the same normalized form (same length, so offsets still match)
+    and walked once, character by character; every name ending at a position is reported
+    through the output lists, whatever the number of titles.
+    """
+
+    def __init__(self, parser: RefParser):
+        self.parser = parser
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, str]]] = [[]]  # (name length, title) of names ending here
+        for name, title in parser.aliases.items():
+            self._add(name, title)
+        self._link()
+
+    def _add(self, name: str, title: str):
+        state = 0
+        for char in name:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto[state][char] = following
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = following
+        self.output[state].append((len(name), title))
+
+    def _link(self):
+        # Breadth first, so each state's failure target is finished before its children need it
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, following in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[following] = target if target != following else 0
+                # Names ending at the failure target also end here
+                self.output[following] = self.output[following] + self.output[self.fail[following]]
+                queue.append(following)
+
+    def _names(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, title) of every name in the text at word boundaries, offsets into the original"""
+        folded = fold(text)
+        goto, fail, output = self.goto, self.fail, self.output
+        matches = []
+        state = 0
+        # Folded characters actually fed to the automaton, with their original offsets
+        fed: List[int] = []
+        previous = ' '
+        for position, char in enumerate(folded):
+            if char == '\0' or (char == ' ' and previous == ' '):
+                continue
+            previous = char
+            fed.append(position)
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                end = position + 1
+                if end < len(folded) and folded[end].isalpha():
+                    continue
+                for length, title in output[state]:
+                    if len(fed) == length:
+                        start = fed[0]
+                    elif len(fed) > length and folded[fed[-length - 1]] == ' ':
+                        start = fed[-length]
+                    else:
+                        continue
+                    matches.append((start, end, title))
+        return matches
+
+    def find(self, text: str, limit: int = 3) -> List[Ref]:
+        """Valid references in a message, leftmost first, longest title winning where names overlap"""
+        if not _HINT.search(text):
+            return []
+        refs: List[Ref] = []
+        taken = 0
+        for start, end, title in sorted(self._names(text), key=lambda match: (match[0], -match[1])):
+            if start < taken:
+                continue
+            # A lowercase English word ("my job 5 years ago") is not taken for a title
+            if text[start].isascii() and text[start].islower():
+                continue
+            sections = _SECTIONS.match(text, end)
+            if sections is None:
+                continue
+            ref = self.parser.parse(f"{title} {sections.group(1)}")
+            if ref is None or not ref.sections or ref in refs:
+                continue
+            refs.append(ref)
+            taken = sections.end()
+            if len(refs) >= limit:
+                break
+        return refs
+
+
+if __name__ == "__main__":
+    # Throughput benchmark over a mix of chat messages, some quoting references
+    import random
+    import time
+
+    parser = RefParser()
+    for count in range(6000):
+        parser.add_title(f"Commentary {count} on Book {count % 97}", [f"פירוש מספר {count}"])
+    start = time.perf_counter()
+    detector = RefDetector(parser)
+    print(f"automaton: {len(detector.goto)} states for {len(parser.aliases)} names in {time.perf_counter() - start:.2f} s")
+
+    samples = [
+        "see Berakhot 2a, it's discussed there",
+        "בראשית א:א is the first verse",
+        "Good morning everyone! Anyone up for learning tonight?",
+        "I lost my job 5 years ago but Job 5:7 helped",
+        "Compare Genesis 1:1-3 with Rashi on it, and Shabbat 31a",
+        "meeting at 7:30 to talk about the parsha",
+        "lol that's wild 😂 how was your weekend",
+        "Psalms 23 is beautiful; Tehillim 121 too",
+    ]
+    for sample in samples:
+        print(f"{sample[:48]!r:50} -> {[ref.key for ref in detector.find(sample)]}")
+
+    random.seed(5)
+    messages = [random.choice(samples) for _ in range(20000)]
+    start = time.perf_counter()
+    found = sum(len(detector.find(message)) for message in messages)
+    elapsed = time.perf_counter() - start
+    print(f"{len(messages) / elapsed:,.0f} messages/s ({found} refs found)")
@@ -3,21 +3,70 @@ Client for interacting with the Sefaria API
 """
 import aiohttp
 import asyncio
+import json
 import logging
+import os
 import random
-from typing import Optional, Dict, List, Any
+import time
+from datetime import date
+from typing import Optional, Dict, List, Any, AsyncIterator, Tuple
 from urllib.parse import quote
 
+from .cache import LRUCache
+from .hebrew_text import strip_marks
+from .prefetch import Prefetcher
+from .sefaria_corpus import SefariaCorpus
+from .ref_detector import RefDetector
+from .rate_limiter import TokenBucket
+from .sefaria_refs import Ref, RefParser
+from .storage import cache_path
+from .text_index import TextIndex
+
 logger = logging.getLogger(__name__)
 
+# Sefaria's title index is refetched once the saved copy is older than this
+INDEX_MAX_AGE = 7 * 24 * 3600
+# Requests that may go out back to back before the one-per-second pace applies
+BURST_REQUESTS = 4
+# Refs per bulktext call, kept well inside URL length limits
+BULK_MAX_REFS = 30
+BULK_MAX_CHARS = 1500
+
 class SefariaClient:
     """Client for Sefaria API interactions"""
     
     def __init__(self):
         self.base_url = "https://www.sefaria.org/api"
         self.session = None
-        self._rate_limit_delay = 1.0  # Seconds between requests
-        self._last_request_time = 0
+        self._rate_limit_delay = 1.0  # Seconds between requests, on average
+        # Short bursts let the requests of one get_texts call go out together
+        self.rate_limiter = TokenBucket(rate=1.0 / self._rate_limit_delay, capacity=BURST_REQUESTS)
+        # Optional offline corpus (see python -m bot.sefaria_corpus); refs it lacks still go to the API
+        self.corpus = SefariaCorpus.open(os.getenv('SEFARIA_CORPUS_DIR'))
+        # Local full-text search over the corpus categories below plus every text fetched since startup;
+        # only consulted once the categories are fully indexed, and only with a corpus (without one it
+        # would hold just what users happened to open, and searches go to the API instead)
+        self.text_index = TextIndex()
+        self.text_index_ready = False
+        self.index_categories = [
+            category.strip() for category in os.getenv('SEFARIA_INDEX_CATEGORIES', 'Tanakh').split(',')
+            if category.strip()
+        ]
+        self._index_task: Optional[asyncio.Task] = None
+        # References are parsed and bounds-checked locally; responses are cached under the canonical ref
+        self.refs = RefParser()
+        self.text_cache = LRUCache(maxsize=256, ttl=3600)
+        self._shapes_path = cache_path('sefaria', 'shapes.json')
+        self._shapes: Dict[str, List] = self._read_json(self._shapes_path) or {}
+        for title, shape in self._shapes.items():
+            self.refs.add_shape(title, shape)
+        self._shape_tasks: Dict[str, asyncio.Task] = {}
+        self._ref_index_task: Optional[asyncio.Task] = None
+        # Spots refs quoted in chat; rebuilt over every title once the index is loaded
+        self.ref_detector = RefDetector(self.refs)
+        # Readers tend to ask for the next verse or chapter; it is fetched ahead on spare budget
+        self.prefetcher = Prefetcher(self._load_text, self._is_local, self.rate_limiter)
+        self._schedule_task: Optional[asyncio.Task] = None
         
     async def _ensure_session(self):
         """Ensure aiohttp session exists"""
@@ -31,13 +80,7 @@ class SefariaClient:
     
     async def _rate_limit(self):
         """Implement basic rate limiting"""
-        current_time = asyncio.get_event_loop().time()
-        time_since_last = current_time - self._last_request_time
-        
-        if time_since_last < self._rate_limit_delay:
-            await asyncio.sleep(self._rate_limit_delay - time_since_last)
-        
-        self._last_request_time = asyncio.get_event_loop().time()
+        await self.rate_limiter.acquire()
     
     async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
         """Make a request to the Sefaria API"""
@@ -66,6 +109,10 @@ class SefariaClient:
     
     async def get_random_text(self, category: Optional[str] = None) -> Optional[Dict]:
         """Get a random text from Sefaria"""
+        if self.corpus:
+            random_ref = self.corpus.random_ref(category)
+            if random_ref:
+                return await self.get_text(random_ref)
         try:
             # First, get a list of texts
             if category:
@@ -105,26 +152,33 @@ class SefariaClient:
             logger.error(f"Error getting random text: {e}")
             return None
     
-    async def get_text(self, reference: str) -> Optional[Dict]:
-        """Get a specific text by reference"""
+    async def get_text(self, reference: str, full: bool = False) -> Optional[Dict]:
+        """Get a specific text by reference; `full` keeps every segment instead of trimming for a single embed"""
         try:
-            # Clean and encode the reference
-            reference = reference.strip()
-            encoded_ref = quote(reference, safe='')
-            
-            # Get the text
-            text_data = await self._make_request(f"texts/{encoded_ref}")
-            
-            if not text_data:
+            # Parse the reference locally: refs that cannot exist never reach the network, and
+            # every spelling of a ref ("Bereishit 1:1", "genesis 1 : 1") shares one cache entry
+            ref = self.refs.parse(reference)
+            if ref is None:
+                logger.info(f"Rejected invalid reference: {reference!r}")
                 return None
+            reference = ref.key
+            self.prefetcher.note_request(reference, reference in self.text_cache)
             
-            # Ensure we have the required fields
-            if 'text' not in text_data and 'he' not in text_data:
-                logger.warning(f"No text content found for reference: {reference}")
+            text_data = await self._load_text(ref)
+            if text_data is None:
                 return None
+            # Read ahead the next segment only where the shape says where a section ends; without
+            # it "Genesis 1:31" would lead to a nonexistent 1:32, so the next section is fetched instead
+            ahead = ref
+            if ref.is_segment and not self.refs.has_shape(ref.title):
+                ahead = self.refs.section(ref)
+            self.prefetcher.schedule([self.refs.following(ahead) if ahead else None])
+            text_data = dict(text_data)
+            if full and not ref.is_segment:
+                return text_data
             
             # For single verse requests (e.g. "Genesis 1:1"), show only that verse
-            if ':' in reference and not '-' in reference:
+            if ref.is_segment:
                 # This is a single verse request, show only one verse
                 if 'text' in text_data and isinstance(text_data['text'], list):
                     if len(text_data['text']) > 1:
@@ -153,11 +207,247 @@ class SefariaClient:
             logger.error(f"Error getting text for reference '{reference}': {e}")
             return None
     
+    def _is_local(self, reference: str) -> bool:
+        """Whether a ref can be answered without a request"""
+        return reference in self.text_cache or bool(self.corpus and self.corpus.resolve(reference))
+    
+    async def _load_text(self, ref: Ref) -> Optional[Dict]:
+        """The full (untrimmed) text for a parsed ref: from the cache, the offline corpus or the API"""
+        reference = ref.key
+        text_data = self.text_cache.get(reference)
+        if text_data is not None:
+            return text_data
+        
+        # Get the text, locally when the offline corpus has it
+        text_data = self.corpus.get_text(reference) if self.corpus else None
+        if text_data is None:
+            text_data = await self._make_request(f"texts/{quote(reference, safe='')}")
+            if text_data and ref.title in self.refs.books:
+                self._learn_shape(ref.title)
+        
+        if not text_data:
+            return None
+        
+        # Ensure we have the required fields
+        if 'text' not in text_data and 'he' not in text_data:
+            logger.warning(f"No text content found for reference: {reference}")
+            return None
+        
+        # Index every fetched segment (in a worker thread, as the corpus indexing may hold the index)
+        # and cache the whole response; callers trim copies
+        await asyncio.to_thread(self._index_text, text_data)
+        self.text_cache.set(reference, text_data)
+        return text_data
+    
+    async def get_texts(self, references: List[str]) -> List[Optional[Dict]]:
+        """Texts for many references at once, in the given order (None for invalid or missing refs)
+        
+        Refs are parsed and deduplicated, answered from the cache or the offline corpus where
+        possible, single segments are fetched together through the bulktext endpoint, and the
+        rest are requested concurrently within the rate limit. Results are untrimmed copies.
+        """
+        refs = [self.refs.parse(reference) for reference in references]
+        wanted = {ref.key: ref for ref in refs if ref is not None}
+        missing = [ref for key, ref in wanted.items() if self.text_cache.get(key) is None
+                   and not (self.corpus and self.corpus.resolve(key))]
+        
+        # bulktext returns each ref's text joined into one string, so only single segments keep their shape
+        segments = [ref for ref in missing if ref.is_segment]
+        batches, batch, size = [], [], 0
+        for ref in segments:
+            if batch and (len(batch) >= BULK_MAX_REFS or size + len(ref.key) > BULK_MAX_CHARS):
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append(ref)
+            size += len(ref.key) + 1
+        if batch:
+            batches.append(batch)
+        await asyncio.gather(*(self._fetch_bulk(batch) for batch in batches), return_exceptions=True)
+        
+        # Whatever is still missing (sections, ranges, bulk failures) goes through _load_text
+        results = await asyncio.gather(*(self._load_text(ref) for ref in wanted.values()), return_exceptions=True)
+        texts = {key: result for key, result in zip(wanted, results) if isinstance(result, dict)}
+        for key, result in zip(wanted, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error getting text for reference '{key}': {result}")
+        return [dict(texts[ref.key]) if ref is not None and ref.key in texts else None for ref in refs]
+    
+    async def _fetch_bulk(self, refs: List[Ref]):
+        """Fetch single-segment refs in one bulktext call and cache each as a texts-API-shaped response"""
+        joined = '|'.join(ref.key for ref in refs)
+        bulk = await self._make_request(f"bulktext/{quote(joined, safe='|')}")
+        if not isinstance(bulk, dict):
+            return
+        for ref in refs:
+            item = bulk.get(ref.key)
+            if not isinstance(item, dict) or item.get('error'):
+                continue
+            english, hebrew = item.get('en'), item.get('he')
+            if not english and not hebrew:
+                continue
+            text_data = {
+                'ref': ref.key,
+                'heRef': item.get('heRef', ''),
+                'book': ref.title,
+                'sectionRef': ref.key.rsplit(':', 1)[0],
+                'sections': list(ref.sections),
+                'toSections': list(ref.to_sections),
+                'textDepth': ref.depth,
+                'text': [' '.join(english) if isinstance(english, list) else english] if english else [],
+                'he': [' '.join(hebrew) if isinstance(hebrew, list) else hebrew] if hebrew else [],
+            }
+            await asyncio.to_thread(self._index_text, text_data)
+            self.text_cache.set(ref.key, text_data)
+    
+    @staticmethod
+    def _read_json(path: str):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable {path}: {e}")
+            return None
+    
+    @staticmethod
+    def _write_json(path: str, data):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    
+    def warm_schedule(self, schedule, days: int = 2):
+        """Keep the refs of the learning cycles (a LearningSchedule) for today and the coming days in the text cache"""
+        if self._schedule_task is None:
+            self._schedule_task = asyncio.create_task(self._schedule_loop(schedule, days))
+    
+    async def _schedule_loop(self, schedule, days: int):
+        # Cached texts expire after an hour, so the upcoming portions are topped up hourly,
+        # on the prefetcher's spare budget; refs still cached are skipped
+        while True:
+            try:
+                references = schedule.refs_for_range(date.today(), days)
+                self.prefetcher.warm(self.refs.parse(reference) for reference in references)
+            except Exception as e:
+                logger.error(f"Learning schedule warm-up failed: {e}")
+            await asyncio.sleep(self.text_cache.ttl)
+    
+    def warm_ref_index(self):
+        """Load every Sefaria title for reference parsing, from the saved index or the API"""
+        if self._ref_index_task is None:
+            self._ref_index_task = asyncio.create_task(self._load_ref_index())
+    
+    async def _load_ref_index(self):
+        path = cache_path('sefaria', 'index.json')
+        try:
+            index_data = None
+            if os.path.exists(path) and time.time() - os.path.getmtime(path) < INDEX_MAX_AGE:
+                index_data = await asyncio.to_thread(self._read_json, path)
+            if not index_data:
+                index_data = await self._make_request("index")
+                if isinstance(index_data, list) and index_data:
+                    await asyncio.to_thread(self._write_json, path, index_data)
+                elif os.path.exists(path):
+                    # Offline: an outdated title list still beats none
+                    index_data = await asyncio.to_thread(self._read_json, path)
+            if index_data:
+                count = self.refs.add_index(index_data)
+                self.ref_detector = await asyncio.to_thread(RefDetector, self.refs)
+                logger.info(f"Reference parser knows {count} Sefaria titles")
+        except Exception as e:
+            logger.error(f"Error loading Sefaria title index: {e}")
+    
+    def _learn_shape(self, title: str):
+        """Fetch a book's section lengths in the background so later refs to it are bounds-checked
+
+        The request is background work: it spends from the prefetch budget and waits for the
+        rate limiter to go idle, like a prefetch. A title whose shape could not be had is
+        forgotten, so a later ref to the book tries again.
+        """
+        if self.refs.has_shape(title) or title in self._shape_tasks:
+            return
+        self._shape_tasks[title] = asyncio.create_task(self._fetch_shape(title))
+    
+    async def _fetch_shape(self, title: str):
+        try:
+            await self.prefetcher.budget.acquire()
+            await self.rate_limiter.wait_idle()
+            for shape in await self.get_shape(title):
+                if (shape.get('title') or shape.get('book')) == title:
+                    self.refs.add_shape(title, shape['chapters'])
+                    self._shapes[title] = shape['chapters']
+                    await asyncio.to_thread(self._write_json, self._shapes_path, dict(self._shapes))
+        except Exception as e:
+            logger.error(f"Error saving shape of {title}: {e}")
+        finally:
+            if not self.refs.has_shape(title):
+                self._shape_tasks.pop(title, None)
+    
+    def _index_text(self, text_data: Dict):
+        """Add the segments of a single-section text response to the local index"""
+        if self.corpus is None:
+            return
+        title = text_data.get('book') or text_data.get('indexTitle')
+        section_ref = text_data.get('sectionRef')
+        sections = text_data.get('sections') or []
+        to_sections = text_data.get('toSections') or sections
+        depth = text_data.get('textDepth')
+        if not title or not section_ref or not isinstance(depth, int) or depth < 2:
+            return
+        if list(sections[:depth - 1]) != list(to_sections[:depth - 1]):
+            return  # Spans sections; segment numbers restart partway through
+        
+        documents = []
+        for language in ('text', 'he'):
+            segments = text_data.get(language)
+            if not isinstance(segments, list) or not all(isinstance(segment, str) for segment in segments):
+                continue
+            first = 1
+            # A segment range starts at its first segment, unless the API padded it with the whole section
+            if len(sections) == depth and isinstance(sections[-1], int) and isinstance(to_sections[-1], int):
+                if len(segments) == to_sections[-1] - sections[-1] + 1:
+                    first = sections[-1]
+            elif len(sections) != depth - 1:
+                continue
+            documents.extend(
+                (f"{section_ref}:{number}", title, 'en' if language == 'text' else 'he', segment)
+                for number, segment in enumerate(segments, first) if segment
+            )
+        if documents:
+            self.text_index.add_documents(documents)
+    
+    def warm_text_index(self):
+        """Index the offline corpus's SEFARIA_INDEX_CATEGORIES in a worker thread"""
+        if self.corpus and self._index_task is None:
+            self._index_task = asyncio.create_task(asyncio.to_thread(self._index_corpus))
+    
+    def _index_corpus(self):
+        for category in self.index_categories:
+            for title in self.corpus.titles(category):
+                for code, language in (('he', 'he'), ('en', 'en')):
+                    self.text_index.add_documents(
+                        (ref, title, language, text) for ref, text in self.corpus.iter_segments([title], code)
+                    )
+        self.text_index.prepare()
+        self.text_index_ready = True
+        logger.info(f"Text index ready: {len(self.text_index)} segments from {', '.join(self.index_categories)}")
+    
     async def search_texts(self, query: str, limit: int = 10) -> List[Dict]:
         """Search for texts matching the query"""
+        # Indexed segments first (phrases in quotes, highlighted snippets), then the corpus, then the API
+        if self.text_index_ready:
+            results = await asyncio.to_thread(self.text_index.search, query, limit)
+            if results:
+                return results
+        if self.corpus:
+            results = await asyncio.to_thread(self.corpus.search, strip_marks(query), limit)
+            if results:
+                return results
         try:
+            # The search index is unvocalized, so niqqud and cantillation in the query would only cause misses
             params = {
-                'q': query,
+                'q': strip_marks(query),
                 'limit': limit
             }
             
@@ -208,6 +498,8 @@ class SefariaClient:
     
     async def get_categories(self) -> List[str]:
         """Get list of available text categories"""
+        if self.corpus:
+            return self.corpus.categories()
         try:
             index_data = await self._make_request("index")
             
@@ -227,7 +519,52 @@ class SefariaClient:
             logger.error(f"Error getting categories: {e}")
             return []
     
+    async def get_shape(self, title: str) -> List[Dict]:
+        """Get the shape (section lengths) of a book or of every book in a category"""
+        try:
+            shape_data = await self._make_request(f"shape/{quote(title, safe='')}")
+
+            if not shape_data:
+                return []
+
+            if isinstance(shape_data, dict):
+                shape_data = [shape_data]
+
+            return [shape for shape in shape_data if isinstance(shape, dict) and 'chapters' in shape]
+
+        except Exception as e:
+            logger.error(f"Error getting shape for '{title}': {e}")
+            return []
+
+    async def get_chapter_verses(self, reference: str) -> List[str]:
+        """Every Hebrew verse of a chapter, untruncated and without surrounding context"""
+        text_data = await self._make_request(
+            f"texts/{quote(reference, safe='')}", {'context': 0, 'commentary': 0, 'pad': 0}
+        )
+        if not text_data or not isinstance(text_data.get('he'), list):
+            return []
+        return [verse if isinstance(verse, str) else '' for verse in text_data['he']]
+
+    def has_local_category(self, category: str) -> bool:
+        """Whether the offline corpus holds a category, so it can be read without requests"""
+        return bool(self.corpus and self.corpus.titles(category))
+    
+    async def iter_category_verses(self, category: str) -> AsyncIterator[Tuple[str, str]]:
+        """Yield (ref, Hebrew verse) for every verse of every book in a category, from the offline corpus
+        
+        Yields nothing when the corpus lacks the category (see has_local_category); builds that
+        need it from the API crawl it themselves, with checkpoints.
+        """
+        if not self.has_local_category(category):
+            return
+        for verse in self.corpus.iter_segments(self.corpus.titles(category)):
+            yield verse
+
     async def close(self):
         """Close the aiohttp session"""
+        for task in [self._index_task, self._ref_index_task, self._schedule_task, *self._shape_tasks.values()]:
+            if task:
+                task.cancel()
+        self.prefetcher.cancel()
         if self.session and not self.session.closed:
             await self.session.close()
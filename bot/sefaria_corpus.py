@@ -0,0 +1,375 @@
+"""
+Offline Sefaria corpus: per-book text shards with segment offset tables, read through memory maps
+"""
+import json
+import logging
+import mmap
+import os
+import random
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .cache import LRUCache
+from .sefaria_refs import format_ref, section_number
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ('he', 'en')
+_EXPORT_LANGUAGES = {'Hebrew': 'he', 'English': 'en'}
+# Each book's .idx holds one row per segment: its address (one number per level, 1-based)
+# followed by the (start, end) byte span of its Hebrew and English text, all unsigned 64-bit
+_ROW_TYPE = 'Q'
+_SPAN_FIELDS = 2 * len(LANGUAGES)
+
+_SECTION_SPLIT = re.compile(r'[:.\s]+')
+
+
+def _flatten(node, address: Tuple[int, ...], leaves: Dict[Tuple[int, ...], str]):
+    """Nested section lists to {address: segment}, skipping empty segments"""
+    if isinstance(node, list):
+        for position, child in enumerate(node, 1):
+            _flatten(child, address + (position,), leaves)
+    elif isinstance(node, str) and node.strip():
+        leaves[address] = ' '.join(node.split())
+
+
+def _slug(title: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', title).strip('_') or 'book'
+
+
+class CorpusBook:
+    """One book's shard: its segment table and text, both memory-mapped"""
+
+    def __init__(self, directory: str, title: str, info: Dict):
+        self.title = title
+        self.depth = info['depth']
+        self.categories = info.get('categories', [])
+        self.talmud = 'Talmud' in self.categories
+        base = os.path.join(directory, info['file'])
+        # Both files are non-empty: _write_book skips books without segments
+        self._files = [open(f"{base}.idx", 'rb'), open(f"{base}.txt", 'rb')]
+        self._maps = [mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) for f in self._files]
+        self.rows = memoryview(self._maps[0]).cast(_ROW_TYPE)
+        self.width = self.depth + _SPAN_FIELDS
+        self.count = len(self.rows) // self.width
+        self.text = self._maps[1]
+        # Hebrew segments are stored first, so anything from the first English offset on is English
+        self.english_start = self.rows[self.depth + 2] if self.count else 0
+
+    def close(self):
+        self.rows.release()
+        for handle in self._maps + self._files:
+            handle.close()
+
+    def __del__(self):
+        # Books leave the LRU without an explicit close; release their maps with them
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def address(self, index: int) -> Tuple[int, ...]:
+        start = index * self.width
+        return tuple(self.rows[start:start + self.depth])
+
+    def segment(self, index: int, language: str) -> str:
+        column = index * self.width + self.depth + 2 * LANGUAGES.index(language)
+        return self.text[self.rows[column]:self.rows[column + 1]].decode('utf-8', errors='replace')
+
+    def find(self, address: Tuple[int, ...]) -> int:
+        """Index of the first segment at or after the address (which may be a prefix)"""
+        return bisect_left(range(self.count), address, key=self.address)
+
+    def end_of(self, address: Tuple[int, ...]) -> int:
+        """Index just past the last segment under the address prefix"""
+        return bisect_right(range(self.count), address, key=lambda index: self.address(index)[:len(address)])
+
+    def locate(self, offset: int, language: str) -> int:
+        """Segment whose text in the language contains the byte offset"""
+        column = self.depth + 2 * LANGUAGES.index(language)
+        index = bisect_right(range(self.count), offset, key=lambda i: self.rows[i * self.width + column]) - 1
+        return max(index, 0)
+
+    def ref(self, start: Tuple[int, ...], end: Optional[Tuple[int, ...]] = None) -> str:
+        """Sefaria-style reference for a segment address or range"""
+        return format_ref(self.title, start, end, self.talmud)
+
+
+class SefariaCorpus:
+    """Catalog of ingested books plus a bounded set of open shards; answers in the Sefaria API's shapes"""
+
+    def __init__(self, directory: str, catalog: Dict[str, Dict], open_books: int = 64):
+        self.directory = directory
+        self.catalog = catalog
+        self._titles = {title.lower(): title for title in catalog}
+        # Shared by the event loop and worker threads (search, text indexing); LRUCache is not thread-safe
+        self._books = LRUCache(open_books)
+        self._books_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, directory: Optional[str]) -> Optional['SefariaCorpus']:
+        if not directory:
+            return None
+        try:
+            with open(os.path.join(directory, 'catalog.json'), 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"No Sefaria corpus at {directory}; run python -m bot.sefaria_corpus ingest first")
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable Sefaria corpus catalog: {e}")
+            return None
+        logger.info(f"Serving {len(catalog)} Sefaria books from the local corpus")
+        return cls(directory, catalog)
+
+    def book(self, title: str) -> Optional[CorpusBook]:
+        title = self._titles.get(title.lower())
+        if title is None:
+            return None
+        with self._books_lock:
+            book = self._books.get(title)
+            if book is None:
+                book = CorpusBook(self.directory, title, self.catalog[title])
+                self._books.set(title, book)
+        # An evicted book stays open for as long as a caller holds it
+        return book
+
+    def titles(self, category: Optional[str] = None) -> List[str]:
+        if not category:
+            return list(self.catalog)
+        wanted = category.lower()
+        return [title for title, info in self.catalog.items()
+                if any(wanted == name.lower() for name in info.get('categories', []))]
+
+    def categories(self) -> List[str]:
+        return sorted({name for info in self.catalog.values() for name in info.get('categories', [])})
+
+    def resolve(self, reference: str) -> Optional[Tuple[CorpusBook, Tuple[int, ...], Tuple[int, ...], int, int]]:
+        """(book, start address, end address, first segment, end segment) for a reference
+        such as 'Genesis 1:3-5' or 'Berakhot 2a'; the addresses may be section prefixes
+        """
+        words = reference.replace('_', ' ').split()
+        for split in range(len(words), 0, -1):
+            book = self.book(' '.join(words[:split]))
+            if book is not None:
+                break
+        else:
+            return None
+        if book.count == 0:
+            return None
+
+        sections = ' '.join(words[split:])
+        first, _, last = sections.partition('-')
+        parts = [part for part in _SECTION_SPLIT.split(first.strip()) if part]
+        start = tuple(section_number(part, book.talmud, level) for level, part in enumerate(parts))
+        if None in start or len(start) > book.depth:
+            return None
+        if not start:
+            # A bare title means its first section, as on sefaria.org
+            start = book.address(0)[:max(1, book.depth - 1)]
+
+        end = start
+        if last.strip():
+            parts = [part for part in _SECTION_SPLIT.split(last.strip()) if part]
+            if not parts or len(parts) > len(start):
+                return None
+            shared = len(start) - len(parts)
+            tail = tuple(section_number(part, book.talmud, shared + level) for level, part in enumerate(parts))
+            if None in tail:
+                return None
+            end = start[:len(start) - len(tail)] + tail
+
+        first_index = book.find(start)
+        end_index = book.end_of(end)
+        if first_index >= end_index:
+            return None
+        return book, start, end, first_index, end_index
+
+    def get_text(self, reference: str) -> Optional[Dict]:
+        """Text for a reference in the shape of Sefaria's texts API (lists of segments)"""
+        resolved = self.resolve(reference)
+        if resolved is None:
+            return None
+        book, start_address, end_address, first, end = resolved
+        english = [book.segment(index, 'en') for index in range(first, end)]
+        hebrew = [book.segment(index, 'he') for index in range(first, end)]
+        return {
+            'ref': book.ref(start_address, end_address),
+            'book': book.title,
+            'categories': book.categories,
+            'sectionRef': book.ref(start_address[:book.depth - 1]) if book.depth > 1 else book.title,
+            'sections': list(start_address),
+            'toSections': list(end_address),
+            'textDepth': book.depth,
+            # Like the API, a language the book lacks comes back empty
+            'text': english if any(english) else [],
+            'he': hebrew if any(hebrew) else [],
+        }
+
+    def random_ref(self, category: Optional[str] = None) -> Optional[str]:
+        """Reference to a random section (e.g. a chapter) of a random book, optionally within a category"""
+        titles = self.titles(category) or self.titles()
+        if not titles:
+            return None
+        book = self.book(random.choice(titles))
+        if book is None or book.count == 0:
+            return None
+        address = book.address(random.randrange(book.count))
+        return book.ref(address[:max(1, book.depth - 1)])
+
+    def iter_segments(self, titles: List[str], language: str = 'he') -> Iterator[Tuple[str, str]]:
+        """(ref, segment) for every segment of the books, in order"""
+        for title in titles:
+            book = self.book(title)
+            if book is None:
+                continue
+            for index in range(book.count):
+                segment = book.segment(index, language)
+                if segment:
+                    yield book.ref(book.address(index)), segment
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Plain substring search across every shard (case-insensitive for Latin letters)"""
+        if not query.strip():
+            return []
+        pattern = re.compile(re.escape(query.strip().encode('utf-8')), re.IGNORECASE)
+        results = []
+        for title in self.catalog:
+            book = self.book(title)
+            if book is None:
+                continue
+            for match in pattern.finditer(book.text):
+                language = 'en' if match.start() >= book.english_start else 'he'
+                index = book.locate(match.start(), language)
+                results.append({
+                    'ref': book.ref(book.address(index)),
+                    'text': book.segment(index, language),
+                    'title': book.title
+                })
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+def _export_books(export_dir: str) -> Iterator[Tuple[str, List[str], Dict[str, str]]]:
+    """(title, categories, {language: merged.json path}) for each book folder of a Sefaria export"""
+    for root, directories, files in os.walk(export_dir):
+        languages = {
+            _EXPORT_LANGUAGES[name]: os.path.join(root, name, 'merged.json')
+            for name in directories
+            if name in _EXPORT_LANGUAGES and os.path.exists(os.path.join(root, name, 'merged.json'))
+        }
+        if languages:
+            directories[:] = []  # A book folder; nothing further down is another book
+            relative = os.path.relpath(root, export_dir).split(os.sep)
+            yield relative[-1], relative[:-1], languages
+
+
+def _leaves(text, title: str) -> Iterator[Tuple[str, Dict[Tuple[int, ...], str]]]:
+    """(title, segments) per text node; complex books nest named parts, which become 'Title, Part' books"""
+    if isinstance(text, dict):
+        for name, part in text.items():
+            yield from _leaves(part, f"{title}, {name}" if name else title)
+    else:
+        leaves: Dict[Tuple[int, ...], str] = {}
+        _flatten(text, (), leaves)
+        yield title, leaves
+
+
+def _write_book(corpus_dir: str, title: str, segments: Dict[str, Dict[Tuple[int, ...], str]]) -> Optional[Dict]:
+    addresses = sorted(set().union(*(leaves.keys() for leaves in segments.values())))
+    if not addresses:
+        return None
+    depth = max(len(address) for address in addresses)
+    file_name = _slug(title)
+    base = os.path.join(corpus_dir, file_name)
+
+    rows = array(_ROW_TYPE)
+    spans = {language: array(_ROW_TYPE) for language in LANGUAGES}
+    with open(f"{base}.txt.tmp", 'wb') as f:
+        position = 0
+        for language in LANGUAGES:
+            leaves = segments.get(language, {})
+            for address in addresses:
+                data = (leaves.get(address, '') + '\n').encode('utf-8') if address in leaves else b''
+                f.write(data)
+                spans[language].extend((position, position + max(len(data) - 1, 0)))
+                position += len(data)
+    for row, address in enumerate(addresses):
+        rows.extend(address + (0,) * (depth - len(address)))
+        for language in LANGUAGES:
+            rows.extend(spans[language][2 * row:2 * row + 2])
+    with open(f"{base}.idx.tmp", 'wb') as f:
+        rows.tofile(f)
+    os.replace(f"{base}.txt.tmp", f"{base}.txt")
+    os.replace(f"{base}.idx.tmp", f"{base}.idx")
+    return {'file': file_name, 'depth': depth, 'segments': len(addresses)}
+
+
+def ingest_export(export_dir: str, corpus_dir: str, categories: Optional[List[str]] = None) -> int:
+    """Convert a Sefaria export (the json/ folder of Sefaria-Export) into shards; returns the number of books
+
+    Books are converted one at a time, so memory use is bounded by the largest book.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    catalog = {}
+    for title, book_categories, paths in _export_books(export_dir):
+        if categories and not set(categories) & set(book_categories):
+            continue
+        parts: Dict[str, Dict[str, Dict[Tuple[int, ...], str]]] = {}
+        for language, path in paths.items():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    merged = json.load(f)
+            except Exception as e:
+                logger.warning(f"Skipping {path}: {e}")
+                continue
+            book_categories = merged.get('categories') or book_categories
+            for part_title, leaves in _leaves(merged.get('text'), merged.get('title') or title):
+                parts.setdefault(part_title, {})[language] = leaves
+        for part_title, segments in parts.items():
+            info = _write_book(corpus_dir, part_title, segments)
+            if info:
+                info['categories'] = book_categories
+                catalog[part_title] = info
+        logger.info(f"Ingested {title}")
+
+    # Written last: the corpus is only picked up once every shard is in place
+    with open(os.path.join(corpus_dir, 'catalog.json.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False)
+    os.replace(os.path.join(corpus_dir, 'catalog.json.tmp'), os.path.join(corpus_dir, 'catalog.json'))
+    return len(catalog)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from .storage import cache_path
+
+    parser = argparse.ArgumentParser(description="Build or benchmark the offline Sefaria corpus")
+    parser.add_argument('command', choices=('ingest', 'bench'))
+    parser.add_argument('export_dir', nargs='?', help="Sefaria-Export json/ folder (for ingest)")
+    parser.add_argument('--category', action='append', help="Only ingest books in this category (repeatable)")
+    parser.add_argument('--corpus-dir', default=os.getenv('SEFARIA_CORPUS_DIR') or os.path.dirname(cache_path('sefaria', 'corpus', 'catalog.json')))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'ingest':
+        if not args.export_dir:
+            parser.error("ingest needs the export directory")
+        start = time.perf_counter()
+        count = ingest_export(args.export_dir, args.corpus_dir, args.category)
+        print(f"{count} books written to {args.corpus_dir} in {time.perf_counter() - start:.1f} s")
+    else:
+        corpus = SefariaCorpus.open(args.corpus_dir)
+        if corpus is None:
+            raise SystemExit("No corpus to benchmark")
+        refs = [corpus.random_ref() for _ in range(200)]
+        start = time.perf_counter()
+        for ref in refs:
+            corpus.get_text(ref)
+        print(f"get_text: {(time.perf_counter() - start) / len(refs) * 1e6:.0f} us per section")
@@ -0,0 +1,540 @@
+"""
+Local parser for Sefaria references: resolves titles and aliases, checks section bounds, and gives canonical keys
+"""
+import heapq
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import gematria
+from .hebrew_text import normalize
+
+_DAF = re.compile(r'^(\d+)([ab])$', re.I)
+_HEBREW_NUMERAL = re.compile(r'^[א-ת]+[\'"׳״]?[א-ת]?$')
+_SECTION_SPLIT = re.compile(r'[:.,\s]+')
+_RANGE = re.compile(r'\s*[-–—]\s*')
+# "Genesis.1.1" as in sefaria.org URLs
+_URL_DOTS = re.compile(r'(?<=[^\W\d_])\.(?=\d)')
+# Plain chapter:verse numbers at the end of a reference whose title is not known
+_TRAILING_SECTIONS = re.compile(r'^(.*?)\s+(\d+(?::\d+)*(?:-\d+(?::\d+)*)?)$')
+# Completions remembered per trie node (Discord shows at most 25)
+_TOP_COMPLETIONS = 25
+_LAST_NUMBER = re.compile(r'(\d+)$')
+# Words that may precede a tractate name without being part of the title
+_TALMUD_PREFIXES = ('talmud', 'bavli', 'babylonian talmud', 'bt', 'tb')
+
+# Tanakh in Sefaria's titles and Hebrew chapter numbering: (title, chapters, Hebrew title, other names)
+TANAKH = [
+    ("Genesis", 50, "בראשית", "Gen, Bereishit, Bereshit, Breishit, Bereishis"),
+    ("Exodus", 40, "שמות", "Ex, Exod, Shemot, Shemos, Shmot"),
+    ("Leviticus", 27, "ויקרא", "Lev, Vayikra"),
+    ("Numbers", 36, "במדבר", "Num, Bamidbar, Bemidbar"),
+    ("Deuteronomy", 34, "דברים", "Deut, Dt, Devarim, Dvarim"),
+    ("Joshua", 24, "יהושע", "Josh, Yehoshua"),
+    ("Judges", 21, "שופטים", "Judg, Shoftim"),
+    ("I Samuel", 31, "שמואל א", "1 Samuel, First Samuel, 1 Sam, I Sam, Shmuel Aleph"),
+    ("II Samuel", 24, "שמואל ב", "2 Samuel, Second Samuel, 2 Sam, II Sam, Shmuel Bet"),
+    ("I Kings", 22, "מלכים א", "1 Kings, First Kings, 1 Kgs, Melachim Aleph"),
+    ("II Kings", 25, "מלכים ב", "2 Kings, Second Kings, 2 Kgs, Melachim Bet"),
+    ("Isaiah", 66, "ישעיהו", "Isa, Yeshayahu, ישעיה"),
+    ("Jeremiah", 52, "ירמיהו", "Jer, Yirmiyahu, ירמיה"),
+    ("Ezekiel", 48, "יחזקאל", "Ezek, Yechezkel"),
+    ("Hosea", 14, "הושע", "Hos, Hoshea"),
+    ("Joel", 4, "יואל", "Yoel"),
+    ("Amos", 9, "עמוס", ""),
+    ("Obadiah", 1, "עובדיה", "Obad, Ovadiah, Ovadia"),
+    ("Jonah", 4, "יונה", "Yonah"),
+    ("Micah", 7, "מיכה", "Mic, Michah"),
+    ("Nahum", 3, "נחום", "Nah, Nachum"),
+    ("Habakkuk", 3, "חבקוק", "Hab, Chavakuk"),
+    ("Zephaniah", 3, "צפניה", "Zeph, Tzefaniah"),
+    ("Haggai", 2, "חגי", "Hag, Chaggai"),
+    ("Zechariah", 14, "זכריה", "Zech, Zecharia"),
+    ("Malachi", 3, "מלאכי", "Mal"),
+    ("Psalms", 150, "תהלים", "Ps, Psalm, Tehillim, Tehilim, תהילים"),
+    ("Proverbs", 31, "משלי", "Prov, Mishlei"),
+    ("Job", 42, "איוב", "Iyov"),
+    ("Song of Songs", 8, "שיר השירים", "Song of Solomon, Shir HaShirim, Canticles"),
+    ("Ruth", 4, "רות", "Rut"),
+    ("Lamentations", 5, "איכה", "Lam, Eicha, Eichah"),
+    ("Ecclesiastes", 12, "קהלת", "Eccl, Kohelet, Koheles, Qohelet"),
+    ("Esther", 10, "אסתר", "Esth, Ester"),
+    ("Daniel", 12, "דניאל", "Dan"),
+    ("Ezra", 10, "עזרא", ""),
+    ("Nehemiah", 13, "נחמיה", "Neh, Nechemiah, Nechemia"),
+    ("I Chronicles", 29, "דברי הימים א", "1 Chronicles, First Chronicles, 1 Chron, Divrei HaYamim Aleph"),
+    ("II Chronicles", 36, "דברי הימים ב", "2 Chronicles, Second Chronicles, 2 Chron, Divrei HaYamim Bet"),
+]
+
+# Babylonian Talmud: (title, last daf or 0 when it does not start at 2a, Hebrew title, other names)
+TALMUD = [
+    ("Berakhot", 64, "ברכות", "Berachot, Brachot, Berachos"),
+    ("Shabbat", 157, "שבת", "Shabbos, Shabat"),
+    ("Eruvin", 105, "עירובין", "Eiruvin"),
+    ("Pesachim", 121, "פסחים", "Pesahim"),
+    ("Shekalim", 22, "שקלים", "Shekolim"),
+    ("Yoma", 88, "יומא", ""),
+    ("Sukkah", 56, "סוכה", "Succah, Sukka"),
+    ("Beitzah", 40, "ביצה", "Beitza, Betzah, Beitsah"),
+    ("Rosh Hashanah", 35, "ראש השנה", "Rosh HaShana, Rosh Hashana"),
+    ("Taanit", 31, "תענית", "Taanis, Ta'anit"),
+    ("Megillah", 32, "מגילה", "Megilah"),
+    ("Moed Katan", 29, "מועד קטן", "Moed Kattan, Mo'ed Katan"),
+    ("Chagigah", 27, "חגיגה", "Hagigah, Chagiga"),
+    ("Yevamot", 122, "יבמות", "Yevamos"),
+    ("Ketubot", 112, "כתובות", "Kesubos, Ketuvot, Ketubos"),
+    ("Nedarim", 91, "נדרים", ""),
+    ("Nazir", 66, "נזיר", ""),
+    ("Sotah", 49, "סוטה", "Sota"),
+    ("Gittin", 90, "גיטין", "Gitin"),
+    ("Kiddushin", 82, "קידושין", "Kidushin"),
+    ("Bava Kamma", 119, "בבא קמא", "Bava Kama, Baba Kamma, Baba Kama"),
+    ("Bava Metzia", 119, "בבא מציעא", "Baba Metzia, Bava Metziah"),
+    ("Bava Batra", 176, "בבא בתרא", "Baba Batra, Bava Basra, Baba Basra"),
+    ("Sanhedrin", 113, "סנהדרין", ""),
+    ("Makkot", 24, "מכות", "Makot, Makkos"),
+    ("Shevuot", 49, "שבועות", "Shevuos, Shvuot"),
+    ("Avodah Zarah", 76, "עבודה זרה", "Avoda Zara, Avodah Zara"),
+    ("Horayot", 14, "הוריות", "Horayos"),
+    ("Zevachim", 120, "זבחים", "Zevahim"),
+    ("Menachot", 110, "מנחות", "Menachos, Menahot"),
+    ("Chullin", 142, "חולין", "Hullin, Chulin"),
+    ("Bekhorot", 61, "בכורות", "Bechorot, Bechoros"),
+    ("Arakhin", 34, "ערכין", "Arachin"),
+    ("Temurah", 34, "תמורה", "Temura"),
+    ("Keritot", 28, "כריתות", "Kerisus, Kereitot"),
+    ("Meilah", 22, "מעילה", "Me'ilah, Meila"),
+    # Printed after Meilah and paged on from it
+    ("Kinnim", 0, "קינים", "Kinim"),
+    ("Tamid", 0, "תמיד", ""),
+    ("Middot", 0, "מדות", "Midot, מידות"),
+    ("Niddah", 73, "נדה", "Nidah"),
+]
+
+
+def section_number(part: str, talmud: bool = False, level: int = 1) -> Optional[int]:
+    """'3' -> 3, 'ג' -> 3; Talmud folio sides count from 1a, so '2a' -> 3, '2b' -> 4 (and a bare daf '2' -> 3)"""
+    if part.isdigit():
+        number = int(part)
+        return number * 2 - 1 if talmud and level == 0 else number
+    daf = _DAF.match(part)
+    if daf:
+        return (int(daf.group(1)) - 1) * 2 + (1 if daf.group(2).lower() == 'a' else 2)
+    if _HEBREW_NUMERAL.match(part):
+        number = gematria.value(part)
+        if number:
+            return number * 2 - 1 if talmud and level == 0 else number
+    return None
+
+
+def section_label(number: int, level: int, talmud: bool) -> str:
+    if talmud and level == 0:
+        return f"{(number + 1) // 2}{'a' if number % 2 else 'b'}"
+    return str(number)
+
+
+def format_ref(title: str, start: Tuple[int, ...], end: Optional[Tuple[int, ...]] = None, talmud: bool = False) -> str:
+    """Sefaria-style reference for an address or range, e.g. 'Genesis 1:3-5', 'Shabbat 31a:2-31b:4'"""
+    if not start:
+        return title
+    first = ':'.join(section_label(number, level, talmud) for level, number in enumerate(start))
+    if not end or end == start:
+        return f"{title} {first}"
+    shared = 0
+    while shared < len(start) - 1 and start[shared] == end[shared]:
+        shared += 1
+    last = ':'.join(section_label(number, level, talmud) for level, number in enumerate(end) if level >= shared)
+    return f"{title} {first}-{last}"
+
+
+def shape_depth(shape: List) -> int:
+    """Depth of a text from its shape (segment counts nested per section)"""
+    depth = 1
+    node = shape
+    while isinstance(node, list):
+        depth += 1
+        node = next((child for child in node if child), 0)
+    return depth
+
+
+class Ref(NamedTuple):
+    key: str  # Canonical form, used for requests and as the cache key
+    title: str
+    sections: Tuple[int, ...]
+    to_sections: Tuple[int, ...]
+    depth: Optional[int] = None  # None when the text's structure is unknown
+
+    @property
+    def is_range(self) -> bool:
+        return self.sections != self.to_sections
+
+    @property
+    def is_segment(self) -> bool:
+        """A single segment (verse, Talmud line, ...) rather than a section or a range"""
+        return not self.is_range and len(self.sections) >= (self.depth or 2)
+
+
+class _Book:
+    __slots__ = ('title', 'talmud', 'depth', 'sections', 'first', 'shape')
+
+    def __init__(self, title: str, talmud: bool = False, depth: Optional[int] = None,
+                 sections: Optional[int] = None, first: int = 1):
+        self.title = title
+        self.talmud = talmud
+        self.depth = depth
+        self.sections = sections  # Number of top-level sections, when known without a shape
+        self.first = first  # First top-level section (Talmud starts at daf 2a)
+        self.shape: Optional[List] = None
+
+    def contains(self, address: Tuple[int, ...]) -> bool:
+        if self.depth is not None and len(address) > self.depth:
+            return False
+        if self.shape is None:
+            return self.first <= address[0] and (self.sections is None or address[0] <= self.sections)
+        node = self.shape
+        for number in address:
+            if isinstance(node, list):
+                if not 1 <= number <= len(node):
+                    return False
+                node = node[number - 1]
+            elif isinstance(node, int):
+                if not 1 <= number <= node:
+                    return False
+                node = None
+            else:
+                return False
+        # A section without segments (e.g. daf 1a) is not a valid ref either
+        return node != 0 and node != []
+
+    def children(self, address: Tuple[int, ...]) -> List[int]:
+        """Valid section numbers one level below the address; empty when that is not known"""
+        if self.depth is not None and len(address) >= self.depth:
+            return []
+        if self.shape is None:
+            if address or self.sections is None:
+                return []
+            return list(range(self.first, self.sections + 1))
+        node = self.shape
+        for number in address:
+            if not isinstance(node, list) or not 1 <= number <= len(node):
+                return []
+            node = node[number - 1]
+        if isinstance(node, list):
+            return [number for number, child in enumerate(node, 1) if child]
+        return list(range(1, node + 1)) if isinstance(node, int) else []
+
+
+class TitleTrie:
+    """Compressed prefix tree (radix tree) from normalized names to titles
+
+    Each edge holds a whole run of characters, so a lookup takes one dict access per
+    branching point rather than per character. Every node remembers its best completions
+    once asked, so repeated keystrokes under the same prefix cost only the walk down.
+    """
+    __slots__ = ('edges', 'titles', 'top')
+
+    def __init__(self):
+        self.edges: Dict[str, Tuple[str, 'TitleTrie']] = {}  # first character -> (label, child)
+        self.titles: List[str] = []
+        self.top: Optional[List[str]] = None
+
+    def insert(self, key: str, title: str):
+        node = self
+        while key:
+            node.top = None
+            edge = node.edges.get(key[0])
+            if edge is None:
+                child = TitleTrie()
+                node.edges[key[0]] = (key, child)
+                node = child
+                break
+            label, child = edge
+            shared = 0
+            limit = min(len(label), len(key))
+            while shared < limit and label[shared] == key[shared]:
+                shared += 1
+            if shared < len(label):
+                # Split the edge where the new key branches off
+                middle = TitleTrie()
+                middle.edges[label[shared]] = (label[shared:], child)
+                node.edges[key[0]] = (label[:shared], middle)
+                child = middle
+            node = child
+            key = key[shared:]
+        node.top = None
+        if title not in node.titles:
+            node.titles.append(title)
+
+    def complete(self, prefix: str, limit: int = 25) -> List[str]:
+        """Titles of names starting with the prefix, shortest names first (at most _TOP_COMPLETIONS)"""
+        node = self
+        while prefix:
+            edge = node.edges.get(prefix[0])
+            if edge is None:
+                return []
+            label, child = edge
+            if prefix.startswith(label):
+                prefix = prefix[len(label):]
+            elif label.startswith(prefix):
+                prefix = ''
+            else:
+                return []
+            node = child
+        if node.top is None:
+            node.top = node._best(_TOP_COMPLETIONS)
+        return node.top[:limit]
+
+    def _best(self, limit: int) -> List[str]:
+        # Best first by name length: a heap of (characters so far, tie-breaker, node)
+        titles: List[str] = []
+        heap = [(0, 0, self)]
+        pushed = 1
+        while heap and len(titles) < limit:
+            length, _, node = heapq.heappop(heap)
+            for title in node.titles:
+                if title not in titles:
+                    titles.append(title)
+            for label, child in node.edges.values():
+                heapq.heappush(heap, (length + len(label), pushed, child))
+                pushed += 1
+        return titles[:limit]
+
+
+class RefParser:
+    """Title and alias table plus whatever is known of each book's structure
+
+    Starts with Tanakh and the Talmud built in; `add_index` adds every title in Sefaria's
+    index and `add_shape` the exact section lengths of a book. Until an index has been
+    added, references to unknown titles are passed through unvalidated.
+    """
+
+    def __init__(self):
+        self.books: Dict[str, _Book] = {}
+        self.aliases: Dict[str, str] = {}
+        self.trie = TitleTrie()
+        self.complete = False
+        self._longest = 1
+        for title, chapters, hebrew, others in TANAKH:
+            self.add_title(title, [hebrew] + others.split(', '), depth=2, sections=chapters)
+        for title, last_daf, hebrew, others in TALMUD:
+            self.add_title(title, [hebrew] + others.split(', '), depth=2, talmud=True,
+                           sections=last_daf * 2 or None, first=3 if last_daf else 1)
+
+    def add_title(self, title: str, aliases: Iterable[str] = (), depth: Optional[int] = None,
+                  talmud: bool = False, sections: Optional[int] = None, first: int = 1):
+        if title not in self.books:
+            self.books[title] = _Book(title, talmud, depth, sections, first)
+        for name in [title, *aliases]:
+            key = normalize(name)
+            if key:
+                # Earlier names win: the built-in Tanakh and Talmud titles over same-named index entries
+                self.aliases.setdefault(key, title)
+                self.trie.insert(key, title)
+                self._longest = max(self._longest, key.count(' ') + 1)
+
+    def add_index(self, index_data: List[Dict]) -> int:
+        """Add every title (and Hebrew title) in Sefaria's /api/index tree; returns the number of books"""
+        count = 0
+        stack = list(index_data) if isinstance(index_data, list) else []
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, dict):
+                continue
+            if isinstance(node.get('contents'), list):
+                stack.extend(node['contents'])
+            elif node.get('title'):
+                categories = node.get('categories') or []
+                # Yerushalmi refs are chapter:halakhah:segment, so only the Bavli counts folio sides
+                talmud = 'Bavli' in categories
+                self.add_title(node['title'], [node['heTitle']] if node.get('heTitle') else [], talmud=talmud)
+                count += 1
+        if count:
+            self.complete = True
+        return count
+
+    def add_shape(self, title: str, shape: List):
+        """Exact section lengths for a book, as in the 'chapters' of Sefaria's shape API"""
+        book = self.books.get(title)
+        if book is None or not isinstance(shape, list) or not shape:
+            return
+        book.shape = shape
+        book.depth = shape_depth(shape)
+
+    def has_shape(self, title: str) -> bool:
+        book = self.books.get(title)
+        return book is not None and book.shape is not None
+
+    def _title(self, words: List[str]) -> Tuple[Optional[str], int]:
+        """Longest known title at the start of the words, and how many words it took"""
+        for split in range(min(len(words), self._longest + 1), 0, -1):
+            title = self.aliases.get(normalize(' '.join(words[:split])))
+            if title:
+                return title, split
+        return None, 0
+
+    def parse(self, text: str) -> Optional[Ref]:
+        """The reference in canonical form, or None if it cannot be valid"""
+        text = ' '.join(_URL_DOTS.sub(' ', text.replace('_', ' ')).split())
+        if not text:
+            return None
+        words = text.split(' ')
+        title, split = self._title(words)
+        if title is None:
+            for prefix in _TALMUD_PREFIXES:
+                count = prefix.count(' ') + 1
+                if normalize(' '.join(words[:count])) == prefix and len(words) > count:
+                    title, split = self._title(words[count:])
+                    split += count if title else 0
+                    break
+        if title is None or words[split - 1].endswith(','):
+            # Unknown title, or a named part of a complex text ("Tanya, Part I; ..."): passed through
+            # as typed unless the whole index is known and the title is missing from it
+            if self.complete and title is None:
+                return None
+            trailing = _TRAILING_SECTIONS.search(text)
+            if trailing is None:
+                return Ref(text, title or text, (), ())
+            first, _, last = trailing.group(2).partition('-')
+            start = tuple(int(part) for part in first.split(':'))
+            end = start[:len(start) - len(last.split(':'))] + tuple(int(part) for part in last.split(':')) if last else start
+            return Ref(text, title or trailing.group(1), start, end)
+
+        book = self.books[title]
+        rest = _RANGE.split(' '.join(words[split:]), 1)
+        start = self._address(rest[0], book, 0)
+        if start is None:
+            return None
+        if not start:
+            return Ref(title, title, (), (), book.depth)
+        end = start
+        if len(rest) > 1:
+            level = None
+            tail = _SECTION_SPLIT.split(rest[1].strip())
+            if 0 < len(tail) <= len(start):
+                level = len(start) - len(tail)
+            end = self._address(rest[1], book, level) if level is not None else None
+            if not end:
+                return None
+            end = start[:level] + end
+            if end < start:
+                return None
+        if not book.contains(start) or not book.contains(end):
+            return None
+        return Ref(format_ref(title, start, end, book.talmud), title, start, end, book.depth)
+
+    def following(self, ref: Ref) -> Optional[Ref]:
+        """The segment or section right after a ref (after its end, for a range), or None at the end of a book
+
+        Uses shape data where known; without it a chapter's last verse cannot be detected, and
+        the verse after it is returned (the fetch then simply fails).
+        """
+        address = ref.to_sections
+        book = self.books.get(ref.title)
+        if not address:
+            return None
+        if book is None:
+            # Structure unknown (e.g. "Tanya, Part I; Likkutei Amarim 5"): the last number plus one
+            if ref.is_range or not _LAST_NUMBER.search(ref.key):
+                return None
+            return self.parse(_LAST_NUMBER.sub(lambda match: str(int(match.group(1)) + 1), ref.key))
+
+        for level in range(len(address) - 1, -1, -1):
+            siblings = book.children(address[:level])
+            number = address[level] + 1
+            if not siblings and (level == 0 or book.shape is not None):
+                continue
+            later = [sibling for sibling in siblings if sibling >= number]
+            if siblings and not later:
+                continue  # Past the last one at this level: move on at the level above
+            candidate = address[:level] + (later[0] if later else number,)
+            # Coming from the level above, start the deeper levels at their first child
+            while len(candidate) < len(address):
+                children = book.children(candidate)
+                candidate += (children[0] if children else 1,)
+            return self.parse(format_ref(book.title, candidate, talmud=book.talmud))
+        return None
+
+    def section(self, ref: Ref) -> Optional[Ref]:
+        """The section a single segment belongs to ("Genesis 1:5" -> "Genesis 1"), or None for other refs"""
+        if not ref.is_segment:
+            return None
+        book = self.books.get(ref.title)
+        return self.parse(format_ref(ref.title, ref.to_sections[:-1], talmud=bool(book and book.talmud)))
+
+    def suggest(self, text: str, limit: int = 25) -> List[str]:
+        """Completions for a partly typed reference: titles, then chapters, then verses (or dafs, then lines)
+
+        Works from the local tables only, so it is cheap enough to run on every keystroke.
+        """
+        cleaned = ' '.join(_URL_DOTS.sub(' ', text.replace('_', ' ')).split())
+        if not cleaned:
+            return [title for title, *_ in TANAKH[:limit]]
+        words = cleaned.split(' ')
+        title, split = self._title(words)
+        # Until a space follows the title, it may still be the start of a longer one
+        if title is None or (split == len(words) and not text.endswith(' ')):
+            return self.trie.complete(normalize(cleaned), limit)
+
+        book = self.books[title]
+        typed = ' '.join(words[split:])
+        if _RANGE.search(typed):
+            parsed = self.parse(cleaned)
+            return [parsed.key] if parsed else []
+        # Whole sections typed so far, and the partial one being typed ("1:2" -> (1,) and "2")
+        *whole, partial = _SECTION_SPLIT.sub(':', typed).split(':') if typed else ['']
+        address = self._address(' '.join(whole), book, 0)
+        if address is None:
+            return self.trie.complete(normalize(cleaned), limit)
+
+        level = len(address)
+        suggestions = []
+        for number in book.children(address):
+            if section_label(number, level, book.talmud).startswith(partial.lower()):
+                suggestions.append(format_ref(title, address + (number,), talmud=book.talmud))
+                if len(suggestions) >= limit:
+                    break
+        if not suggestions:
+            # Nothing known below this level: offer the reference itself if it is valid
+            parsed = self.parse(cleaned)
+            return [parsed.key] if parsed else []
+        return suggestions
+
+    @staticmethod
+    def _address(text: str, book: _Book, level: int) -> Optional[Tuple[int, ...]]:
+        parts = [part for part in _SECTION_SPLIT.split(text.strip()) if part]
+        address = tuple(section_number(part, book.talmud, level + i) for i, part in enumerate(parts))
+        if None in address or any(number < 1 for number in address):
+            return None
+        return address
+
+
+if __name__ == "__main__":
+    # Examples and a microbenchmark
+    import timeit
+
+    parser = RefParser()
+    samples = ["Genesis 1:1", "Bereishit 1:1", "  genesis   1 : 1-5 ", "Genesis.1.1", "בראשית א:ב",
+               "Shabbat 31a", "Talmud Shabbat 31a", "shabbos 31", "Berakhot 2a:3-2b:4", "1 Samuel 3",
+               "Genesis 51:1", "Shabbat 1a", "Shabbat 200b", "Genesis 1:1-0", "Tanya, Part I; Likkutei Amarim 5",
+               "Pirkei Avot 1:1", "Genesis 1-2"]
+    for sample in samples:
+        print(f"{sample!r:40} -> {parser.parse(sample)}")
+    runs = 20000
+    elapsed = timeit.timeit(lambda: parser.parse("Bereishit 12:1-3"), number=runs) / runs * 1e6
+    print(f"parse: {elapsed:.1f} us")
+
+    for typed in ["Genesis 1:1", "Genesis 1:31", "Genesis 50:26", "Genesis 50", "Shabbat 2a", "Berakhot 64b", "Genesis 1:1-5",
+                  "Tanya, Part I; Likkutei Amarim 5"]:
+        following = parser.following(parser.parse(typed))
+        print(f"after {typed!r}: {following.key if following else None}")
+    for typed, section in [("Genesis 1:31", "Genesis 1"), ("Berakhot 2a:5", "Berakhot 2a"), ("Genesis 1", None),
+                           ("Genesis 1:1-5", None)]:
+        found = parser.section(parser.parse(typed))
+        assert (found.key if found else None) == section, (typed, found)
+    for typed in ["", "gen", "b", "ש", "Genesis ", "Genesis 1", "Genesis 4:", "Shabbat 3", "Berakhot 2a:", "Song of"]:
+        print(f"{typed!r:16} -> {parser.suggest(typed, limit=6)}")
+    for count in range(6000):
+        parser.add_title(f"Commentary {count} on Book {count % 97}", [f"פירוש {count}"])
+    elapsed = timeit.timeit(lambda: parser.suggest("Commentary 1", limit=25), number=1) * 1e6
+    print(f"suggest over {len(parser.aliases)} names: first call {elapsed:.1f} us", end=", ")
+    elapsed = timeit.timeit(lambda: parser.suggest("Commentary 1", limit=25), number=2000) / 2000 * 1e6
+    print(f"then {elapsed:.1f} us")
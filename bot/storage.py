@@ -0,0 +1,12 @@
+"""
+Local on-disk storage locations for caches and snapshots
+"""
+import os
+
+
+def cache_path(*parts: str) -> str:
+    """Path inside the bot's cache directory (BOT_CACHE_DIR, default ./cache), creating parent folders"""
+    base = os.getenv('BOT_CACHE_DIR', 'cache')
+    path = os.path.join(base, *parts)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    return path
@@ -0,0 +1,430 @@
+"""
+Positional inverted index over text segments for local full-text search with phrase queries
+"""
+import heapq
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import compress, repeat
+from operator import add, eq, sub
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .hebrew_text import normalize_batch, tokenize
+
+# BM25 parameters, as in ranking.py
+K1 = 1.2
+B = 0.75
+
+# A posting is doc << POSITION_BITS | position; positions past the limit are not indexed
+POSITION_BITS = 16
+_POSITION_LIMIT = 1 << POSITION_BITS
+_POSITION_MASK = _POSITION_LIMIT - 1
+# Documents appended per hold of the lock
+_APPEND_BATCH = 256
+# Above this many candidate docs, matches are visited best-first instead of all scored
+_EXHAUSTIVE_DOCS = 1024
+# Docs taken from each impact-ordered list between checks of the stopping threshold
+_BLOCK = 64
+# Docs scored before a best-first search settles for the best found so far
+_SCORE_BUDGET = 512
+# Term id between documents in the forward index, so no phrase matches across two of them
+_BOUNDARY = 0
+
+_TAGS = re.compile(r'<[^>]+>|&[#\w]+;')
+_PHRASES = re.compile(r'"([^"]+)"')
+_VOWELS = re.compile('[aeiou]')
+
+
+def stem(token: str) -> str:
+    """Light English suffix stripping in the manner of Porter's step 1; Hebrew tokens are left alone
+
+    Plurals (-s, -ies), -ed and -ing come off, a final -y after a consonant becomes -i (so
+    family, families, carry and carried share a stem) and a silent e is dropped.
+    """
+    if not token.isascii() or len(token) <= 3:
+        return token
+    if token.endswith('sses'):
+        token = token[:-2]
+    elif token.endswith(('ies', 'ied')):
+        token = token[:-3] + ('i' if len(token) > 4 else 'ie')
+    elif token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        token = token[:-1]
+    else:
+        for suffix in ('ing', 'ed'):
+            base = token[:-len(suffix)]
+            if token.endswith(suffix) and len(base) >= 3 and _VOWELS.search(base):
+                # running -> run, but blessed -> bless and called -> call
+                token = base[:-1] if len(base) > 3 and base[-1] == base[-2] and base[-1] not in 'lsz' else base
+                break
+    if token.endswith('y') and token[-2] not in 'aeiou' and _VOWELS.search(token[:-2]):
+        token = token[:-1] + 'i'
+    if token.endswith('e') and len(token) > 3:
+        token = token[:-1]
+    return token
+
+
+def terms(text: str) -> List[str]:
+    """Index terms of a text: normalized (niqqud-free, finals folded, lowercase) and stemmed"""
+    return [stem(token) for token in tokenize(text)]
+
+
+class Document(NamedTuple):
+    ref: str
+    title: str
+    language: str
+    text: str
+
+
+class _Ranked(NamedTuple):
+    """A term's docs by descending tf / (tf + norm), with its forward-index positions grouped in the same order
+
+    The doc of each position and the term ids just before and after it are kept alongside,
+    so a two-word phrase is counted over a whole block by comparing one slice.
+    """
+    docs: array
+    impacts: array
+    positions: array
+    bounds: array
+    owners: array
+    preceding: array
+    following: array
+
+
+class _Postings:
+    """One term's occurrences in insertion order: packed (doc, position) keys, plus each doc once with its first key"""
+    __slots__ = ('id', 'keys', 'docs', 'starts', 'ranked', 'ranked_size')
+
+    def __init__(self, term_id: int):
+        self.id = term_id
+        self.keys = array('Q')
+        self.docs = array('I')
+        self.starts = array('I')
+        # Impact order for the index size it was computed at
+        self.ranked: Optional[_Ranked] = None
+        self.ranked_size = 0
+
+    @property
+    def df(self) -> int:
+        return len(self.docs)
+
+    def add(self, doc: int, key: int):
+        if not self.docs or self.docs[-1] != doc:
+            self.docs.append(doc)
+            self.starts.append(len(self.keys))
+        self.keys.append(key)
+
+    def span(self, doc: int) -> Tuple[int, int]:
+        """Range of this term's postings inside one doc (docs ascend, so one bisect finds it)"""
+        i = bisect_left(self.docs, doc)
+        if i == len(self.docs) or self.docs[i] != doc:
+            return 0, 0
+        return self.starts[i], self.starts[i + 1] if i + 1 < len(self.starts) else len(self.keys)
+
+
+class TextIndex:
+    """Segments (verses, mishnayot, ...) with term postings; safe to fill from a worker thread while searched"""
+
+    def __init__(self):
+        self.documents: List[Document] = []
+        self.lengths = array('I')
+        self.postings: Dict[str, _Postings] = {}
+        # Forward index: every indexed position's term id, each doc followed by a boundary
+        self.tokens = array('I', [_BOUNDARY])
+        self.offsets = array('Q')
+        self._seen: Set[Tuple[str, str]] = set()
+        self._total_length = 0
+        self._norms = array('d')
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _length_norms(self) -> array:
+        """BM25's K1 * (1 - B + B * length / average length) per doc, recomputed after the index grows"""
+        if len(self._norms) != len(self.documents):
+            scale = K1 * B * len(self.documents) / self._total_length
+            self._norms = array('d', [K1 * (1 - B) + scale * length for length in self.lengths])
+        return self._norms
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        """Whether a (ref, language) segment is indexed"""
+        return key in self._seen
+
+    def add_documents(self, documents: Iterable[Tuple[str, str, str, str]]) -> int:
+        """Index (ref, title, language, text) segments, skipping ones already present; returns how many were added
+
+        The documents are read and tokenized before the lock is taken, so searches only wait
+        for the postings to be appended.
+        """
+        prepared = []
+        for ref, title, language, text in documents:
+            if (ref, language) in self._seen:
+                continue
+            text = ' '.join(_TAGS.sub(' ', text).split())
+            tokens = terms(text)
+            if tokens:
+                prepared.append((Document(ref, title, language, text), tokens))
+
+        added = 0
+        # Appended a batch at a time, so a search never waits long behind a large book
+        for batch in range(0, len(prepared), _APPEND_BATCH):
+            with self._lock:
+                for document, tokens in prepared[batch:batch + _APPEND_BATCH]:
+                    if (document.ref, document.language) in self._seen:
+                        continue
+                    doc = len(self.documents)
+                    self._seen.add((document.ref, document.language))
+                    self.documents.append(document)
+                    self.lengths.append(len(tokens))
+                    self._total_length += len(tokens)
+                    base = doc << POSITION_BITS
+                    self.offsets.append(len(self.tokens))
+                    for position, term in enumerate(tokens[:_POSITION_LIMIT]):
+                        postings = self.postings.get(term)
+                        if postings is None:
+                            postings = self.postings[term] = _Postings(len(self.postings) + 1)
+                        postings.add(doc, base | position)
+                        self.tokens.append(postings.id)
+                    self.tokens.append(_BOUNDARY)
+                    added += 1
+        return added
+
+    def prepare(self):
+        """Impact-order the postings of frequent terms ahead of the first queries that use them"""
+        with self._lock:
+            if not self.documents:
+                return
+            norms = self._length_norms()
+            for postings in self.postings.values():
+                if postings.df > _EXHAUSTIVE_DOCS:
+                    self._ranked(postings, norms)
+
+    def _phrase_starts(self, clause: List[_Postings], anchor: int, positions: Iterable[int]) -> List[int]:
+        """Forward-index positions of the anchor term where the whole phrase occurs around it
+
+        Neighbours are checked nearest first, so a position is only read past a word that
+        matched, and at worst lands on a boundary.
+        """
+        positions = list(positions)
+        for delta in sorted(range(-anchor, len(clause) - anchor), key=abs)[1:]:
+            if not positions:
+                break
+            found = map(self.tokens.__getitem__, map(add, positions, repeat(delta)))
+            positions = list(compress(positions, map(eq, found, repeat(clause[anchor + delta].id))))
+        return positions
+
+    def _frequency(self, clause: List[_Postings], anchor: int, doc: int) -> int:
+        """Occurrences of the clause (a term, or terms in a row) in one doc"""
+        low, high = clause[anchor].span(doc)
+        if len(clause) == 1 or high == low:
+            return high - low
+        offset = self.offsets[doc]
+        return len(self._phrase_starts(
+            clause, anchor, [offset + (key & _POSITION_MASK) for key in clause[anchor].keys[low:high]]
+        ))
+
+    def _score(self, clauses: List[List[_Postings]], anchors: List[int], weights: List[float],
+               norms: array, doc: int, skip: int = -1) -> Optional[float]:
+        """BM25 score of one doc over the clauses other than skip, or None if one is missing (they come rarest first)"""
+        score = 0.0
+        for i, (clause, anchor, weight) in enumerate(zip(clauses, anchors, weights)):
+            if i == skip:
+                continue
+            frequency = self._frequency(clause, anchor, doc)
+            if not frequency:
+                return None
+            score += weight * frequency / (frequency + norms[doc])
+        return score
+
+    def _ranked(self, postings: _Postings, norms: array) -> _Ranked:
+        """The term's docs by descending tf / (tf + norm), the part of its BM25 weight that varies by doc
+
+        Computed on first use and kept until the index grows.
+        """
+        if postings.ranked_size != len(norms):
+            ends = postings.starts[1:]
+            ends.append(len(postings.keys))
+            impacts = [(end - start) / (end - start + norms[doc])
+                       for doc, start, end in zip(postings.docs, postings.starts, ends)]
+            order = sorted(range(len(impacts)), key=impacts.__getitem__, reverse=True)
+            positions, bounds, owners = array('Q'), array('I', [0]), array('I')
+            for i in order:
+                doc = postings.docs[i]
+                offset = self.offsets[doc]
+                positions.extend([offset + (key & _POSITION_MASK) for key in postings.keys[postings.starts[i]:ends[i]]])
+                owners.extend(repeat(doc, len(positions) - bounds[-1]))
+                bounds.append(len(positions))
+            postings.ranked = _Ranked(
+                array('I', [postings.docs[i] for i in order]), array('d', [impacts[i] for i in order]), positions, bounds, owners,
+                array('I', map(self.tokens.__getitem__, map(sub, positions, repeat(1)))),
+                array('I', map(self.tokens.__getitem__, map(add, positions, repeat(1)))),
+            )
+            postings.ranked_size = len(norms)
+        return postings.ranked
+
+    def _best_first(self, clauses: List[List[_Postings]], anchors: List[int], weights: List[float],
+                    norms: array, limit: int) -> List[Tuple[float, int]]:
+        """Top matches of frequent clauses by the threshold algorithm over impact-ordered postings
+
+        Each clause walks the docs of its rarest term from the highest term weight down (a
+        phrase never occurs in a doc more often than its rarest word), a block at a time. Once
+        the summed weights reached cannot beat the limit-th best score, no unseen doc can either,
+        and a doc whose own weight plus that bound for the other clauses cannot is not scored.
+        Several very common words can keep that bound high for thousands of docs, so past
+        _SCORE_BUDGET scored docs the best found so far are returned: they are the docs where
+        some query word weighs most, though the exact order below the top may differ.
+        """
+        lists = [self._ranked(clause[anchor], norms) for clause, anchor in zip(clauses, anchors)]
+        best: List[Tuple[float, int]] = []
+        seen = set()
+        scored = 0
+        # A doc matching every clause is in every list, so the shortest one running out ends the search
+        shortest = min(len(ranked.docs) for ranked in lists)
+        for low in range(0, shortest, _BLOCK):
+            high = min(low + _BLOCK, shortest)
+            # A doc not yet seen weighs at most each list's current impact
+            ceilings = [weight * ranked.impacts[low] for weight, ranked in zip(weights, lists)]
+            for i, (clause, anchor, ranked) in enumerate(zip(clauses, anchors, lists)):
+                others = sum(ceilings) - ceilings[i]
+                if len(clause) == 1:
+                    # A term's frequency in each doc is the size of its group of positions
+                    block = zip(ranked.docs[low:high], map(sub, ranked.bounds[low + 1:high + 1], ranked.bounds[low:high]))
+                else:
+                    # The whole block's phrase check runs at once; docs without the phrase cannot match
+                    first, last = ranked.bounds[low], ranked.bounds[high]
+                    neighbours, delta = (ranked.following, 1) if anchor + 1 < len(clause) else (ranked.preceding, -1)
+                    matches = list(map(eq, neighbours[first:last], repeat(clause[anchor + delta].id)))
+                    if len(clause) == 2:
+                        block = Counter(compress(ranked.owners[first:last], matches)).items()
+                    else:
+                        starts = self._phrase_starts(clause, anchor, compress(ranked.positions[first:last], matches))
+                        block = Counter([bisect_right(self.offsets, start) - 1 for start in starts]).items()
+                for doc, frequency in block:
+                    if doc in seen:
+                        continue
+                    seen.add(doc)
+                    score = weights[i] * frequency / (frequency + norms[doc])
+                    if len(best) == limit and score + others <= best[0][0]:
+                        continue
+                    rest = self._score(clauses, anchors, weights, norms, doc, skip=i)
+                    scored += 1
+                    if rest is None:
+                        continue
+                    score += rest
+                    if len(best) < limit:
+                        heapq.heappush(best, (score, -doc))
+                    elif (score, -doc) > best[0]:
+                        heapq.heapreplace(best, (score, -doc))
+            threshold = sum(weight * ranked.impacts[high - 1] for weight, ranked in zip(weights, lists))
+            if len(best) == limit and (best[0][0] >= threshold or scored >= _SCORE_BUDGET):
+                break
+        return sorted(best, reverse=True)
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Segments containing every query term (quoted parts as exact phrases), best BM25 first
+
+        Each result has the ref, title, language and a snippet with the matches in bold.
+        """
+        phrases = [terms(phrase) for phrase in _PHRASES.findall(query)]
+        words = terms(_PHRASES.sub(' ', query))
+        clauses = [phrase for phrase in phrases if phrase] + [[word] for word in dict.fromkeys(words)]
+        if not clauses or limit < 1:
+            return []
+
+        with self._lock:
+            count = len(self.documents)
+            postings = [[self.postings.get(term) for term in clause] for clause in clauses]
+            if not count or not all(all(clause) for clause in postings):
+                return []
+
+            # Rarest clause first, so a doc missing from the query fails on its first lookup.
+            # A phrase's document frequency is taken from its rarest word
+            postings.sort(key=lambda clause: min(term.df for term in clause))
+            weights = [(K1 + 1) * math.log(1 + (count - df + 0.5) / (df + 0.5))
+                       for df in (min(term.df for term in clause) for clause in postings)]
+            norms = self._length_norms()
+            anchors = [min(range(len(clause)), key=lambda i: clause[i].df) for clause in postings]
+            rarest = postings[0][anchors[0]]
+            if rarest.df <= _EXHAUSTIVE_DOCS:
+                # Every doc of the rarest term is a candidate, and each costs a few bisects
+                scored = []
+                for doc in rarest.docs:
+                    score = self._score(postings, anchors, weights, norms, doc)
+                    if score is not None:
+                        scored.append((score, -doc))
+                best = heapq.nlargest(limit, scored)
+            else:
+                best = self._best_first(postings, anchors, weights, norms, limit)
+            documents = [self.documents[-negative] for _, negative in best]
+
+        highlight = {term for clause in clauses for term in clause}
+        return [
+            {'ref': document.ref, 'title': document.title, 'language': document.language,
+             'text': snippet(document.text, highlight)}
+            for document in documents
+        ]
+
+
+def snippet(text: str, highlight: Set[str], width: int = 240) -> str:
+    """The part of the text around the first match, with words containing a match term in bold"""
+    words = text.split(' ')
+    # One normalization pass over all the words, rather than one per word
+    marked = [any(stem(token) in highlight for token in word.split()) for word in normalize_batch(words)]
+    first = marked.index(True) if True in marked else 0
+
+    # Start a few words before the first match and stop once the snippet is wide enough
+    start = max(0, first - 8)
+    pieces, size = [], 0
+    for word, is_match in zip(words[start:], marked[start:]):
+        if size > width:
+            break
+        pieces.append(f"**{word}**" if is_match else word)
+        size += len(word) + 1
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + len(pieces) < len(words) else ""
+    return prefix + ' '.join(pieces) + suffix
+
+
+if __name__ == "__main__":
+    # Benchmark: index a Tanakh-sized synthetic corpus and time typical queries
+    import random
+    import time
+
+    # Singular and plural, base and past forms share a stem, in both directions of a search
+    for forms in (('family', 'families'), ('assembly', 'assemblies'), ('carry', 'carried'),
+                  ('sanctify', 'sanctified', 'sanctifies'), ('day', 'days'), ('bless', 'blessed')):
+        assert len({stem(form) for form in forms}) == 1, [stem(form) for form in forms]
+    pair = TextIndex()
+    pair.add_documents([("Genesis 10:32", "Genesis", 'en', "These are the families of the sons of Noah"),
+                        ("Numbers 1:2", "Numbers", 'en', "Take the sum of all the assembly, by their family")])
+    assert sorted(hit['ref'] for hit in pair.search("family")) == ["Genesis 10:32", "Numbers 1:2"]
+    assert [hit['ref'] for hit in pair.search("assemblies")] == ["Numbers 1:2"]
+
+    random.seed(11)
+    # Zipf-distributed vocabularies, roughly the size of Tanakh's in each language
+    english = [f"w{rank}" for rank in range(1, 12001)] + "moses israel children lord blessed".split()
+    hebrew = [f"מ{rank}" for rank in range(1, 40001)] + "משה ישראל בני יהוה ברוך".split()
+    english_weights = [1 / rank for rank in range(1, len(english) + 1)]
+    hebrew_weights = [1 / rank for rank in range(1, len(hebrew) + 1)]
+    documents = []
+    for i in range(23000):
+        ref = f"Book {i // 30 + 1}:{i % 30 + 1}"
+        documents.append((ref, "Book", 'en', ' '.join(random.choices(english, english_weights, k=26))))
+        documents.append((ref, "Book", 'he', ' '.join(random.choices(hebrew, hebrew_weights, k=14))))
+
+    index = TextIndex()
+    start = time.perf_counter()
+    index.add_documents(documents)
+    index.prepare()
+    print(f"indexed {len(index)} segments ({sum(index.lengths)} tokens) in {time.perf_counter() - start:.1f} s")
+
+    queries = ['w1 w2', 'w3 w150', '"w1 w2"', 'w40 w900 w7', 'moses w12', 'מ5 מ120', '"מ1 מ2"', 'w2000']
+    for query in queries:
+        runs = 20
+        start = time.perf_counter()
+        for _ in range(runs):
+            results = index.search(query, limit=10)
+        print(f"{query!r}: {len(results)} results in {(time.perf_counter() - start) / runs * 1000:.2f} ms")
@@ -7,6 +7,8 @@ import logging
 from typing import Optional, Dict, List, Union
 import time
 
+from . import gematria
+
 logger = logging.getLogger(__name__)
 
 class TorahCalcClient:
@@ -80,24 +82,14 @@ class TorahCalcClient:
             }
     
     async def calculate_torah_gematria(self, text: str) -> Optional[Dict]:
-        """Calculate advanced gematria values"""
-        try:
-            params = {'text': text}
-            return await self._make_request("gematria", params)
-        except Exception as e:
-            logger.error(f"Error calculating gematria: {e}")
-            # Fallback calculation
-            hebrew_values = {
-                'א': 1, 'ב': 2, 'ג': 3, 'ד': 4, 'ה': 5, 'ו': 6, 'ז': 7, 'ח': 8, 'ט': 9,
-                'י': 10, 'כ': 20, 'ל': 30, 'מ': 40, 'נ': 50, 'ס': 60, 'ע': 70, 'פ': 80, 'צ': 90,
-                'ק': 100, 'ר': 200, 'ש': 300, 'ת': 400, 'ך': 20, 'ם': 40, 'ן': 50, 'ף': 80, 'ץ': 90
-            }
-            total = sum(hebrew_values.get(char, 0) for char in text)
-            return {
-                'text': text,
-                'standard_value': total,
-                'calculation_type': 'standard_gematria'
-            }
+        """Calculate gematria values in every method (pure arithmetic, so no API call)"""
+        values = gematria.values(text)
+        return {
+            'text': text,
+            'standard_value': values['standard'],
+            'values': values,
+            'calculation_type': 'standard_gematria'
+        }
     
     async def get_temple_measurements(self) -> Optional[Dict]:
         """Get information about Temple measurements"""
@@ -8,6 +8,7 @@ import os
 from aiohttp import web
 from dotenv import load_dotenv
 from bot.discord_bot import SefariaBot
+from bot.image_cache import ImageCache
 
 # Load environment variables
 load_dotenv()
@@ -40,21 +41,32 @@ async def index(request):
         "status": "running",
         "endpoints": {
             "/": "Bot information",
-            "/health": "Health check"
+            "/health": "Health check",
+            "/images/{key}.jpg": "Cached archive thumbnails"
         }
     })
 
-async def create_web_app():
-    """Create the web application for health checks"""
+async def cached_image(request):
+    """Serve an archive thumbnail from the local image cache, fetching it upstream on first request"""
+    image_cache = request.app['image_cache']
+    path = await image_cache.get_by_key(request.match_info['key'])
+    if path is None:
+        raise web.HTTPNotFound()
+    return web.FileResponse(path, headers={'Cache-Control': 'public, max-age=604800'})
+
+async def create_web_app(image_cache: ImageCache):
+    """Create the web application for health checks and cached images"""
     app = web.Application()
+    app['image_cache'] = image_cache
     app.router.add_get('/', index)
     app.router.add_get('/health', health_check)
     app.router.add_get('/status', health_check)  # Alternative health check endpoint
+    app.router.add_get('/images/{key}.jpg', cached_image)
     return app
 
-async def start_web_server():
-    """Start the web server for health checks"""
-    app = await create_web_app()
+async def start_web_server(image_cache: ImageCache):
+    """Start the web server for health checks and cached images"""
+    app = await create_web_app(image_cache)
     runner = web.AppRunner(app)
     await runner.setup()
     
@@ -65,7 +77,7 @@ async def start_web_server():
     logger.info(f"Web server started on port {port}")
     return runner
 
-async def start_discord_bot():
+async def start_discord_bot(image_cache: ImageCache):
     """Start the Discord bot"""
     # Get Discord token from environment
     discord_token = os.getenv('DISCORD_TOKEN')
@@ -80,7 +92,7 @@ async def start_discord_bot():
     
     # Create and start the bot
     try:
-        bot = SefariaBot()
+        bot = SefariaBot(image_cache=image_cache)
         
         # Start bot in background task with proper error handling
         bot_task = asyncio.create_task(bot.start(discord_token))
@@ -111,13 +123,15 @@ async def main():
     
     web_runner = None
     bot = None
+    # Shared by the bot (attachments, embed thumbnails) and the web server (/images)
+    image_cache = ImageCache()
     
     try:
         # Start web server for health checks first (critical for deployment)
-        web_runner = await start_web_server()
+        web_runner = await start_web_server(image_cache)
         
         # Start Discord bot (optional - web server should stay up even if bot fails)
-        bot_result = await start_discord_bot()
+        bot_result = await start_discord_bot(image_cache)
         if bot_result is None:
             logger.warning("Discord bot failed to start, but web server will continue running")
             # Keep web server running indefinitely for health checks
@@ -155,6 +169,7 @@ async def main():
                 await web_runner.cleanup()
             if bot:
                 await bot.close()
+            await image_cache.close()
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
 